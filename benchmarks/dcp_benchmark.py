@@ -0,0 +1,322 @@
+"""
+Throughput benchmark of the DCP protocol encoding/decoding and the DCP engine.
+
+Measures the packing and unpacking of EthernetPacket, DCPPacket and DCPBlock, the MAC/IP conversions in profi_dcp.util,
+the parsing of identify responses (DCP.__parse_raw_packet) and identify_all against an in-memory fleet of simulated
+devices (10, 100, 1000 and 10000 devices by default).
+
+For each benchmark, the median rate (operations resp. frames per second) over several repetitions is reported together
+with the peak memory allocated (as traced by tracemalloc) per operation. For identify_all, the bytes retained per found
+device are reported as well. The results are printed as JSON (or written to a file with --output) so runs can be
+compared to detect performance regressions.
+
+Usage: python benchmarks/dcp_benchmark.py [--repeat N] [--fleet-sizes N ...] [--output FILE]
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from profi_dcp import dcp_constants, util
+from profi_dcp.parsing import XID_OFFSET
+from profi_dcp.clock import VirtualClock
+from profi_dcp.dcp_constants import ServiceID, ServiceType
+from profi_dcp.l2socket.memory import L2MemorySocket
+from profi_dcp.profi_dcp import DCP
+from profi_dcp.protocol import DCPBlock, DCPPacket, EthernetPacket
+from profi_dcp.simulation import SimulatedFleet
+
+HOST_MAC = "02:00:00:00:ff:01"
+DEFAULT_FLEET_SIZES = [10, 100, 1000, 10000]
+
+
+def device_mac(index):
+    """
+    Get the mac address of the simulated device with the given index.
+    :param index: The index of the device.
+    :type index: int
+    :return: The mac address as ':' separated string.
+    :rtype: string
+    """
+    return util.mac_address_to_string(b"\x02\x00" + index.to_bytes(4, "big"))
+
+
+def response_block(option, payload):
+    """
+    Create a DCP block of an identify response, padded to even length.
+    :param option: The option and sub-option of the block.
+    :type option: Tuple[int, int]
+    :param payload: The value of the block (without block info).
+    :type payload: bytes
+    :return: The packed block.
+    :rtype: bytes
+    """
+    length = len(payload) + 2
+    padding = bytes(length % 2)
+    return bytes(
+        DCPBlock(
+            option[0], option[1], length=length, status=0, payload=payload + padding
+        )
+    )
+
+
+def identify_response(index, xid=0):
+    """
+    Create a realistic identify response of the simulated device with the given index, containing its name of station,
+    IP configuration and device family.
+    :param index: The index of the device.
+    :type index: int
+    :param xid: The xid of the response.
+    :type xid: int
+    :return: The identify response as raw ethernet frame.
+    :rtype: bytes
+    """
+    ip = util.ip_address_to_bytes(
+        f"10.{index >> 16 & 0xFF}.{index >> 8 & 0xFF}.{index & 0xFF}"
+    )
+    blocks = (
+        response_block(dcp_constants.Option.NAME_OF_STATION, f"device-{index}".encode())
+        + response_block(
+            dcp_constants.Option.IP_ADDRESS,
+            ip
+            + util.ip_address_to_bytes("255.0.0.0")
+            + util.ip_address_to_bytes("10.0.0.1"),
+        )
+        + response_block(dcp_constants.Option.DEVICE_FAMILY, b"Benchmark")
+    )
+    dcp_packet = DCPPacket(
+        dcp_constants.FrameID.IDENTIFY_RESPONSE,
+        ServiceID.IDENTIFY,
+        ServiceType.RESPONSE,
+        xid,
+        payload=blocks,
+    )
+    return bytes(
+        EthernetPacket(
+            HOST_MAC, device_mac(index), dcp_constants.ETHER_TYPE, payload=dcp_packet
+        )
+    )
+
+
+def reset_peak():
+    """
+    Reset the peak of the traced memory to the current size (with python < 3.9, the tracing is restarted instead).
+    """
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.stop()
+        tracemalloc.start()
+
+
+def peak_bytes(function):
+    """
+    Measure the peak memory allocated while calling the given function once.
+    :param function: The function to call.
+    :type function: Callable
+    :return: The peak memory allocated by the call in bytes (as traced by tracemalloc).
+    :rtype: int
+    """
+    tracemalloc.start()
+    try:
+        reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        function()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def measure(function, repeat, min_time=0.2):
+    """
+    Measure the rate at which the given function can be called.
+    :param function: The function to benchmark.
+    :type function: Callable
+    :param repeat: The number of repetitions, the median is reported.
+    :type repeat: int
+    :param min_time: The minimum duration of one repetition in seconds.
+    :type min_time: float
+    :return: The median number of calls per second and the peak memory allocated per call in bytes.
+    :rtype: dict
+    """
+    # determine the number of calls per repetition
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+
+    rates = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        rates.append(number / (time.perf_counter() - start))
+    return {
+        "ops_per_second": statistics.median(rates),
+        "peak_alloc_bytes_per_op": peak_bytes(function),
+    }
+
+
+def protocol_benchmarks(repeat):
+    """
+    Benchmark packing and unpacking of the protocol classes and the util conversions.
+    :param repeat: The number of repetitions of each benchmark.
+    :type repeat: int
+    :return: The results by benchmark name.
+    :rtype: dict
+    """
+    frame = identify_response(42, xid=0x1234)
+    ethernet_packet = EthernetPacket(data=frame)
+    dcp_packet = DCPPacket(data=ethernet_packet.payload)
+    block = DCPBlock(data=dcp_packet.payload)
+    mac_bytes = util.mac_address_to_bytes(HOST_MAC)
+    ip_bytes = util.ip_address_to_bytes("10.0.0.1")
+
+    benchmarks = {
+        "ethernet_packet.pack": ethernet_packet.pack,
+        "ethernet_packet.unpack": lambda: EthernetPacket(data=frame),
+        "dcp_packet.pack": dcp_packet.pack,
+        "dcp_packet.unpack": lambda: DCPPacket(data=ethernet_packet.payload),
+        "dcp_block.pack": block.pack,
+        "dcp_block.unpack": lambda: DCPBlock(data=dcp_packet.payload),
+        "util.mac_address_to_bytes": lambda: util.mac_address_to_bytes(HOST_MAC),
+        "util.mac_address_to_string": lambda: util.mac_address_to_string(mac_bytes),
+        "util.ip_address_to_bytes": lambda: util.ip_address_to_bytes("10.0.0.1"),
+        "util.ip_address_to_string": lambda: util.ip_address_to_string(ip_bytes),
+    }
+    return {name: measure(function, repeat) for name, function in benchmarks.items()}
+
+
+def parse_benchmark(repeat):
+    """
+    Benchmark parsing identify responses with DCP.__parse_raw_packet.
+    :param repeat: The number of repetitions.
+    :type repeat: int
+    :return: The results, the rate is given in frames per second.
+    :rtype: dict
+    """
+    dcp = DCP(transport=L2MemorySocket(HOST_MAC))
+    xid = dcp._DCP__xid.to_bytes(4, "big")
+    frames = [
+        frame[:XID_OFFSET] + xid + frame[XID_OFFSET + 4 :]
+        for frame in (identify_response(index) for index in range(100))
+    ]
+    parse = dcp._DCP__parse_raw_packet
+    assert parse(frames[0], False) is not None
+
+    def parse_all():
+        for frame in frames:
+            parse(frame, False)
+
+    result = measure(parse_all, repeat)
+    return {
+        "frames_per_second": result["ops_per_second"] * len(frames),
+        "peak_alloc_bytes_per_frame": result["peak_alloc_bytes_per_op"] / len(frames),
+    }
+
+
+def bulk_decode_benchmark(repeat, frame_count=10000):
+    """
+    Benchmark decoding identify responses with the NumPy bulk decoder (profi_dcp.bulk), one in ten frames is not a
+    response and filtered by the header check.
+    :param repeat: The number of repetitions.
+    :type repeat: int
+    :param frame_count: The number of frames decoded at once.
+    :type frame_count: int
+    :return: The results, the rate is given in frames per second.
+    :rtype: dict
+    """
+    from profi_dcp import bulk
+
+    frames = [
+        bytes(60) if index % 10 == 0 else identify_response(index)
+        for index in range(frame_count)
+    ]
+    buffer, offsets = bulk.pack_frames(frames)
+    assert len(bulk.decode_bulk(buffer, offsets)) == frame_count - frame_count // 10
+
+    result = measure(lambda: bulk.decode_bulk(buffer, offsets), repeat)
+    return {
+        "frames_per_second": result["ops_per_second"] * frame_count,
+        "peak_alloc_bytes_per_frame": result["peak_alloc_bytes_per_op"] / frame_count,
+    }
+
+
+def identify_all_benchmark(device_count, repeat):
+    """
+    Benchmark identify_all against an in-memory fleet of the given size. The fleet runs on a virtual clock, so
+    identify_all does not wait for its timeout and the rate includes the time the fleet needs to create the responses.
+    :param device_count: The number of simulated devices.
+    :type device_count: int
+    :param repeat: The number of repetitions.
+    :type repeat: int
+    :return: The results, the rate is given in frames per second.
+    :rtype: dict
+    """
+    fleet = SimulatedFleet.generate(device_count)
+    dcp = DCP(transport=fleet.connect(HOST_MAC, clock=VirtualClock()))
+    timeout = 1
+
+    rates = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        devices = dcp.identify_all(timeout=timeout, response_delay=1)
+        rates.append(device_count / (time.perf_counter() - start))
+        if len(devices) != device_count:
+            raise RuntimeError(f"Found {len(devices)} of {device_count} devices.")
+
+    tracemalloc.start()
+    try:
+        reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        devices = dcp.identify_all(timeout=timeout, response_delay=1)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "frames_per_second": statistics.median(rates),
+        "peak_alloc_bytes_per_frame": (peak - baseline) / device_count,
+        "retained_bytes_per_device": (retained - baseline) / device_count,
+    }
+
+
+def main():
+    """Parse the command line arguments, run the benchmarks and print the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--fleet-sizes", type=int, nargs="*", default=DEFAULT_FLEET_SIZES
+    )
+    parser.add_argument(
+        "--output", help="write the results to this file instead of printing them"
+    )
+    args = parser.parse_args()
+
+    results = protocol_benchmarks(args.repeat)
+    results["dcp.parse_identify_response"] = parse_benchmark(args.repeat)
+    try:
+        results["bulk.decode_bulk"] = bulk_decode_benchmark(args.repeat)
+    except ImportError:
+        # NumPy is an optional dependency
+        pass
+    for device_count in args.fleet_sizes:
+        results[f"dcp.identify_all[{device_count}]"] = identify_all_benchmark(
+            device_count, min(args.repeat, 3)
+        )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Import-time benchmark of the profi_dcp modules.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for each module, repeats this several times and
+prints the median cumulative import time (in microseconds) of each module as JSON. Additionally, it lists which of the
+heavy optional modules (rich, psutil, ctypes) were loaded by the import.
+
+Usage: python benchmarks/import_time.py [--repeat N] [module ...]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MODULES = [
+    "profi_dcp.dcp_constants",
+    "profi_dcp.util",
+    "profi_dcp.protocol",
+    "profi_dcp.profi_dcp",
+    "profi_dcp.cli.cli",
+]
+HEAVY_MODULES = ["rich", "psutil", "ctypes"]
+
+
+def import_time(module):
+    """
+    Import the given module in a fresh interpreter with -X importtime.
+    :param module: The name of the module to import.
+    :type module: string
+    :return: The cumulative import time of the module in microseconds and the imported heavy modules.
+    :rtype: Tuple[int, List[string]]
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+    )
+
+    cumulative = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        # lines look like: "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            cumulative = int(cumulative_us)
+    heavy = [name for name in HEAVY_MODULES if name in imported]
+    return cumulative, heavy
+
+
+def main():
+    """Parse the command line arguments, run the benchmark and print the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        measurements = [import_time(module) for _ in range(args.repeat)]
+        results[module] = {
+            "cumulative_us": statistics.median(time for time, _ in measurements),
+            "heavy_modules": measurements[-1][1],
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+
+Vectorized decoding of many received frames at once with NumPy (an optional dependency, install profi-dcp[numpy]).
+The fixed-position header fields of all frames are extracted and filtered in NumPy, only the variable-length blocks of
+the remaining frames are decoded in python.
+"""
+
+import profi_dcp.dcp_constants as dcp_constants
+import profi_dcp.parsing as parsing
+import profi_dcp.util as util
+from profi_dcp.dcp_constants import ServiceID, ServiceType
+from profi_dcp.inventory import Inventory
+from profi_dcp.profi_dcp import Device
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - depends on the environment
+    numpy = None
+
+if numpy is not None:
+    # the ethernet and DCP headers of a frame (parsing.BLOCKS_OFFSET bytes)
+    HEADER_DTYPE = numpy.dtype(
+        [
+            ("destination", "u1", (6,)),
+            ("source", "u1", (6,)),
+            ("ether_type", ">u2"),
+            ("frame_id", ">u2"),
+            ("service_id", "u1"),
+            ("service_type", "u1"),
+            ("xid", ">u4"),
+            ("response_delay", ">u2"),
+            ("length", ">u2"),
+        ]
+    )
+
+
+def require_numpy():
+    """
+    Check that NumPy is installed.
+    :return: The numpy module.
+    :raises ImportError: If NumPy is not installed.
+    """
+    if numpy is None:
+        raise ImportError(
+            "The bulk decoder requires NumPy, install it with 'pip install profi-dcp[numpy]'."
+        )
+    return numpy
+
+
+def pack_frames(frames):
+    """
+    Concatenate frames into one buffer, e.g. the frames of a batch receive.
+    :param frames: The frames.
+    :type frames: Iterable[bytes]
+    :return: The buffer and the offset of each frame in it, followed by the end of the last frame.
+    :rtype: Tuple[bytes, numpy.ndarray]
+    """
+    np = require_numpy()
+    frames = [bytes(frame) for frame in frames]
+    offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+    np.cumsum([len(frame) for frame in frames], out=offsets[1:])
+    return b"".join(frames), offsets
+
+
+def decode_headers(buffer, offsets):
+    """
+    Extract the headers of all frames in the buffer.
+    :param buffer: The frames, concatenated.
+    :type buffer: bytes
+    :param offsets: The offset of each frame in the buffer, followed by the end of the last frame (see pack_frames).
+    :type offsets: Sequence[int]
+    :return: The headers (with HEADER_DTYPE, all zero for frames shorter than the header) and the length of each
+    frame.
+    :rtype: Tuple[numpy.ndarray, numpy.ndarray]
+    """
+    np = require_numpy()
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    complete = lengths >= parsing.BLOCKS_OFFSET
+
+    # gather the header bytes of all complete frames into one (frames x header size) array
+    header_bytes = np.zeros((len(starts), parsing.BLOCKS_OFFSET), dtype=np.uint8)
+    header_bytes[complete] = data[
+        starts[complete, None] + np.arange(parsing.BLOCKS_OFFSET)
+    ]
+    return header_bytes.view(HEADER_DTYPE).reshape(len(starts)), lengths
+
+
+def filter_responses(headers, lengths, destination=None, xid=None):
+    """
+    Select the identify and get responses among the frames, with NumPy.
+    :param headers: The headers of the frames, see decode_headers.
+    :type headers: numpy.ndarray
+    :param lengths: The length of each frame.
+    :type lengths: numpy.ndarray
+    :param destination: Only select responses to this mac address (as ':' separated string). Default is any.
+    :type destination: Optional[string]
+    :param xid: Only select responses with this XID. Default is any.
+    :type xid: Optional[int]
+    :return: The indices of the selected frames.
+    :rtype: numpy.ndarray
+    """
+    np = require_numpy()
+    selected = (
+        (lengths >= parsing.BLOCKS_OFFSET)
+        & (headers["ether_type"] == dcp_constants.ETHER_TYPE)
+        & (headers["service_type"] == ServiceType.RESPONSE)
+        & np.isin(headers["service_id"], (ServiceID.IDENTIFY, ServiceID.GET))
+        & (parsing.BLOCKS_OFFSET + headers["length"].astype(np.int64) <= lengths)
+    )
+    if destination is not None:
+        mac = np.frombuffer(util.mac_address_to_bytes(destination), dtype=np.uint8)
+        selected &= (headers["destination"] == mac).all(axis=1)
+    if xid is not None:
+        selected &= headers["xid"] == xid
+    return np.flatnonzero(selected)
+
+
+def decode_bulk(
+    buffer, offsets, destination=None, xid=None, conflict_policy=Inventory.KEEP_NEWEST
+):
+    """
+    Decode the devices of all identify and get responses among many frames concatenated in one buffer. The headers
+    are checked for all frames at once with NumPy, only the blocks of the selected responses are decoded in python
+    (with the bounds-checked functions of profi_dcp.parsing).
+    :param buffer: The frames, concatenated.
+    :type buffer: bytes
+    :param offsets: The offset of each frame in the buffer, followed by the end of the last frame (see pack_frames).
+    :type offsets: Sequence[int]
+    :param destination: Only decode responses to this mac address (as ':' separated string). Default is any.
+    :type destination: Optional[string]
+    :param xid: Only decode responses with this XID. Default is any.
+    :type xid: Optional[int]
+    :param conflict_policy: Which data to keep if the responses of a device differ, see Inventory.
+    :type conflict_policy: string
+    :return: The devices, each device only once.
+    :rtype: Inventory
+    """
+    np = require_numpy()
+    headers, lengths = decode_headers(buffer, offsets)
+    selected = filter_responses(headers, lengths, destination, xid)
+
+    devices = Inventory(conflict_policy=conflict_policy)
+    starts = np.asarray(offsets, dtype=np.int64)[:-1][selected]
+    ends = starts + parsing.BLOCKS_OFFSET + headers["length"][selected]
+    sources = headers["source"][selected].tobytes()
+    for position, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        blocks = parsing.parse_blocks(buffer[start:end], end=end - start)
+        if blocks is None:
+            continue
+        device = Device()
+        device.MAC = util.mac_address_to_string(
+            sources[6 * position : 6 * position + 6]
+        )
+        if parsing.decode_device(blocks, device):
+            devices.add(device)
+    return devices
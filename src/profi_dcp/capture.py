@@ -0,0 +1,162 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+
+Offline analysis of DCP traffic captured to pcap or pcapng files (e.g. by Wireshark or tcpdump).
+"""
+
+import concurrent.futures
+import os
+
+import profi_dcp.parsing as parsing
+import profi_dcp.util as util
+from profi_dcp.inventory import Inventory
+from profi_dcp.l2socket.pcap_file import CaptureReader
+from profi_dcp.profi_dcp import Device
+
+VLAN_ETHER_TYPE = b"\x81\x00"
+
+
+def decode_capture_frame(frame):
+    """
+    Decode the device of an identify or get response captured on the network. A VLAN tag is removed first.
+    :param frame: The captured ethernet frame.
+    :type frame: bytes
+    :return: The device or None if the frame is not an identify or get response.
+    :rtype: Optional[Device]
+    """
+    if frame[12:14] == VLAN_ETHER_TYPE:
+        frame = frame[:12] + frame[16:]
+    response = parsing.parse_observed_response(frame)
+    if response is None:
+        return None
+    device = Device()
+    device.MAC = util.mac_address_to_string(frame[6:12])
+    if not parsing.decode_device(response[2], device):
+        return None
+    return device
+
+
+def merge_device(inventory, device):
+    """
+    Add a device seen in a capture to the inventory: the first and last time the device was seen and the number of
+    its responses are kept across all responses of the device.
+    :param inventory: The inventory.
+    :type inventory: Inventory
+    :param device: The device, with the attributes first_seen, last_seen and responses.
+    :type device: Device
+    """
+    existing = inventory.by_mac.get(device.MAC)
+    if existing is not None:
+        first_seen = _earliest(existing.first_seen, device.first_seen)
+        last_seen = _latest(existing.last_seen, device.last_seen)
+        responses = existing.responses + device.responses
+        for merged in (existing, device):
+            merged.first_seen, merged.last_seen = first_seen, last_seen
+            merged.responses = responses
+    inventory.add(device)
+
+
+def _earliest(first, second):
+    """Return the earlier of two optional times."""
+    return second if first is None else first if second is None else min(first, second)
+
+
+def _latest(first, second):
+    """Return the later of two optional times."""
+    return second if first is None else first if second is None else max(first, second)
+
+
+def ingest_chunk(path, chunk, conflict_policy=Inventory.KEEP_NEWEST):
+    """
+    Decode the devices of a chunk of a capture file, e.g. in a worker process.
+    :param path: The path of the capture file.
+    :type path: string
+    :param chunk: The chunk to decode.
+    :type chunk: CaptureChunk
+    :param conflict_policy: Which data to keep if the responses of a device differ, see Inventory.
+    :type conflict_policy: string
+    :return: The devices of the chunk, their conflicts and duplicates and the number of frames and decoded responses.
+    :rtype: Tuple[List[Device], List[Conflict], int, int, int]
+    """
+    inventory = Inventory(conflict_policy=conflict_policy)
+    frames = responses = 0
+    with CaptureReader(path) as reader:
+        for timestamp, frame in reader.records(chunk):
+            frames += 1
+            device = decode_capture_frame(frame)
+            if device is None:
+                continue
+            responses += 1
+            device.timestamp = device.first_seen = device.last_seen = timestamp
+            device.responses = 1
+            merge_device(inventory, device)
+    return list(inventory), inventory.conflicts, inventory.duplicates, frames, responses
+
+
+class CaptureInventory(Inventory):
+    """
+    The devices found in a capture file. Each device carries the times it was first and last seen (first_seen and
+    last_seen, in seconds since the epoch) and the number of its responses in the capture (responses).
+    """
+
+    def __init__(self, conflict_policy=Inventory.KEEP_NEWEST):
+        """
+        Create a new, empty capture inventory.
+        :param conflict_policy: Which data to keep if the responses of a device differ, see Inventory.
+        :type conflict_policy: string
+        """
+        super().__init__(conflict_policy=conflict_policy)
+        # the number of ethernet frames in the capture and the number of identify and get responses among them
+        self.frames = 0
+        self.responses = 0
+
+
+def ingest_capture(
+    path,
+    workers=None,
+    chunk_size=64 * 1024 * 1024,
+    conflict_policy=Inventory.KEEP_NEWEST,
+):
+    """
+    Find all devices in the identify and get responses of a pcap or pcapng file. The file is split into chunks of
+    about chunk_size bytes which are decoded in parallel by a pool of worker processes, the results are merged in
+    the order of the file (so with KEEP_NEWEST, the data of the latest response of each device is kept).
+    :param path: The path of the capture file.
+    :type path: string
+    :param workers: The number of worker processes. Default is the number of CPUs. With 1 worker or a single chunk,
+    the file is decoded in this process.
+    :type workers: Optional[int]
+    :param chunk_size: The size of the chunks in bytes.
+    :type chunk_size: int
+    :param conflict_policy: Which data to keep if the responses of a device differ, see Inventory.
+    :type conflict_policy: string
+    :return: The devices found.
+    :rtype: CaptureInventory
+    """
+    with CaptureReader(path) as reader:
+        chunks = reader.chunks(chunk_size)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) <= 1:
+        results = [ingest_chunk(path, chunk, conflict_policy) for chunk in chunks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(
+                    ingest_chunk,
+                    [path] * len(chunks),
+                    chunks,
+                    [conflict_policy] * len(chunks),
+                )
+            )
+
+    inventory = CaptureInventory(conflict_policy)
+    for devices, conflicts, duplicates, frames, responses in results:
+        inventory.conflicts.extend(conflicts)
+        inventory.duplicates += duplicates
+        inventory.frames += frames
+        inventory.responses += responses
+        for device in devices:
+            merge_device(inventory, device)
+    return inventory
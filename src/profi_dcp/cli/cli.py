@@ -32,9 +32,9 @@ def main():
 
     args = parser.parse_args()
     if args.verbose:
-        Logging(logging.DEBUG)
+        Logging(logging.DEBUG, rich=True)
     else:
-        Logging(logging.WARNING)
+        Logging(logging.WARNING, rich=True)
 
     args.func(args)
 
@@ -34,12 +34,11 @@ def identify_func(args):
         return
 
     if args.mac:
-        try:
-            device = next(dev for dev in identified_devices if dev.MAC == args.mac)
-            device.to_log()
-        except StopIteration:
+        device = identified_devices.by_mac.get(args.mac.lower())
+        if device is None:
             Logging.logger.error(f"MAC {args.mac} not found")
             return
+        device.to_log()
     else:
         Logging.logger.info(f"Found {len(identified_devices)} devices:")
         for dev in identified_devices:
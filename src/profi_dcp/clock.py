@@ -0,0 +1,103 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import threading
+import time
+
+
+class Clock:
+    """
+    The clock DCP and the in-memory transports use to measure timeouts and to wait. This default implementation uses
+    the system time, see VirtualClock for a clock that advances instantly.
+    """
+
+    def time(self):
+        """
+        Get the current time.
+        :return: The current time in seconds.
+        :rtype: float
+        """
+        return time.time()
+
+    def sleep(self, seconds):
+        """
+        Wait for the given time.
+        :param seconds: The time to wait in seconds.
+        :type seconds: float
+        """
+        time.sleep(seconds)
+
+    def wait(self, condition, timeout):
+        """
+        Wait until the given condition is notified or the timeout expires. The condition must be acquired by the
+        caller.
+        :param condition: The condition to wait for.
+        :type condition: threading.Condition
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        """
+        condition.wait(timeout)
+
+
+class VirtualClock(Clock):
+    """
+    A clock whose time only advances when it is told to: sleeping or waiting advances the time instantly by the full
+    duration instead of blocking. Optionally, every reading of the time advances it by a fixed step, so that loops
+    polling a transport without a timeout (e.g. a mocked socket) terminate after a deterministic number of iterations.
+    """
+
+    def __init__(self, start=0.0, step=0.0):
+        """
+        Create a new virtual clock.
+        :param start: The initial time in seconds. Default is 0.
+        :type start: float
+        :param step: The time in seconds by which each call to time() advances the clock. Default is 0.
+        :type step: float
+        """
+        self.now = start
+        self.step = step
+        self.__lock = threading.Lock()
+
+    def time(self):
+        """
+        Get the current virtual time and advance it by the step.
+        :return: The current time in seconds.
+        :rtype: float
+        """
+        with self.__lock:
+            now = self.now
+            self.now += self.step
+            return now
+
+    def sleep(self, seconds):
+        """
+        Advance the time by the given duration without blocking.
+        :param seconds: The time to wait in seconds.
+        :type seconds: float
+        """
+        self.advance(seconds)
+
+    def wait(self, condition, timeout):
+        """
+        Advance the time by the timeout without blocking, as no other thread can notify the condition in virtual time.
+        :param condition: The condition to wait for (unused).
+        :type condition: threading.Condition
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        """
+        self.advance(timeout)
+
+    def advance(self, seconds):
+        """
+        Advance the time by the given duration.
+        :param seconds: The duration in seconds, negative values are ignored.
+        :type seconds: float
+        """
+        with self.__lock:
+            self.now += max(seconds, 0)
+
+
+# the system clock used when no other clock is given
+system_clock = Clock()
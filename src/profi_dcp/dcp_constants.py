@@ -8,6 +8,10 @@ All Rights Reserved.
 PROFINET_MULTICAST_MAC_IDENTIFY = "01:0e:cf:00:00:00"
 # the response delay value for DCP requests
 RESPONSE_DELAY = 0x0080
+# the largest response delay factor allowed by the DCP specification
+MAX_RESPONSE_DELAY = 0x1900
+# the time in seconds corresponding to one step of the response delay factor
+RESPONSE_DELAY_UNIT = 0.01
 # Ether type of DCP packets
 ETHER_TYPE = 0x8892
 # Value for letting the LED blink
@@ -19,6 +23,7 @@ class FrameID:
 
     GET_SET = 0xFEFD
     IDENTIFY_REQUEST = 0xFEFE
+    IDENTIFY_RESPONSE = 0xFEFF
 
 
 class BlockQualifier:
@@ -0,0 +1,377 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import atexit
+import errno
+import logging
+import socket
+import struct
+import sys
+import threading
+
+from profi_dcp.utils.logging import Logging
+
+# ioctl request codes (see linux/sockios.h)
+SIOCGIFCONF = 0x8912
+SIOCGIFFLAGS = 0x8913
+SIOCGIFNETMASK = 0x891B
+SIOCGIFHWADDR = 0x8927
+# interface flag signaling that the interface is up (see linux/if.h)
+IFF_UP = 0x1
+IFNAMSIZ = 16
+# size of struct ifreq: the interface name followed by a union of at most 24 (64 bit) or 16 (32 bit) bytes
+IFREQ_SIZE = IFNAMSIZ + (24 if struct.calcsize("P") == 8 else 16)
+
+# rtnetlink multicast groups notifying about link and address changes (see linux/rtnetlink.h)
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+
+
+class NetworkInterface:
+    """A network interface defined by its name, mac address, IP addresses and state."""
+
+    def __init__(self, name, mac_address, ipv4_addresses, ipv6_addresses, is_up):
+        """
+        Create a new network interface.
+        :param name: The name of the network interface.
+        :type name: string
+        :param mac_address: The mac address (as ':' separated lower-case string) or None if the interface has none.
+        :type mac_address: Optional[string]
+        :param ipv4_addresses: The IPv4 addresses of the interface as pairs of address and netmask.
+        :type ipv4_addresses: List[Tuple[string, Optional[string]]]
+        :param ipv6_addresses: The IPv6 addresses of the interface.
+        :type ipv6_addresses: List[string]
+        :param is_up: Whether the interface is up.
+        :type is_up: boolean
+        """
+        self.name = name
+        self.mac_address = mac_address
+        self.ipv4_addresses = ipv4_addresses
+        self.ipv6_addresses = ipv6_addresses
+        self.is_up = is_up
+
+    def __str__(self):
+        """
+        Return a human-readable string representation of the network interface.
+        :return: String representation of this interface.
+        :rtype: string
+        """
+        parameters = [f"{name}={value}" for name, value in vars(self).items()]
+        return f"NetworkInterface({', '.join(parameters)})"
+
+
+def psutil_interfaces():
+    """
+    Enumerate all network interfaces with psutil (available on all platforms).
+    :return: All network interfaces.
+    :rtype: List[NetworkInterface]
+    """
+    import psutil
+
+    stats = psutil.net_if_stats()
+    interfaces = []
+    for name, addresses in psutil.net_if_addrs().items():
+        mac_addresses = [a.address for a in addresses if a.family == psutil.AF_LINK]
+        interfaces.append(
+            NetworkInterface(
+                name,
+                mac_addresses[0].replace("-", ":").lower() if mac_addresses else None,
+                [
+                    (a.address, a.netmask)
+                    for a in addresses
+                    if a.family == socket.AF_INET
+                ],
+                [a.address for a in addresses if a.family == socket.AF_INET6],
+                name in stats and getattr(stats[name], "isup"),
+            )
+        )
+    return interfaces
+
+
+def ioctl_interfaces():
+    """
+    Enumerate all network interfaces with an IP address directly with SIOCGIFCONF (IPv4) and /proc/net/if_inet6 (IPv6)
+    and query their netmask, mac address and flags with one ioctl each (Linux only). This avoids the overhead of psutil,
+    which inspects every interface of the system including those without IP address.
+    :return: All network interfaces with an IP address.
+    :rtype: List[NetworkInterface]
+    """
+    import array
+    import fcntl
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+
+        def ioctl(request, name):
+            return fcntl.ioctl(
+                sock.fileno(), request, struct.pack(f"{IFREQ_SIZE}s", name)
+            )
+
+        def get_interface(name):
+            if name not in interfaces:
+                flags = ioctl(SIOCGIFFLAGS, name)[16:18]
+                hardware_address = ioctl(SIOCGIFHWADDR, name)[18:24]
+                interfaces[name] = NetworkInterface(
+                    name.decode(),
+                    ":".join(format(num, "02x") for num in hardware_address),
+                    [],
+                    [],
+                    bool(struct.unpack("H", flags)[0] & IFF_UP),
+                )
+            return interfaces[name]
+
+        # call SIOCGIFCONF with a growing buffer until all interfaces fit into it
+        max_interfaces = 64
+        while True:
+            buffer = array.array("B", bytes(IFREQ_SIZE * max_interfaces))
+            buffer_address, _ = buffer.buffer_info()
+            ifconf = struct.pack("iP", len(buffer), buffer_address)
+            length, _ = struct.unpack(
+                "iP", fcntl.ioctl(sock.fileno(), SIOCGIFCONF, ifconf)
+            )
+            if length < len(buffer):
+                break
+            max_interfaces *= 2
+        data = buffer.tobytes()[:length]
+
+        interfaces = {}
+        for offset in range(0, length, IFREQ_SIZE):
+            label = data[offset : offset + IFNAMSIZ].split(b"\x00", 1)[0]
+            ip_address = socket.inet_ntoa(data[offset + 20 : offset + 24])
+            netmask = socket.inet_ntoa(ioctl(SIOCGIFNETMASK, label)[20:24])
+            # aliases (e.g. eth0:1) belong to the underlying interface
+            interface = get_interface(label.split(b":", 1)[0])
+            interface.ipv4_addresses.append((ip_address, netmask))
+
+        try:
+            with open("/proc/net/if_inet6") as if_inet6:
+                for line in if_inet6:
+                    address, _, _, scope, _, name = line.split()
+                    ip_address = socket.inet_ntop(
+                        socket.AF_INET6, bytes.fromhex(address)
+                    )
+                    if (
+                        int(scope, 16) == 0x20
+                    ):  # link-local addresses carry the interface as scope id
+                        ip_address = f"{ip_address}%{name}"
+                    get_interface(name.encode()).ipv6_addresses.append(ip_address)
+        except OSError:
+            Logging.logger.debug("Cannot read IPv6 addresses from /proc/net/if_inet6")
+
+    return list(interfaces.values())
+
+
+class InterfaceResolver:
+    """
+    Resolves IP addresses to the network interface and mac address to use for DCP.
+    On Linux, the interfaces are enumerated with ioctls and cached: the cache is only rebuilt after the kernel announced
+    a change of links or addresses via rtnetlink. The IP address of the interface is looked up in a dictionary, only IPv6
+    addresses and addresses of the same subnet require a linear search.
+    """
+
+    def __init__(self, enumerate_interfaces=None, watch_changes=True):
+        """
+        Create a new resolver.
+        :param enumerate_interfaces: Function returning all network interfaces. Default is ioctl_interfaces on Linux and
+        psutil_interfaces on all other platforms.
+        :type enumerate_interfaces: Optional[Callable[[], List[NetworkInterface]]]
+        :param watch_changes: Whether to cache the interfaces and watch for changes with rtnetlink. If False or if
+        rtnetlink is not available, the interfaces are enumerated again for each lookup.
+        :type watch_changes: boolean
+        """
+        if enumerate_interfaces is None:
+            if sys.platform.startswith("linux"):
+                enumerate_interfaces = ioctl_interfaces
+            else:
+                enumerate_interfaces = psutil_interfaces
+        self.__enumerate_interfaces = enumerate_interfaces
+        self.__lock = threading.Lock()
+        self.__interfaces = None
+        self.__by_ipv4 = {}
+        self.__watcher = self.__open_watcher() if watch_changes else None
+
+    @staticmethod
+    def __open_watcher():
+        """
+        Open a non-blocking rtnetlink socket subscribed to link and address changes.
+        :return: The rtnetlink socket or None if rtnetlink is not available.
+        :rtype: Optional[socket.socket]
+        """
+        if not hasattr(socket, "AF_NETLINK"):
+            return None
+        try:
+            watcher = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            watcher.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+            watcher.setblocking(False)
+            return watcher
+        except OSError as error:
+            Logging.logger.debug("Cannot watch interface changes: %s", error)
+            return None
+
+    def __changed(self):
+        """
+        Drain all pending notifications from the rtnetlink socket.
+        :return: Whether any change was announced since the last call.
+        :rtype: boolean
+        """
+        changed = False
+        while True:
+            try:
+                changed = self.__watcher.recv(65536) is not None or changed
+            except BlockingIOError:
+                return changed
+            except OSError as error:
+                # notifications were lost (ENOBUFS) or the socket failed, assume that something changed
+                if error.errno != errno.ENOBUFS:
+                    Logging.logger.debug(
+                        "Cannot watch interface changes anymore: %s", error
+                    )
+                    # enumerate the interfaces for every lookup from now on
+                    self.__watcher.close()
+                    self.__watcher = None
+                return True
+
+    def close(self):
+        """Stop watching for changes and close the rtnetlink socket, the interfaces are enumerated for each lookup."""
+        with self.__lock:
+            if self.__watcher is not None:
+                self.__watcher.close()
+                self.__watcher = None
+            self.__interfaces = None
+
+    def invalidate(self):
+        """Discard the cached interfaces, they are enumerated again on the next lookup."""
+        with self.__lock:
+            self.__interfaces = None
+
+    def interfaces(self):
+        """
+        Return all network interfaces, enumerated again if necessary.
+        :return: All network interfaces.
+        :rtype: List[NetworkInterface]
+        """
+        with self.__lock:
+            if self.__watcher is None or self.__changed():
+                self.__interfaces = None
+            if self.__interfaces is None:
+                self.__interfaces = self.__enumerate_interfaces()
+                self.__by_ipv4 = {
+                    ip_address: interface
+                    for interface in reversed(self.__interfaces)
+                    for ip_address, _ in interface.ipv4_addresses
+                }
+            return self.__interfaces
+
+    def resolve(self, ip_address, subnet_mask="255.255.255.0"):
+        """
+        Get the mac address, name and IPv4 address of the network interface corresponding to the given IP address.
+        An interface matches if it has the given IPv4 address, an IPv6 address starting with the given address, or an
+        IPv4 address in the same subnet (defined by the given subnet mask). Interfaces without mac address or which are
+        not up are skipped.
+        If no interface with the given IP address is found, a ValueError is raised.
+        :param ip_address: The IP address to select the network interface with.
+        :type ip_address: string
+        :param subnet_mask: The subnet mask used to match interfaces in the same subnet.
+        :type subnet_mask: string
+        :return: MAC-address, Interface name, IPv4 address of the interface
+        :rtype: Tuple[string, string, Optional[string]]
+        """
+        interfaces = self.interfaces()
+
+        # fast path: the IPv4 address of an interface was given
+        interface = self.__by_ipv4.get(ip_address)
+        if interface is not None and self.__usable(interface, ip_address):
+            return self.__result(interface, ip_address)
+
+        import ipaddress
+
+        # the subnet is only used for IPv4 (an invalid address raises a ValueError here)
+        network = None
+        if ":" not in str(ip_address):
+            network = ipaddress.ip_network(f"{ip_address}/{subnet_mask}", strict=False)
+
+        for interface in interfaces:
+            ipv6_match = network is None and any(
+                address.startswith(ip_address) for address in interface.ipv6_addresses
+            )
+            network_match = network is not None and any(
+                ipaddress.ip_address(address) in network
+                for address, _ in interface.ipv4_addresses
+            )
+            if (ipv6_match or network_match) and self.__usable(interface, ip_address):
+                return self.__result(interface, ip_address)
+
+        if Logging.logger.isEnabledFor(logging.DEBUG):
+            Logging.logger.debug(
+                "Could not find a network interface for ip %s in %s",
+                ip_address,
+                [str(i) for i in interfaces],
+            )
+        raise ValueError(f"Could not find a network interface for ip {ip_address}.")
+
+    @staticmethod
+    def __usable(interface, ip_address):
+        """
+        Check whether the interface matching the given IP address can be used for DCP, i.e. has a mac address and is up.
+        :param interface: The matching interface.
+        :type interface: NetworkInterface
+        :param ip_address: The IP address used to select the interface.
+        :type ip_address: string
+        :return: Whether the interface can be used.
+        :rtype: boolean
+        """
+        if not interface.mac_address:
+            Logging.logger.warning(
+                "Found network interface '%s' matching the ip %s but no corresponding mac address",
+                interface.name,
+                ip_address,
+            )
+            return False
+        if not interface.is_up:
+            Logging.logger.warning(
+                "Found network interface '%s' matching the ip %s but is not up.",
+                interface.name,
+                ip_address,
+            )
+            return False
+        return True
+
+    @staticmethod
+    def __result(interface, ip_address):
+        """
+        Create the result of a lookup for the given interface.
+        :param interface: The matching interface.
+        :type interface: NetworkInterface
+        :param ip_address: The IP address used to select the interface.
+        :type ip_address: string
+        :return: MAC-address, Interface name, IPv4 address of the interface
+        :rtype: Tuple[string, string, Optional[string]]
+        """
+        Logging.logger.info(
+            "Found network interface '%s' by ip %s", interface.name, ip_address
+        )
+        if_ip_address = (
+            interface.ipv4_addresses[0][0] if interface.ipv4_addresses else None
+        )
+        return interface.mac_address, interface.name, if_ip_address
+
+
+_default_resolver = None
+_default_resolver_lock = threading.Lock()
+
+
+def default_resolver():
+    """
+    Return the resolver shared by all DCP instances, it is created on first use and closed when the interpreter exits.
+    :return: The default resolver.
+    :rtype: InterfaceResolver
+    """
+    global _default_resolver
+    with _default_resolver_lock:
+        if _default_resolver is None:
+            _default_resolver = InterfaceResolver()
+            atexit.register(_default_resolver.close)
+        return _default_resolver
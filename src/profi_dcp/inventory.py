@@ -0,0 +1,229 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import collections
+
+# two responses of the same device (mac address) with different data: the device kept in the inventory and the other
+Conflict = collections.namedtuple("Conflict", ["mac", "kept", "discarded"])
+
+
+class Inventory(list):
+    """
+    The devices found by a scan (identify_all or identify_sweep). It is a list of devices with additional information
+    about the scan, most notably whether responses may have been lost on the receiving side.
+    Each device (identified by its mac address) occurs only once: devices are added with add, which merges duplicate
+    responses (e.g. retransmissions, mirrored ports or overlapping partitions of a sweep). If the responses of a device
+    differ, the conflict policy decides which data is kept and the conflict is recorded.
+    The list methods adding devices (append, extend, insert and +=) merge devices like add, the methods removing devices
+    keep the mac address lookup (by_mac) in sync. Devices cannot be replaced by index.
+    """
+
+    # conflict policies: keep the data of the newest or of the first response of a device
+    KEEP_NEWEST = "newest"
+    KEEP_FIRST = "first"
+
+    # the attributes of a device compared to detect conflicting responses
+    FIELDS = ("name_of_station", "IP", "netmask", "gateway", "family")
+    # the attributes of a device describing its response, taken from the newest of identical responses (KEEP_NEWEST)
+    TIMES = ("timestamp", "response_time")
+
+    def __init__(self, devices=(), drops=None, conflict_policy=KEEP_NEWEST):
+        """
+        Create a new inventory.
+        :param devices: The devices found by the scan, added with add.
+        :type devices: Iterable[Device]
+        :param drops: The number of frames dropped by the receiving socket during the scan (e.g. because its receive
+        queue overflowed), None if the socket does not report dropped frames.
+        :type drops: Optional[int]
+        :param conflict_policy: Which data to keep if the responses of a device differ, KEEP_NEWEST or KEEP_FIRST.
+        :type conflict_policy: string
+        """
+        super().__init__()
+        if conflict_policy not in (self.KEEP_NEWEST, self.KEEP_FIRST):
+            raise ValueError(f"Unknown conflict policy '{conflict_policy}'.")
+        self.drops = drops
+        self.conflict_policy = conflict_policy
+        # the devices by mac address, in the order they were found
+        self.by_mac = {}
+        # the number of responses merged into a device already in the inventory
+        self.duplicates = 0
+        self.conflicts = []
+        # the position of each device in the list by mac address, None if it must be rebuilt (after a removal)
+        self.__positions = {}
+        for device in devices:
+            self.add(device)
+
+    def add(self, device):
+        """
+        Add a device to the inventory, or merge it with the device with the same mac address.
+        :param device: The device to add.
+        :type device: Device
+        :return: Whether the device was not in the inventory yet.
+        :rtype: boolean
+        """
+        return self.__add(len(self), device)
+
+    def update(self, devices):
+        """
+        Add all given devices, see add.
+        :param devices: The devices to add.
+        :type devices: Iterable[Device]
+        """
+        for device in devices:
+            self.add(device)
+
+    def append(self, device):
+        """Add a device, see add."""
+        self.add(device)
+
+    def extend(self, devices):
+        """Add all given devices, see add."""
+        self.update(devices)
+
+    def __iadd__(self, devices):
+        self.update(devices)
+        return self
+
+    def insert(self, index, device):
+        """
+        Insert a device at the given position, or merge it with the device with the same mac address (see add).
+        :param index: The position to insert the device at.
+        :type index: int
+        :param device: The device to insert.
+        :type device: Device
+        """
+        self.__add(index, device)
+
+    def remove(self, device):
+        """Remove the first occurrence of the given device."""
+        super().remove(device)
+        self.__forget([device])
+
+    def pop(self, index=-1):
+        """Remove and return the device at the given position (default last)."""
+        device = super().pop(index)
+        self.__forget([device])
+        return device
+
+    def clear(self):
+        """Remove all devices."""
+        super().clear()
+        self.by_mac.clear()
+        self.__positions = {}
+
+    def sort(self, *args, **kwargs):
+        """Sort the devices in place, see list.sort."""
+        super().sort(*args, **kwargs)
+        self.__positions = None
+
+    def reverse(self):
+        """Reverse the order of the devices in place."""
+        super().reverse()
+        self.__positions = None
+
+    def __delitem__(self, index):
+        removed = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        self.__forget(removed)
+
+    def __setitem__(self, index, device):
+        raise TypeError("Devices of an inventory cannot be replaced, use add.")
+
+    def __reduce__(self):
+        # unpickling a list appends the devices before the attributes are restored, which add requires
+        return _restore, (type(self), list(self), self.__dict__)
+
+    def __add(self, index, device):
+        """
+        Insert a device at the given position, or merge it with the device with the same mac address.
+        :param index: The position to insert a new device at.
+        :type index: int
+        :param device: The device to add.
+        :type device: Device
+        :return: Whether the device was not in the inventory yet.
+        :rtype: boolean
+        """
+        existing = self.by_mac.get(device.MAC)
+        if existing is None:
+            self.by_mac[device.MAC] = device
+            if index >= len(self):
+                if self.__positions is not None:
+                    self.__positions[device.MAC] = len(self)
+                super().append(device)
+            else:
+                super().insert(index, device)
+                self.__positions = None
+            return True
+
+        self.duplicates += 1
+        if self.__data(existing) != self.__data(device):
+            if self.conflict_policy == self.KEEP_NEWEST:
+                self.by_mac[device.MAC] = device
+                super().__setitem__(self.__position(device.MAC), device)
+                self.conflicts.append(Conflict(device.MAC, device, existing))
+            else:
+                self.conflicts.append(Conflict(device.MAC, existing, device))
+        elif self.conflict_policy == self.KEEP_NEWEST:
+            # the data is the same, but the times of the newest response are kept
+            for field in self.TIMES:
+                value = getattr(device, field, None)
+                if value is not None:
+                    setattr(existing, field, value)
+        return False
+
+    def __position(self, mac):
+        """
+        Get the position of the device with the given mac address in the list.
+        :param mac: The mac address of the device.
+        :type mac: string
+        :return: The position.
+        :rtype: int
+        """
+        if self.__positions is None:
+            self.__positions = {device.MAC: index for index, device in enumerate(self)}
+        return self.__positions[mac]
+
+    def __forget(self, devices):
+        """
+        Remove the given devices, which were removed from the list, from the mac address lookup.
+        :param devices: The removed devices.
+        :type devices: Iterable[Device]
+        """
+        for device in devices:
+            if self.by_mac.get(device.MAC) is device:
+                del self.by_mac[device.MAC]
+        self.__positions = None
+
+    def __data(self, device):
+        """
+        Get the data of a device compared to detect conflicts.
+        :param device: The device.
+        :type device: Device
+        :return: The values of the compared attributes.
+        :rtype: Tuple
+        """
+        return tuple(getattr(device, field, None) for field in self.FIELDS)
+
+
+def _restore(inventory_type, devices, state):
+    """
+    Restore a pickled inventory.
+    :param inventory_type: The class of the inventory.
+    :type inventory_type: type
+    :param devices: The devices of the inventory.
+    :type devices: List[Device]
+    :param state: The attributes of the inventory.
+    :type state: dict
+    :return: The inventory.
+    :rtype: Inventory
+    """
+    inventory = inventory_type.__new__(inventory_type)
+    list.extend(inventory, devices)
+    inventory.__dict__.update(state)
+    # a copy must not share the lookup and the conflicts with the original
+    inventory.by_mac = dict(inventory.by_mac)
+    inventory.conflicts = list(inventory.conflicts)
+    inventory._Inventory__positions = None
+    return inventory
@@ -4,12 +4,63 @@ Copyright (c) 2021 Codewerk GmbH, Karlsruhe.
 All Rights Reserved.
 """
 
+import importlib
 import sys
 from .l2socket import L2PcapSocket, L2LinuxSocket
+from .transport import Frame, L2Transport, PacketStatistics
+
+# classes only needed for testing, replay and recording, imported on first access to keep importing DCP light
+LAZY_EXPORTS = {
+    "L2MemorySocket": "memory",
+    "MemoryNetwork": "memory",
+    "CaptureReader": "pcap_file",
+    "PcapFileSocket": "pcap_file",
+    "PcapngWriter": "pcap_file",
+}
+
+if sys.version_info < (3, 7):
+    # module level __getattr__ requires python 3.7
+    from .memory import L2MemorySocket, MemoryNetwork
+    from .pcap_file import CaptureReader, PcapFileSocket, PcapngWriter
 
 if sys.platform == "win32":
     L2Socket = L2PcapSocket
+    BACKENDS = {"pcap": L2PcapSocket}
 elif sys.platform.startswith("linux"):
     L2Socket = L2LinuxSocket
+    BACKENDS = {"raw": L2LinuxSocket, "pcap": L2PcapSocket}
 else:
     raise NotImplementedError(f"Platform {sys.platform} is currently not supported.")
+
+
+def get_l2socket(backend=None):
+    """
+    Return the L2 socket class of the given backend.
+    :param backend: The name of the backend, one of BACKENDS ("pcap" on all platforms, "raw" on Linux). If None, the
+    default backend of the platform (L2Socket) is returned.
+    :type backend: Optional[string]
+    :return: The L2 socket class.
+    :rtype: type
+    """
+    if backend is None:
+        return L2Socket
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown L2 socket backend '{backend}', use one of {list(BACKENDS)}."
+        )
+    return BACKENDS[backend]
+
+
+def __getattr__(name):
+    """
+    Import the lazily exported classes on first access.
+    :param name: The name of the attribute.
+    :type name: string
+    :return: The class.
+    :rtype: type
+    """
+    if name not in LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{LAZY_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
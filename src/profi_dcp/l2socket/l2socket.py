@@ -4,14 +4,34 @@ Copyright (c) 2021 Codewerk GmbH, Karlsruhe.
 All Rights Reserved.
 """
 
-from profi_dcp.l2socket.pcap_wrapper import PcapWrapper
+import collections
 import socket
+import struct
+import sys
+import threading
 
+from profi_dcp.l2socket.transport import Frame, L2Transport, PacketStatistics
+from profi_dcp.metrics import Metrics
+from profi_dcp.utils.logging import Logging
 
-class L2PcapSocket:
-    """An L2 socket based on a wrapper around the Pcap (WinPcap/Npcap) DLL."""
 
-    def __init__(self, ip, bpf_filter=None, **kwargs):
+class L2PcapSocket(L2Transport):
+    """An L2 socket based on a wrapper around Pcap (the WinPcap/Npcap DLL on Windows, libpcap on Linux)."""
+
+    # Ethernet frame with VLAN tag, without FCS
+    MAX_FRAME_SIZE = 1518
+
+    def __init__(
+        self,
+        ip,
+        bpf_filter=None,
+        interface=None,
+        buffer_size=None,
+        immediate=True,
+        snaplen=MAX_FRAME_SIZE,
+        ring_size=None,
+        **kwargs,
+    ):
         """
         Open a socket on the network interface with the given IP and using the given BPF filter.
         :param ip: The IP address to open the socket on.
@@ -19,14 +39,43 @@ class L2PcapSocket:
         :param bpf_filter: The BPF filter used to filter incoming packets directly within pcap (offers better
         performance than receiving all packets and only filtering in python).
         :type bpf_filter: string
+        :param interface: The name of the network interface. If given, it is used as pcap device name on all platforms
+        except Windows (where pcap uses its own device names). Otherwise, the device is looked up by its IP.
+        :type interface: Optional[string]
+        :param buffer_size: The size of the pcap capture buffer in bytes. Default is the default of pcap.
+        :type buffer_size: Optional[int]
+        :param immediate: Whether pcap delivers packets immediately (immediate mode). Default is True.
+        :type immediate: boolean
+        :param snaplen: The maximum number of bytes captured per packet. Default is the size of an ethernet frame with
+        VLAN tag, which is enough for all DCP packets and allows pcap to buffer many more packets than the maximum
+        snaplen.
+        :type snaplen: int
+        :param ring_size: The maximum number of received packets buffered until they are read with recv. Default is
+        PcapWrapper.RING_SIZE.
+        :type ring_size: Optional[int]
         """
+        # imported here as loading the ctypes bindings is only necessary when pcap is actually used
+        from profi_dcp.l2socket.pcap_wrapper import PcapWrapper
+
         self.pcap = PcapWrapper()
-        pcap_device_name = self.pcap.get_device_name_from_ip(ip)
+        if interface and sys.platform != "win32":
+            pcap_device_name = interface
+        else:
+            pcap_device_name = self.pcap.get_device_name_from_ip(ip)
         if not pcap_device_name:
             raise ValueError(f"No pcap network interface for ip {ip} found.")
-        self.pcap.open(pcap_device_name)
+        self.pcap.open(
+            pcap_device_name,
+            buffer_size=buffer_size,
+            immediate=immediate,
+            snaplen=snaplen,
+            ring_size=ring_size or PcapWrapper.RING_SIZE,
+        )
         if bpf_filter:
             self.pcap.set_bpf_filter(bpf_filter)
+        # packets received in a batch but not yet returned by recv
+        self.__pending = collections.deque()
+        self.metrics = Metrics()
 
     def recv(self):
         """
@@ -34,7 +83,33 @@ class L2PcapSocket:
         :return: The next raw packet (or None if no packet has been received e.g. due to a timeout).
         :rtype: Optional(bytes)
         """
-        return self.pcap.get_next_packet()
+        if not self.__pending:
+            self.__pending.extend(self.__get_packets())
+        return self.__pending.popleft() if self.__pending else None
+
+    def recv_batch(self, max_count=64):
+        """
+        Receive all packets currently available (at most max_count), waiting up to the timeout if there are none.
+        :param max_count: The maximum number of packets to return. Default is 64.
+        :type max_count: int
+        :return: The received raw packets (empty if no packet has been received e.g. due to a timeout).
+        :rtype: List(bytes)
+        """
+        if not self.__pending:
+            return self.__get_packets(max_count)
+        batch = []
+        while self.__pending and len(batch) < max_count:
+            batch.append(self.__pending.popleft())
+        return batch
+
+    def statistics(self):
+        """
+        Get the number of packets received by the socket and dropped because the receive ring was full.
+        :return: The statistics since the socket was opened.
+        :rtype: PacketStatistics
+        """
+        dropped = self.pcap.dropped
+        return PacketStatistics(self.metrics.frames_received + dropped, dropped)
 
     def send(self, data):
         """
@@ -43,19 +118,55 @@ class L2PcapSocket:
         :type data: Any, will be converted to bytes
         """
         self.pcap.send(bytes(data))
+        self.metrics.frames_sent += 1
 
     def close(self):
         """Close the connection."""
         self.pcap.close()
 
+    def __get_packets(self, max_count=64):
+        """
+        Get the packets received by pcap and count them in the metrics.
+        :param max_count: The maximum number of packets to return. Default is 64.
+        :type max_count: int
+        :return: The received raw packets.
+        :rtype: List(bytes)
+        """
+        packets = self.pcap.get_packets(max_count)
+        self.metrics.frames_received += len(packets)
+        self.metrics.frames_dropped = self.pcap.dropped
+        return packets
+
 
-class L2LinuxSocket:
+class L2LinuxSocket(L2Transport):
     """An L2 socket using a raw socket from python's socket module."""
 
     MTU = 0xFFFF
     ETH_P_ALL = 3
+    # socket options, not all of them are defined by python's socket module
+    SOL_PACKET = 263
+    PACKET_STATISTICS = 6
+    PACKET_QDISC_BYPASS = 20
+    SO_RCVBUFFORCE = 33
+    SO_TIMESTAMPNS = 35
+    # struct timespec of the SO_TIMESTAMPNS control message
+    TIMESPEC = struct.Struct("@ll")
+    # struct tpacket_stats: tp_packets, tp_drops
+    TPACKET_STATS = struct.Struct("II")
+    # kernel memory accounted against the receive buffer per queued frame (the truesize of a socket buffer holding a
+    # small frame), chosen conservatively as it depends on the network driver
+    FRAME_TRUESIZE = 2304
 
-    def __init__(self, interface, recv_timeout=1, protocol=None, **kwargs):
+    def __init__(
+        self,
+        interface,
+        recv_timeout=1,
+        protocol=None,
+        receive_buffer_size=None,
+        timestamps=True,
+        qdisc_bypass=False,
+        **kwargs,
+    ):
         """
         Open a socket on the given network interface.
         :param interface: The network interface to open the socket on.
@@ -66,6 +177,16 @@ class L2LinuxSocket:
         :param protocol: The ethernet protocol number, only packets of that protocol will be received. If not specified
         ETH_P_ALL is used, receiving all ethernet packets.
         :type protocol: int
+        :param receive_buffer_size: The size of the socket receive buffer in bytes, see set_receive_buffer_size.
+        Default is the default of the kernel (net.core.rmem_default).
+        :type receive_buffer_size: Optional[int]
+        :param timestamps: Whether the kernel timestamps received packets (SO_TIMESTAMPNS), recv then returns the
+        packets as Frame with the receive timestamp. Default is True.
+        :type timestamps: boolean
+        :param qdisc_bypass: Whether sent packets bypass the queuing discipline of the network interface
+        (PACKET_QDISC_BYPASS) for the lowest latency. Packets are then dropped instead of queued if the transmit queue
+        of the network driver is full. Default is False.
+        :type qdisc_bypass: boolean
         """
         protocol = protocol or self.ETH_P_ALL
         self.socket = socket.socket(
@@ -73,25 +194,141 @@ class L2LinuxSocket:
         )
         self.socket.settimeout(recv_timeout)
         self.socket.bind((interface, 0))
+        self.metrics = Metrics()
+        # the kernel resets its statistics whenever they are read, so they are accumulated here
+        self.__packets = 0
+        self.__drops = 0
+        self.__statistics_lock = threading.Lock()
+        if receive_buffer_size:
+            self.set_receive_buffer_size(receive_buffer_size)
+        self.timestamps = timestamps
+        if timestamps:
+            self.socket.setsockopt(socket.SOL_SOCKET, self.SO_TIMESTAMPNS, 1)
+            self.__ancillary_size = socket.CMSG_SPACE(self.TIMESPEC.size)
+        if qdisc_bypass:
+            self.socket.setsockopt(self.SOL_PACKET, self.PACKET_QDISC_BYPASS, 1)
+
+    @property
+    def receive_buffer_size(self):
+        """
+        The current size of the socket receive buffer in bytes, as reported by the kernel (i.e. including the
+        bookkeeping overhead, twice the size that was set).
+        :rtype: int
+        """
+        return self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+    def set_receive_buffer_size(self, size, force=True):
+        """
+        Set the size of the socket receive buffer. With force, SO_RCVBUFFORCE is used to exceed the limit
+        net.core.rmem_max, which requires the capability CAP_NET_ADMIN. Without it (or without the capability),
+        SO_RCVBUF is used and the size is limited to net.core.rmem_max.
+        :param size: The requested size in bytes, the kernel doubles it to account for its bookkeeping overhead.
+        :type size: int
+        :param force: Whether to try exceeding net.core.rmem_max. Default is True.
+        :type force: boolean
+        :return: The resulting size of the receive buffer as reported by the kernel.
+        :rtype: int
+        """
+        if force:
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, self.SO_RCVBUFFORCE, size)
+                return self.receive_buffer_size
+            except PermissionError:
+                Logging.logger.debug(
+                    "SO_RCVBUFFORCE not permitted, receive buffer limited to net.core.rmem_max"
+                )
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+        return self.receive_buffer_size
+
+    def reserve_frames(self, frame_count):
+        """
+        Grow the receive buffer so that it can hold at least the given number of frames, it is never shrunk.
+        :param frame_count: The number of frames expected in a burst.
+        :type frame_count: int
+        """
+        required = frame_count * self.FRAME_TRUESIZE
+        if required > self.receive_buffer_size:
+            # the kernel doubles the requested size
+            size = self.set_receive_buffer_size((required + 1) // 2)
+            if size < required:
+                Logging.logger.warning(
+                    "Receive buffer of %s bytes is too small for %s frames, frames may be dropped",
+                    size,
+                    frame_count,
+                )
+
+    def statistics(self):
+        """
+        Get the number of packets received by the socket (including the dropped ones) and dropped because the receive
+        buffer was full, read with the socket option PACKET_STATISTICS.
+        :return: The statistics since the socket was opened.
+        :rtype: PacketStatistics
+        """
+        with self.__statistics_lock:
+            packets, drops = self.TPACKET_STATS.unpack(
+                self.socket.getsockopt(
+                    self.SOL_PACKET, self.PACKET_STATISTICS, self.TPACKET_STATS.size
+                )
+            )
+            self.__packets += packets
+            self.__drops += drops
+            self.metrics.frames_dropped = self.__drops
+            return PacketStatistics(self.__packets, self.__drops)
 
     def recv(self):
         """
         Receive the next packet from the socket.
-        :return: The next raw packet (or None if no packet has been received e.g. due to a timeout).
+        :return: The next raw packet (or None if no packet has been received e.g. due to a timeout), as Frame with
+        the kernel receive timestamp if timestamps are enabled.
         :rtype: Optional(bytes)
         """
         try:
-            return self.socket.recv(self.MTU)
+            if not self.timestamps:
+                packet = self.socket.recv(self.MTU)
+                self.metrics.frames_received += 1
+                return packet
+            packet, ancillary_data, _, _ = self.socket.recvmsg(
+                self.MTU, self.__ancillary_size
+            )
         except socket.timeout:
             return None
+        self.metrics.frames_received += 1
+        timestamp = None
+        for level, kind, data in ancillary_data:
+            if level == socket.SOL_SOCKET and kind == self.SO_TIMESTAMPNS:
+                seconds, nanoseconds = self.TIMESPEC.unpack_from(data)
+                timestamp = seconds + nanoseconds * 1e-9
+        return Frame(packet, timestamp)
 
     def send(self, data):
         """
-        Send the given data as raw packet via pcap.
+        Send the given data as raw packet on the AF_PACKET socket (the data must contain the complete ethernet frame).
         :param data: The data to send.
         :type data: Any, will be converted to bytes
         """
         self.socket.sendall(bytes(data))
+        self.metrics.frames_sent += 1
+
+    def send_batch(self, frames):
+        """
+        Send several raw packets with as few system calls as possible (sendmmsg), falling back to one call per packet
+        if sendmmsg is not available. If the send queue of the socket is full, the next packet is sent with a blocking
+        call before continuing with sendmmsg.
+        :param frames: The packets to send.
+        :type frames: Iterable[bytes]
+        """
+        # ctypes is imported here to keep importing the library light
+        from profi_dcp.l2socket import sendmmsg
+
+        frames = [bytes(frame) for frame in frames]
+        sent = 0
+        while sent < len(frames):
+            if sendmmsg.load():
+                sent += sendmmsg.sendmmsg(self.socket.fileno(), frames[sent:])
+            if sent < len(frames):
+                self.socket.sendall(frames[sent])
+                sent += 1
+        self.metrics.frames_sent += len(frames)
 
     def close(self):
         """Close the connection."""
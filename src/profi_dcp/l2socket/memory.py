@@ -0,0 +1,163 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import heapq
+import itertools
+import threading
+
+from profi_dcp import util
+from profi_dcp.clock import system_clock
+from profi_dcp.l2socket.transport import Frame, L2Transport
+from profi_dcp.metrics import Metrics
+
+
+class MemoryNetwork:
+    """
+    An in-memory ethernet segment. Every frame sent by one of the attached nodes is passed to all other nodes, which
+    decide themselves whether the frame is addressed to them.
+    A node is any object with a receive(frame, sender) method, e.g. an L2MemorySocket or a SimulatedFleet.
+    """
+
+    def __init__(self):
+        """Create a new network without nodes."""
+        self.nodes = []
+        self.__lock = threading.Lock()
+
+    def attach(self, node):
+        """
+        Attach a node to the network.
+        :param node: The node to attach.
+        :type node: Any
+        """
+        with self.__lock:
+            self.nodes = self.nodes + [node]
+
+    def detach(self, node):
+        """
+        Detach a node from the network.
+        :param node: The node to detach.
+        :type node: Any
+        """
+        with self.__lock:
+            self.nodes = [attached for attached in self.nodes if attached is not node]
+
+    def send(self, frame, sender):
+        """
+        Pass a frame sent by the given node to all other nodes.
+        :param frame: The raw frame.
+        :type frame: bytes
+        :param sender: The node that sent the frame.
+        :type sender: Any
+        """
+        for node in self.nodes:
+            if node is not sender:
+                node.receive(frame, sender)
+
+
+class L2MemorySocket(L2Transport):
+    """
+    An L2 transport on a MemoryNetwork. Frames can be delivered with a delay, they are buffered in a priority queue
+    (ordered by delivery time) and returned by recv once they are due.
+    """
+
+    def __init__(self, mac, network=None, recv_timeout=1, clock=None):
+        """
+        Create a new socket and attach it to the given network.
+        :param mac: The mac address of the socket (as ':' separated lower-case string).
+        :type mac: string
+        :param network: The network to attach to. Default is a new network without other nodes.
+        :type network: Optional[MemoryNetwork]
+        :param recv_timeout: The timeout in seconds for recv. Default is 1.
+        :type recv_timeout: float
+        :param clock: The clock used for delivery times and timeouts. With a VirtualClock, recv does not block but
+        advances the time to the next due frame (or the timeout). Default is the system clock.
+        :type clock: Optional[Clock]
+        """
+        self.clock = system_clock if clock is None else clock
+        self.mac = mac.lower()
+        self.mac_bytes = util.mac_address_to_bytes(self.mac)
+        self.network = MemoryNetwork() if network is None else network
+        self.recv_timeout = recv_timeout
+        self.__frames = []
+        self.__sequence = itertools.count()
+        self.__available = threading.Condition()
+        self.metrics = Metrics()
+        self.network.attach(self)
+
+    def receive(self, frame, sender):
+        """
+        Called by the network for every frame sent by another node: deliver it if it is addressed to this socket (or
+        to a multicast/broadcast address).
+        :param frame: The raw frame.
+        :type frame: bytes
+        :param sender: The node that sent the frame.
+        :type sender: Any
+        """
+        destination = frame[:6]
+        if destination[0] & 0x01 or destination == self.mac_bytes:
+            self.deliver(frame)
+
+    def deliver(self, frame, delay=0):
+        """
+        Deliver a frame to this socket after the given delay.
+        :param frame: The raw frame.
+        :type frame: bytes
+        :param delay: The delay in seconds until recv returns the frame.
+        :type delay: float
+        """
+        with self.__available:
+            heapq.heappush(
+                self.__frames, (self.clock.time() + delay, next(self.__sequence), frame)
+            )
+            self.__available.notify()
+
+    def deliver_many(self, frames):
+        """
+        Deliver several frames at once, each after its own delay.
+        :param frames: Pairs of delay in seconds and raw frame.
+        :type frames: Iterable[Tuple[float, bytes]]
+        """
+        now = self.clock.time()
+        with self.__available:
+            for delay, frame in frames:
+                heapq.heappush(
+                    self.__frames, (now + delay, next(self.__sequence), frame)
+                )
+            self.__available.notify()
+
+    def recv(self):
+        """
+        Receive the next due frame, wait up to the timeout if no frame is due. The frame is timestamped with its
+        delivery time.
+        :return: The next raw packet (or None if no packet has been received before the timeout).
+        :rtype: Optional(Frame)
+        """
+        timed_out = self.clock.time() + self.recv_timeout
+        with self.__available:
+            while True:
+                now = self.clock.time()
+                if self.__frames and self.__frames[0][0] <= now:
+                    self.metrics.frames_received += 1
+                    due, _, frame = heapq.heappop(self.__frames)
+                    return Frame(frame, due)
+                if now >= timed_out:
+                    return None
+                wait_until = timed_out
+                if self.__frames:
+                    wait_until = min(wait_until, self.__frames[0][0])
+                self.clock.wait(self.__available, wait_until - now)
+
+    def send(self, data):
+        """
+        Send the given data as raw packet to all other nodes of the network.
+        :param data: The data to send.
+        :type data: Any, will be converted to bytes
+        """
+        self.network.send(bytes(data), self)
+        self.metrics.frames_sent += 1
+
+    def close(self):
+        """Detach the socket from the network."""
+        self.network.detach(self)
@@ -0,0 +1,551 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+
+Reading and writing of pcap and pcapng capture files, and a transport replaying a capture file.
+"""
+
+import collections
+import mmap
+import os
+import queue
+import struct
+import threading
+
+import profi_dcp.parsing as parsing
+from profi_dcp import util
+from profi_dcp.clock import system_clock
+from profi_dcp.l2socket.transport import INBOUND, OUTBOUND, Frame, L2Transport
+from profi_dcp.metrics import Metrics
+from profi_dcp.utils.logging import Logging
+
+# link type of ethernet frames, records of other link types are skipped
+LINKTYPE_ETHERNET = 1
+
+PCAP_MAGIC = 0xA1B2C3D4
+PCAP_MAGIC_NANOSECONDS = 0xA1B23C4D
+PCAP_HEADER_SIZE = 24
+PCAP_RECORD_HEADER_SIZE = 16
+
+PCAPNG_SECTION_HEADER = 0x0A0D0D0A
+PCAPNG_INTERFACE_DESCRIPTION = 1
+PCAPNG_SIMPLE_PACKET = 3
+PCAPNG_ENHANCED_PACKET = 6
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_OPTION_END = 0
+PCAPNG_OPTION_TSRESOL = 9
+
+# the state needed to read the records of a capture from a position in the file: the byte order ("<" or ">") and
+# - for pcap: the link type and the timestamp resolution in seconds
+# - for pcapng: the link type and timestamp resolution of each interface of the current section
+ReaderState = collections.namedtuple("ReaderState", ["byte_order", "interfaces"])
+# a part of a capture file starting and ending at record boundaries, with the reader state at its start
+CaptureChunk = collections.namedtuple("CaptureChunk", ["start", "end", "state"])
+# a record of a capture: the capture time in seconds since the epoch (None if unknown) and the captured frame
+CaptureRecord = collections.namedtuple("CaptureRecord", ["timestamp", "data"])
+
+
+class CaptureReader:
+    """
+    Reads the ethernet frames of a pcap or pcapng file. The file is memory-mapped, so only the parts that are read are
+    loaded, and it can be split into chunks at record boundaries which can be read independently (e.g. in parallel by
+    several processes).
+    """
+
+    def __init__(self, path):
+        """
+        Open a capture file.
+        :param path: The path of the pcap or pcapng file.
+        :type path: string
+        """
+        self.path = path
+        self.__file = open(path, "rb")
+        try:
+            self.size = os.fstat(self.__file.fileno()).st_size
+            if self.size < 12:
+                raise ValueError(f"{path} is not a pcap or pcapng file")
+            self.buffer = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.__file.close()
+            raise
+
+        if struct.unpack_from("<I", self.buffer)[0] == PCAPNG_SECTION_HEADER:
+            self.format = "pcapng"
+            self.data_start = 0
+            # the state is read from the first section header block
+            self.state = None
+        else:
+            self.format = "pcap"
+            self.data_start = PCAP_HEADER_SIZE
+            self.state = self.__read_pcap_header()
+
+    def __read_pcap_header(self):
+        """
+        Read the global header of a pcap file.
+        :return: The reader state for all records of the file.
+        :rtype: ReaderState
+        """
+        if self.size < PCAP_HEADER_SIZE:
+            raise ValueError(f"{self.path} is not a pcap or pcapng file")
+        for byte_order in "<>":
+            magic = struct.unpack_from(byte_order + "I", self.buffer)[0]
+            if magic in (PCAP_MAGIC, PCAP_MAGIC_NANOSECONDS):
+                resolution = 1e-9 if magic == PCAP_MAGIC_NANOSECONDS else 1e-6
+                linktype = struct.unpack_from(byte_order + "I", self.buffer, 20)[0]
+                # the upper bits of the link type field may contain the FCS length
+                return ReaderState(byte_order, ((linktype & 0xFFFF, resolution),))
+        raise ValueError(f"{self.path} is not a pcap or pcapng file")
+
+    def records(self, chunk=None):
+        """
+        Iterate over the ethernet frames of the file (or of the given chunk). Frames of other link types are skipped.
+        :param chunk: The chunk to read, see chunks. Default is the whole file.
+        :type chunk: Optional[CaptureChunk]
+        :return: The records.
+        :rtype: Iterator[CaptureRecord]
+        """
+        if chunk is None:
+            chunk = CaptureChunk(self.data_start, self.size, self.state)
+        if self.format == "pcap":
+            return self.__pcap_records(chunk)
+        return self.__pcapng_records(chunk)
+
+    def chunks(self, chunk_size):
+        """
+        Split the file at record boundaries into chunks of about the given size. Only the record headers are read.
+        :param chunk_size: The size of the chunks in bytes.
+        :type chunk_size: int
+        :return: The chunks, in the order of the file.
+        :rtype: List[CaptureChunk]
+        """
+        chunks = []
+        start, state = self.data_start, self.state
+        for position, next_state in self.__boundaries():
+            if position - start >= chunk_size:
+                chunks.append(CaptureChunk(start, position, state))
+                start = position
+            state = next_state
+        if start < self.size:
+            chunks.append(CaptureChunk(start, self.size, state))
+        return chunks
+
+    def __boundaries(self):
+        """
+        Iterate over the end of each record (the start of the next one), with the reader state after the record.
+        :return: The positions and states.
+        :rtype: Iterator[Tuple[int, ReaderState]]
+        """
+        if self.format == "pcap":
+            header = struct.Struct(self.state.byte_order + "8xI")
+            position = self.data_start
+            while position + PCAP_RECORD_HEADER_SIZE <= self.size:
+                position += (
+                    PCAP_RECORD_HEADER_SIZE
+                    + header.unpack_from(self.buffer, position)[0]
+                )
+                yield min(position, self.size), self.state
+        else:
+            position, state = 0, None
+            while position + 12 <= self.size:
+                block_type, length, state = self.__pcapng_block(position, state)
+                if length < 12:
+                    return
+                position += length
+                yield min(position, self.size), state
+
+    def __pcap_records(self, chunk):
+        """
+        Iterate over the records of a chunk of a pcap file.
+        :param chunk: The chunk.
+        :type chunk: CaptureChunk
+        :return: The records.
+        :rtype: Iterator[CaptureRecord]
+        """
+        header = struct.Struct(chunk.state.byte_order + "IIII")
+        linktype, resolution = chunk.state.interfaces[0]
+        buffer, position = self.buffer, chunk.start
+        while position + PCAP_RECORD_HEADER_SIZE <= chunk.end:
+            seconds, fraction, length, _ = header.unpack_from(buffer, position)
+            position += PCAP_RECORD_HEADER_SIZE
+            if position + length > chunk.end:
+                return
+            if linktype == LINKTYPE_ETHERNET:
+                yield CaptureRecord(
+                    seconds + fraction * resolution,
+                    buffer[position : position + length],
+                )
+            position += length
+
+    def __pcapng_records(self, chunk):
+        """
+        Iterate over the packet blocks of a chunk of a pcapng file.
+        :param chunk: The chunk.
+        :type chunk: CaptureChunk
+        :return: The records.
+        :rtype: Iterator[CaptureRecord]
+        """
+        buffer, position, state = self.buffer, chunk.start, chunk.state
+        while position + 12 <= chunk.end:
+            block_type, length, state = self.__pcapng_block(position, state)
+            if length < 12 or position + length > chunk.end:
+                return
+            if block_type == PCAPNG_ENHANCED_PACKET:
+                interface, high, low, captured = struct.unpack_from(
+                    state.byte_order + "IIII", buffer, position + 8
+                )
+                if interface < len(state.interfaces) and captured <= length - 32:
+                    linktype, resolution = state.interfaces[interface]
+                    if linktype == LINKTYPE_ETHERNET:
+                        data = buffer[position + 28 : position + 28 + captured]
+                        yield CaptureRecord((high << 32 | low) * resolution, data)
+            elif block_type == PCAPNG_SIMPLE_PACKET and state.interfaces:
+                original = struct.unpack_from(
+                    state.byte_order + "I", buffer, position + 8
+                )[0]
+                if state.interfaces[0][0] == LINKTYPE_ETHERNET:
+                    captured = min(original, length - 16)
+                    yield CaptureRecord(
+                        None, buffer[position + 12 : position + 12 + captured]
+                    )
+            position += length
+
+    def __pcapng_block(self, position, state):
+        """
+        Read the header of a pcapng block and update the reader state with section header and interface description
+        blocks.
+        :param position: The position of the block.
+        :type position: int
+        :param state: The reader state before the block.
+        :type state: Optional[ReaderState]
+        :return: The type and length of the block and the reader state after the block.
+        :rtype: Tuple[int, int, ReaderState]
+        """
+        buffer = self.buffer
+        if struct.unpack_from("<I", buffer, position)[0] == PCAPNG_SECTION_HEADER:
+            magic = struct.unpack_from("<I", buffer, position + 8)[0]
+            byte_order = "<" if magic == PCAPNG_BYTE_ORDER_MAGIC else ">"
+            length = struct.unpack_from(byte_order + "I", buffer, position + 4)[0]
+            return PCAPNG_SECTION_HEADER, length, ReaderState(byte_order, ())
+        if state is None:
+            raise ValueError(f"{self.path} is not a pcapng file")
+
+        block_type, length = struct.unpack_from(
+            state.byte_order + "II", buffer, position
+        )
+        if block_type == PCAPNG_INTERFACE_DESCRIPTION and length >= 20:
+            linktype = struct.unpack_from(state.byte_order + "H", buffer, position + 8)[
+                0
+            ]
+            resolution = self.__tsresol(position + 16, position + length - 4, state)
+            interfaces = state.interfaces + ((linktype, resolution),)
+            state = ReaderState(state.byte_order, interfaces)
+        return block_type, length, state
+
+    def __tsresol(self, position, end, state):
+        """
+        Read the timestamp resolution from the options of an interface description block.
+        :param position: The position of the options.
+        :type position: int
+        :param end: The end of the options.
+        :type end: int
+        :param state: The reader state.
+        :type state: ReaderState
+        :return: The timestamp resolution in seconds, 1e-6 if the option is missing.
+        :rtype: float
+        """
+        option_header = struct.Struct(state.byte_order + "HH")
+        while position + 4 <= end:
+            code, length = option_header.unpack_from(self.buffer, position)
+            if code == PCAPNG_OPTION_END:
+                break
+            if code == PCAPNG_OPTION_TSRESOL and length >= 1:
+                value = self.buffer[position + 4]
+                if value & 0x80:
+                    return 2.0 ** -(value & 0x7F)
+                return 10.0**-value
+            position += 4 + length + (-length % 4)
+        return 1e-6
+
+    def close(self):
+        """Close the file."""
+        self.buffer.close()
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PcapngWriter:
+    """
+    Writes ethernet frames to a pcapng file without blocking the caller: write only queues the frame, a writer thread
+    formats the blocks and writes them to a buffered file. The timestamps are stored with nanosecond resolution,
+    sent and received frames are marked with the direction flag of the packet block.
+    """
+
+    # epb_flags option: the direction of the frame
+    INBOUND = INBOUND
+    OUTBOUND = OUTBOUND
+
+    def __init__(self, path, buffer_size=1024 * 1024):
+        """
+        Create the file and start the writer thread.
+        :param path: The path of the pcapng file, an existing file is overwritten.
+        :type path: string
+        :param buffer_size: The size of the write buffer of the file in bytes.
+        :type buffer_size: int
+        """
+        self.path = path
+        # the number of frames written to the file
+        self.frames_written = 0
+        # the error that stopped writing (frames written afterwards are discarded), None while writing works
+        self.error = None
+        self.__file = open(path, "wb", buffering=buffer_size)
+        self.__file.write(
+            self.__block(
+                PCAPNG_SECTION_HEADER,
+                struct.pack("<IHHq", PCAPNG_BYTE_ORDER_MAGIC, 1, 0, -1),
+            )
+        )
+        # an ethernet interface with nanosecond timestamps
+        options = struct.pack("<HHB3xHH", PCAPNG_OPTION_TSRESOL, 1, 9, 0, 0)
+        self.__file.write(
+            self.__block(
+                PCAPNG_INTERFACE_DESCRIPTION,
+                struct.pack("<HHI", LINKTYPE_ETHERNET, 0, 0) + options,
+            )
+        )
+        self.__queue = queue.SimpleQueue()
+        self.__thread = threading.Thread(
+            target=self.__write_frames, name="pcapng-writer", daemon=True
+        )
+        self.__thread.start()
+
+    def write(self, frame, timestamp, direction=0):
+        """
+        Queue a frame to be written.
+        :param frame: The ethernet frame.
+        :type frame: bytes
+        :param timestamp: The time the frame was sent or received in seconds since the epoch.
+        :type timestamp: float
+        :param direction: INBOUND, OUTBOUND or 0 if unknown.
+        :type direction: int
+        """
+        if self.error is None:
+            self.__queue.put((bytes(frame), timestamp, direction))
+
+    def close(self):
+        """Write all queued frames and close the file."""
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+        if not self.__file.closed:
+            self.__file.close()
+
+    def __write_frames(self):
+        """
+        The main function of the writer thread: write the queued frames until None is queued. If writing fails, the
+        error is recorded and the file is closed.
+        """
+        try:
+            self.__write_queued_frames()
+        except OSError as error:
+            self.error = error
+            Logging.logger.error("Writing to %s failed: %s", self.path, error)
+            try:
+                self.__file.close()
+            except OSError:
+                # the buffered frames cannot be written either
+                pass
+
+    def __write_queued_frames(self):
+        """Write the queued frames until None is queued."""
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            frame, timestamp, direction = item
+            ticks = int(timestamp * 1e9)
+            header = struct.pack(
+                "<IIIII",
+                0,
+                ticks >> 32 & 0xFFFFFFFF,
+                ticks & 0xFFFFFFFF,
+                len(frame),
+                len(frame),
+            )
+            options = b""
+            if direction:
+                options = struct.pack("<HHIHH", 2, 4, direction, 0, 0)
+            padding = bytes(-len(frame) % 4)
+            self.__file.write(
+                self.__block(PCAPNG_ENHANCED_PACKET, header + frame + padding + options)
+            )
+            self.frames_written += 1
+
+    @staticmethod
+    def __block(block_type, body):
+        """
+        Pack a pcapng block.
+        :param block_type: The type of the block.
+        :type block_type: int
+        :param body: The body of the block, padded to a multiple of 4 bytes.
+        :type body: bytes
+        :return: The block.
+        :rtype: bytes
+        """
+        length = len(body) + 12
+        return struct.pack("<II", block_type, length) + body + struct.pack("<I", length)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PcapFileSocket(L2Transport):
+    """
+    A transport replaying the frames of a pcap or pcapng file, e.g. to benchmark DCP with real plant traffic
+    deterministically. recv returns the frames of the file in order, either as fast as possible or with the timing of
+    the capture. The replay starts when the first frame is sent or received.
+    Sent frames are discarded. As the requests of DCP have a new XID, the replayed DCP frames are adapted to the last
+    sent request by default: their destination and XID are replaced by the source and XID of the request.
+    """
+
+    def __init__(
+        self,
+        path,
+        recv_timeout=1,
+        realtime=False,
+        mac=None,
+        rewrite_responses=True,
+        clock=None,
+    ):
+        """
+        Open a capture file for replay.
+        :param path: The path of the pcap or pcapng file.
+        :type path: string
+        :param recv_timeout: The timeout in seconds for recv, once all frames are replayed or while waiting for the
+        next frame with realtime. Default is 1.
+        :type recv_timeout: float
+        :param realtime: Whether to replay the frames with the timing of the capture (otherwise as fast as possible).
+        :type realtime: boolean
+        :param mac: The mac address of the transport (as ':' separated string). Default is the first unicast destination
+        of the capture (e.g. the host that received the responses).
+        :type mac: Optional[string]
+        :param rewrite_responses: Whether to adapt the replayed DCP frames to the last sent request. Default is True.
+        :type rewrite_responses: boolean
+        :param clock: The clock used for the timing and the timeouts. Default is the system clock.
+        :type clock: Optional[Clock]
+        """
+        self.reader = CaptureReader(path)
+        self.recv_timeout = recv_timeout
+        self.realtime = realtime
+        self.rewrite_responses = rewrite_responses
+        self.clock = system_clock if clock is None else clock
+        self.metrics = Metrics()
+        self.__records = self.reader.records()
+        self.__next = next(self.__records, None)
+        if mac is None:
+            mac = self.__first_unicast_destination()
+        self.mac = mac.lower()
+        # the time the replay started on the clock and the capture time of the first frame
+        self.__replay_start = None
+        self.__capture_start = None if self.__next is None else self.__next.timestamp
+        # destination and XID of replayed DCP frames, taken from the last sent request
+        self.__destination = None
+        self.__xid = None
+
+    def recv(self):
+        """
+        Receive the next frame of the capture.
+        :return: The next frame (or None after the timeout if no frame is due or all frames are replayed). With
+        realtime, the frame is returned as Frame with its replay time.
+        :rtype: Optional(bytes)
+        """
+        self.__start()
+        if self.__next is None:
+            self.clock.sleep(self.recv_timeout)
+            return None
+
+        timestamp = None
+        if self.realtime and self.__next.timestamp is not None:
+            timestamp = (
+                self.__replay_start + self.__next.timestamp - self.__capture_start
+            )
+            wait = timestamp - self.clock.time()
+            if wait > self.recv_timeout:
+                self.clock.sleep(self.recv_timeout)
+                return None
+            if wait > 0:
+                self.clock.sleep(wait)
+
+        frame = self.__adapt(self.__next.data)
+        self.__next = next(self.__records, None)
+        self.metrics.frames_received += 1
+        return frame if timestamp is None else Frame(frame, timestamp)
+
+    def send(self, data):
+        """
+        Discard the given frame, but remember its source and XID if it is a DCP request to adapt the replayed frames.
+        :param data: The data to send.
+        :type data: Any, will be converted to bytes
+        """
+        self.__start()
+        data = bytes(data)
+        self.metrics.frames_sent += 1
+        if (
+            len(data) >= parsing.BLOCKS_OFFSET
+            and data[parsing.ETHER_TYPE_OFFSET : parsing.FRAME_ID_OFFSET]
+            == parsing.ETHER_TYPE
+        ):
+            self.__destination = data[6:12]
+            self.__xid = data[parsing.XID_OFFSET : parsing.XID_OFFSET + 4]
+
+    def close(self):
+        """Close the capture file."""
+        self.__records = iter(())
+        self.__next = None
+        self.reader.close()
+
+    def __first_unicast_destination(self):
+        """
+        Find the first destination mac address of the capture that is neither multicast nor broadcast.
+        :return: The mac address, 00:00:00:00:00:00 if there is none.
+        :rtype: string
+        """
+        for record in self.reader.records():
+            if len(record.data) >= 6 and not record.data[0] & 1:
+                return util.mac_address_to_string(record.data[:6])
+        return "00:00:00:00:00:00"
+
+    def __start(self):
+        """Start the replay, if it has not started yet."""
+        if self.__replay_start is None:
+            self.__replay_start = self.clock.time()
+
+    def __adapt(self, frame):
+        """
+        Adapt a replayed DCP frame to the last sent request, see rewrite_responses.
+        :param frame: The frame of the capture.
+        :type frame: bytes
+        :return: The adapted frame.
+        :rtype: bytes
+        """
+        if (
+            not self.rewrite_responses
+            or self.__xid is None
+            or len(frame) < parsing.BLOCKS_OFFSET
+            or frame[parsing.ETHER_TYPE_OFFSET : parsing.FRAME_ID_OFFSET]
+            != parsing.ETHER_TYPE
+        ):
+            return frame
+        return (
+            self.__destination
+            + frame[6 : parsing.XID_OFFSET]
+            + self.__xid
+            + frame[parsing.XID_OFFSET + 4 :]
+        )
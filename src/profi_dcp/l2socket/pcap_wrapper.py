@@ -10,15 +10,20 @@ from profi_dcp.l2socket.winpcap import (
     WinPcap,
     bpf_program,
     pcap_pkthdr,
+    pcap_handler,
     pcap_if,
     sockaddr_in,
     sockaddr_in6,
 )
+from profi_dcp.l2socket.transport import Frame
 from profi_dcp.utils.logging import Logging
+import collections
 import ctypes
+import logging
 import socket
 import ipaddress
-import time
+import select
+import threading
 
 IPv4Address = namedtuple("IPv4Address", ["port", "ip_address"])
 IPv6Address = namedtuple("IPv6Address", ["port", "flow_info", "ip_address", "scope_id"])
@@ -166,14 +171,50 @@ class PcapDevice:
 
 
 class PcapWrapper:
-    """A wrapper to WinPcap/Npcap with all necessary functions to simulate an L2-Socket on Windows."""
+    """
+    A wrapper to WinPcap/Npcap (or libpcap) with all necessary functions to simulate an L2-Socket on Windows, or to
+    offer an alternative to the raw socket on Linux.
+
+    Once packets are received, a background thread continuously drains the pcap buffer into a bounded ring, so the
+    pcap buffer cannot overflow between two receive calls and sending does not need to empty it first.
+    """
+
+    RING_SIZE = 4096
 
     def __init__(self):
         """Create a new pcap wrapper object and load the underlying DLL"""
         self.win_pcap = WinPcap()
         self.pcap = None
-
-    def open(self, device_name, timeout_ms=100):
+        self.timeout_ms = None
+        self.poll = None
+        self.event = None
+
+        # reused for every call to get_next_packet
+        self.__header = ctypes.POINTER(pcap_pkthdr)()
+        self.__pkt_data = ctypes.POINTER(ctypes.c_ubyte)()
+
+        # the callback passed to pcap_dispatch is created once and must be kept alive as long as pcap may call it
+        self.__batch = []
+        self.__dispatch_callback = pcap_handler(self.__on_packet)
+
+        # packets drained by the capture thread, the oldest packets are discarded when the ring is full
+        self.ring = collections.deque(maxlen=self.RING_SIZE)
+        self.ring_condition = threading.Condition()
+        self.dropped = 0
+        self.__capture_thread = None
+        self.__stop_capture = threading.Event()
+        # pcap objects must not be used from several threads at once, every use of self.pcap holds this lock
+        self.__pcap_lock = threading.Lock()
+
+    def open(
+        self,
+        device_name,
+        timeout_ms=100,
+        buffer_size=None,
+        immediate=True,
+        snaplen=0xFFFF,
+        ring_size=RING_SIZE,
+    ):
         """
         Open a pcap capture for the given network device.
         :param device_name: The name of the network device, use e.g. get_device_name_from_ip or get_all_devices to find
@@ -181,11 +222,58 @@ class PcapWrapper:
         :type device_name: string
         :param timeout_ms: The read timeout in milliseconds (use 0 for no timeout). Default is 100ms.
         :type timeout_ms: Optional(int)
+        :param buffer_size: The size of the capture buffer in bytes. Default is the default of pcap.
+        :type buffer_size: Optional(int)
+        :param immediate: Whether packets are delivered immediately instead of buffered until the timeout expires.
+        Default is True.
+        :type immediate: boolean
+        :param snaplen: The maximum number of bytes captured per packet. In immediate mode, libpcap reserves this many
+        bytes for every packet in the capture buffer, so a small snaplen allows to buffer more packets. Default is
+        0xFFFF.
+        :type snaplen: int
+        :param ring_size: The maximum number of packets buffered by the capture thread. Default is RING_SIZE.
+        :type ring_size: int
         """
         # Open the pcap object
-        self.pcap = self.win_pcap.pcap_open_live(device_name, timeout_ms)
+        if self.win_pcap.has_pcap_create():
+            self.pcap = self.win_pcap.pcap_create(
+                device_name,
+                timeout_ms,
+                snaplen=snaplen,
+                buffer_size=buffer_size,
+                immediate=immediate,
+            )
+        else:
+            self.pcap = self.win_pcap.pcap_open_live(
+                device_name, timeout_ms, snaplen=snaplen
+            )
         # Set mintocopy to 0 to avoid buffering of packets within Npcap
-        self.win_pcap.pcap_setmintocopy(self.pcap, 0)
+        if self.win_pcap.pcap_setmintocopy(self.pcap, 0) != 0:
+            Logging.logger.warning(
+                "Could not set mintocopy of %s: %s",
+                device_name,
+                self.win_pcap.pcap_geterr(self.pcap),
+            )
+
+        # libpcap on Linux does not reliably return after the read timeout (with TPACKET_V3 the timer only starts with
+        # the first packet), so wait for packets with poll (or the event of WinPcap/Npcap) and read them in non-blocking
+        # mode where possible. This also keeps the pcap lock free for sending while waiting.
+        self.timeout_ms = timeout_ms
+        self.poll = None
+        self.event = None
+        selectable_fd = self.win_pcap.pcap_get_selectable_fd(self.pcap)
+        event = self.win_pcap.pcap_getevent(self.pcap)
+        if (selectable_fd >= 0 or event) and self.win_pcap.pcap_setnonblock(
+            self.pcap, True
+        ) == 0:
+            if selectable_fd >= 0:
+                self.poll = select.poll()
+                self.poll.register(selectable_fd, select.POLLIN)
+            else:
+                self.event = event
+
+        self.ring = collections.deque(maxlen=ring_size)
+        self.dropped = 0
 
     def get_device_name_from_ip(self, ip):
         """
@@ -198,7 +286,12 @@ class PcapWrapper:
 
         def filter_by_ip(device):
             for address in device.addresses:
-                if address.address.address.ip_address == ip:
+                # libpcap also reports non-IP addresses (e.g. AF_PACKET on Linux) which are not parsed
+                if (
+                    address.address is not None
+                    and address.address.address is not None
+                    and address.address.address.ip_address == ip
+                ):
                     return True
             return False
 
@@ -206,9 +299,12 @@ class PcapWrapper:
         filtered_devices = [device for device in all_devices if filter_by_ip(device)]
 
         if not filtered_devices:
-            Logging.logger.debug(
-                f"No pcap device with ip {ip} found in {[str(device) for device in all_devices]}"
-            )
+            if Logging.logger.isEnabledFor(logging.DEBUG):
+                Logging.logger.debug(
+                    "No pcap device with ip %s found in %s",
+                    ip,
+                    [str(device) for device in all_devices],
+                )
             return None
         else:
             return filtered_devices[0].name
@@ -240,14 +336,101 @@ class PcapWrapper:
         :return: The received packet, None in cases of an error or timeout.
         :rtype: Optional(bytes)
         """
-        header = ctypes.POINTER(pcap_pkthdr)()
-        pkt_data = ctypes.POINTER(ctypes.c_ubyte)()
-        result = self.win_pcap.pcap_next_ex(self.pcap, header, pkt_data)
+        packets = self.get_packets(1)
+        return packets[0] if packets else None
 
-        if result <= 0:  # error or timeout
-            return None
-        # extract and return the packet data
-        return bytes(bytearray(pkt_data[: header.contents.len]))
+    def get_packets(self, max_count=64):
+        """
+        Receive all packets currently available (at most max_count). If no packet is available, wait up to the read
+        timeout for new packets.
+        :param max_count: The maximum number of packets to return. Default is 64.
+        :type max_count: int
+        :return: The received packets, empty in cases of an error or timeout.
+        :rtype: List(bytes)
+        """
+        self.__start_capture()
+        with self.ring_condition:
+            if not self.ring:
+                self.ring_condition.wait(self.timeout_ms / 1000)
+            packets = []
+            while self.ring and len(packets) < max_count:
+                packets.append(self.ring.popleft())
+        return packets
+
+    def __start_capture(self):
+        """Start the capture thread draining pcap into the ring, if it is not already running."""
+        if self.__capture_thread is not None:
+            return
+        self.__stop_capture.clear()
+        self.__capture_thread = threading.Thread(
+            target=self.__capture, name="pcap-capture", daemon=True
+        )
+        self.__capture_thread.start()
+
+    def __stop_capture_thread(self):
+        """Stop the capture thread (if running) and wait until it stopped using the pcap object."""
+        if self.__capture_thread is None:
+            return
+        self.__stop_capture.set()
+        self.__capture_thread.join()
+        self.__capture_thread = None
+
+    def __capture(self):
+        """Receive packets from pcap and append them to the ring until the capture is stopped or pcap fails."""
+        while not self.__stop_capture.is_set():
+            packets = self.__dispatch()
+            if packets is None:
+                with self.__pcap_lock:
+                    error = self.win_pcap.pcap_geterr(self.pcap)
+                Logging.logger.error("Pcap capture failed: %s", error)
+                return
+            if not packets:
+                continue
+            with self.ring_condition:
+                overflow = len(self.ring) + len(packets) - self.ring.maxlen
+                if overflow > 0:
+                    self.dropped += overflow
+                self.ring.extend(packets)
+                self.ring_condition.notify_all()
+
+    def __dispatch(self, max_count=-1):
+        """
+        Read the packets currently in the pcap buffer with a single call to pcap_dispatch, waiting up to the read
+        timeout if there are none. The capture waits for packets without holding the pcap lock, only pcap libraries
+        offering neither a selectable file descriptor nor an event block in pcap_dispatch.
+        :param max_count: The maximum number of packets to read, -1 to read the whole buffer. Default is -1.
+        :type max_count: int
+        :return: The received packets (empty on timeout), None in case of an error.
+        :rtype: Optional(List(bytes))
+        """
+        if self.poll is not None and not self.poll.poll(self.timeout_ms):
+            return []
+        if self.event is not None and not self.win_pcap.wait_for_event(
+            self.event, self.timeout_ms
+        ):
+            return []
+        with self.__pcap_lock:
+            self.__batch = []
+            result = self.win_pcap.pcap_dispatch(
+                self.pcap, max_count, self.__dispatch_callback
+            )
+            batch = self.__batch
+        return None if result < 0 else batch
+
+    def __on_packet(self, user, header, pkt_data):
+        """
+        Callback for pcap_dispatch, copies the packet data out of the pcap buffer as it is only valid within the
+        callback. The timestamp of the pcap header is attached to the packet.
+        :param user: The (unused) user data.
+        :type user: POINTER(u_char)
+        :param header: The pcap header of the packet.
+        :type header: POINTER(pcap_pkthdr)
+        :param pkt_data: The packet data.
+        :type pkt_data: POINTER(u_char)
+        """
+        header = header.contents
+        timestamp = header.ts.tv_sec + header.ts.tv_usec * 1e-6
+        self.__batch.append(Frame(ctypes.string_at(pkt_data, header.caplen), timestamp))
 
     def set_bpf_filter(self, bpf_filter):
         """
@@ -257,14 +440,20 @@ class PcapWrapper:
         :return: Whether the filter was set successfully.
         :rtype: boolean
         """
-        # Compile the filter to a bpf program
-        program = bpf_program()
-        result = self.win_pcap.pcap_compile(self.pcap, program, bpf_filter)
-        if result != 0:  # Error compiling
-            return False
+        # the capture restarts with the next receive call, packets received with the previous filter are discarded
+        self.__stop_capture_thread()
+        with self.ring_condition:
+            self.ring.clear()
+
+        with self.__pcap_lock:
+            # Compile the filter to a bpf program
+            program = bpf_program()
+            result = self.win_pcap.pcap_compile(self.pcap, program, bpf_filter)
+            if result != 0:  # Error compiling
+                return False
 
-        # Set the compiled bpf program as filter and return whether the filter was set successfully
-        return self.win_pcap.pcap_setfilter(self.pcap, program) == 0
+            # Set the compiled bpf program as filter and return whether the filter was set successfully
+            return self.win_pcap.pcap_setfilter(self.pcap, program) == 0
 
     def send(self, packet):
         """
@@ -274,25 +463,11 @@ class PcapWrapper:
         :return: Whether the packet was send successfully.
         :rtype: boolean
         """
-        self.__empty_buffer()
-        return self.win_pcap.pcap_sendpacket(self.pcap, packet, len(packet)) == 0
+        with self.__pcap_lock:
+            return self.win_pcap.pcap_sendpacket(self.pcap, packet, len(packet)) == 0
 
     def close(self):
-        """Close this pcap capture."""
-        self.win_pcap.pcap_close(self.pcap)
-
-    def __empty_buffer(self, timeout=0.5):
-        """
-        Empties the pcap receive buffer with multiple calls to get_next_packet() until the buffer is
-        empty or the timeout (default 0.5s) occurs.
-        Emptying the pcap receive buffer is necessary before sending packets to prevent the awaited
-        answer packet from being dropped due to the full buffer.
-        :param timeout: Time, after which the function returns, even if the buffer is not completely empty
-        :type timeout: integer
-        """
-        timed_out = time.time() + timeout
-        while time.time() < timed_out:
-            received_packet = self.get_next_packet()
-
-            if not received_packet:
-                return
+        """Stop the capture thread and close this pcap capture."""
+        self.__stop_capture_thread()
+        with self.__pcap_lock:
+            self.win_pcap.pcap_close(self.pcap)
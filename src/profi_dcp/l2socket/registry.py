@@ -0,0 +1,324 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import collections
+import threading
+
+from profi_dcp.l2socket.transport import L2Transport, PacketStatistics
+from profi_dcp.utils.logging import Logging
+
+
+class FrameQueue:
+    """A bounded queue of received frames, the oldest frames are discarded when the queue is full."""
+
+    def __init__(self, max_frames):
+        """
+        Create a new frame queue.
+        :param max_frames: The maximum number of frames stored in the queue.
+        :type max_frames: int
+        """
+        self.__frames = collections.deque(maxlen=max_frames)
+        self.__available = threading.Condition()
+        # the number of frames discarded because the queue was full
+        self.dropped = 0
+
+    def put(self, frame):
+        """
+        Append a frame to the queue and wake up a waiting receiver.
+        :param frame: The received frame.
+        :type frame: bytes
+        """
+        with self.__available:
+            if len(self.__frames) == self.__frames.maxlen:
+                self.dropped += 1
+            self.__frames.append(frame)
+            self.__available.notify()
+
+    def get(self, timeout):
+        """
+        Remove and return the oldest frame of the queue, wait up to the given timeout for a frame if the queue is empty.
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        :return: The oldest frame or None if no frame was received before the timeout.
+        :rtype: Optional[bytes]
+        """
+        with self.__available:
+            if not self.__frames:
+                self.__available.wait(timeout)
+            return self.__frames.popleft() if self.__frames else None
+
+
+class SharedL2Socket(L2Transport):
+    """
+    A handle to an L2 socket shared with other users via a SocketRegistry. Offers the same interface as the L2 sockets:
+    frames are received from the handle's own queue, filled by the receive thread of the shared socket.
+    """
+
+    def __init__(self, registry, entry, recv_timeout, max_frames):
+        """
+        Create a new handle, use SocketRegistry.acquire instead of calling this directly.
+        :param registry: The registry that manages the shared socket.
+        :type registry: SocketRegistry
+        :param entry: The registry entry of the shared socket.
+        :type entry: SharedSocketEntry
+        :param recv_timeout: The timeout in seconds for recv.
+        :type recv_timeout: float
+        :param max_frames: The maximum number of frames queued for this handle.
+        :type max_frames: int
+        """
+        self.registry = registry
+        self.entry = entry
+        self.recv_timeout = recv_timeout
+        self.queue = FrameQueue(max_frames)
+        self.closed = False
+
+    def recv(self):
+        """
+        Receive the next frame of the shared socket.
+        :return: The next raw packet (or None if no packet has been received e.g. due to a timeout).
+        :rtype: Optional(bytes)
+        """
+        return self.queue.get(self.recv_timeout)
+
+    def statistics(self):
+        """
+        Get the statistics of the shared socket, the frames dropped because the queue of this handle was full are
+        added to its drops.
+        :return: The statistics since the shared socket was opened or None if the socket does not report them.
+        :rtype: Optional[PacketStatistics]
+        """
+        statistics = self.entry.socket.statistics()
+        if statistics is None:
+            return None
+        return PacketStatistics(
+            statistics.packets, statistics.drops + self.queue.dropped
+        )
+
+    def reserve_frames(self, frame_count):
+        """
+        Grow the receive queue of the shared socket to hold at least the given number of frames.
+        :param frame_count: The number of frames expected in a burst.
+        :type frame_count: int
+        """
+        self.entry.socket.reserve_frames(frame_count)
+
+    def send(self, data):
+        """
+        Send the given data as raw packet via the shared socket.
+        :param data: The data to send.
+        :type data: Any, will be converted to bytes
+        """
+        with self.entry.send_lock:
+            self.entry.socket.send(data)
+
+    def send_batch(self, frames):
+        """
+        Send several raw packets via the shared socket, see L2Transport.send_batch.
+        :param frames: The packets to send.
+        :type frames: Iterable[bytes]
+        """
+        with self.entry.send_lock:
+            self.entry.socket.send_batch(frames)
+
+    def close(self):
+        """Release the shared socket, it is closed when the last handle is closed."""
+        if not self.closed:
+            self.closed = True
+            self.registry.release(self)
+
+
+class SharedSocketEntry:
+    """
+    A socket shared by all handles in the registry with the same key and the thread demultiplexing its frames: every
+    received frame is passed to the queue of each handle. The handles share the same bytes object, so a frame is only
+    received and copied from the kernel once, independent of the number of handles.
+    """
+
+    def __init__(self, key, socket, on_exit=None):
+        """
+        Create a new entry and start its receive thread.
+        :param key: The key of the socket in the registry.
+        :type key: Tuple
+        :param socket: The opened L2 socket.
+        :type socket: Any (L2 socket)
+        :param on_exit: Called with this entry when the receive thread exits and the socket is closed.
+        :type on_exit: Optional[Callable[[SharedSocketEntry], None]]
+        """
+        self.key = key
+        self.socket = socket
+        self.on_exit = on_exit
+        self.handles = []
+        self.send_lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(
+            target=self.__receive_loop, name=f"profi-dcp-recv-{key[0]}", daemon=True
+        )
+        self.thread.start()
+
+    def __receive_loop(self):
+        """Receive frames and pass them to all handles until the entry is stopped, then close the socket."""
+        try:
+            while self.running:
+                frame = self.socket.recv()
+                if frame is None:
+                    continue
+                for handle in self.handles:
+                    handle.queue.put(frame)
+        except OSError as error:
+            if self.running:
+                Logging.logger.error(
+                    "Receiving on shared socket %s failed: %s", self.key, error
+                )
+        finally:
+            self.running = False
+            self.socket.close()
+            if self.on_exit is not None:
+                self.on_exit(self)
+
+
+class SocketRegistry:
+    """
+    Registry of L2 sockets shared per network interface. Instead of opening a socket for every user, acquire returns a
+    handle to a socket shared with all other users of the same interface (and protocol, filter, socket factory and
+    socket options). The socket is reference counted and closed when the last handle is released. If receiving on the
+    socket fails, it is closed and removed from the registry, so the next acquire opens a new socket.
+    """
+
+    def __init__(self):
+        """Create a new, empty registry."""
+        self.__lock = threading.Lock()
+        self.__entries = {}
+
+    def acquire(
+        self,
+        socket_factory,
+        interface,
+        ip=None,
+        bpf_filter=None,
+        protocol=None,
+        recv_timeout=1,
+        max_frames=4096,
+        **socket_options,
+    ):
+        """
+        Return a handle to the shared socket for the given interface, opening the socket if necessary.
+        :param socket_factory: Used to open the socket, called with the remaining arguments (e.g. L2Socket).
+        :type socket_factory: Callable
+        :param interface: The network interface to open the socket on.
+        :type interface: string
+        :param ip: The IP address of the network interface.
+        :type ip: Optional[string]
+        :param bpf_filter: The BPF filter of the socket.
+        :type bpf_filter: Optional[string]
+        :param protocol: The ethernet protocol number of the socket.
+        :type protocol: Optional[int]
+        :param recv_timeout: The timeout in seconds for recv on the handle.
+        :type recv_timeout: float
+        :param max_frames: The maximum number of frames queued for the handle.
+        :type max_frames: int
+        :param socket_options: Additional keyword arguments passed to the socket factory when opening the socket.
+        :type socket_options: Any
+        :return: The handle to the shared socket.
+        :rtype: SharedL2Socket
+        """
+        key = (
+            interface,
+            protocol,
+            bpf_filter,
+            socket_factory,
+            tuple(
+                sorted(
+                    (name, _hashable(value)) for name, value in socket_options.items()
+                )
+            ),
+        )
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                # use a short timeout so the receive thread notices the release of the last handle quickly
+                socket = socket_factory(
+                    ip=ip,
+                    interface=interface,
+                    bpf_filter=bpf_filter,
+                    protocol=protocol,
+                    **dict(socket_options, recv_timeout=0.1),
+                )
+                entry = SharedSocketEntry(key, socket, self.__discard)
+                self.__entries[key] = entry
+            handle = SharedL2Socket(self, entry, recv_timeout, max_frames)
+            # replace the list instead of appending so the receive thread can iterate it without locking
+            entry.handles = entry.handles + [handle]
+        return handle
+
+    def release(self, handle):
+        """
+        Release the given handle, the shared socket is closed if this was its last handle.
+        :param handle: The handle to release.
+        :type handle: SharedL2Socket
+        """
+        with self.__lock:
+            entry = handle.entry
+            entry.handles = [other for other in entry.handles if other is not handle]
+            if not entry.handles:
+                entry.running = False
+                self.__remove(entry)
+
+    def __discard(self, entry):
+        """
+        Remove an entry whose receive thread exited, e.g. because receiving failed.
+        :param entry: The entry.
+        :type entry: SharedSocketEntry
+        """
+        with self.__lock:
+            self.__remove(entry)
+
+    def __remove(self, entry):
+        """
+        Remove the given entry, unless it was already replaced by a new socket. The lock must be held.
+        :param entry: The entry.
+        :type entry: SharedSocketEntry
+        """
+        if self.__entries.get(entry.key) is entry:
+            del self.__entries[entry.key]
+
+    def __len__(self):
+        """
+        Return the number of currently open shared sockets.
+        :return: The number of open sockets.
+        :rtype: int
+        """
+        return len(self.__entries)
+
+
+def _hashable(value):
+    """
+    Convert a socket option to a hashable value for the key of a shared socket.
+    :param value: The value of the option.
+    :type value: Any
+    :return: The value, or its representation if it is not hashable.
+    :rtype: Hashable
+    """
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def default_registry():
+    """
+    Return the registry shared by all DCP instances, it is created on first use.
+    :return: The default registry.
+    :rtype: SocketRegistry
+    """
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = SocketRegistry()
+        return _default_registry
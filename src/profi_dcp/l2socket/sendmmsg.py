@@ -0,0 +1,98 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+
+Access to the Linux system call sendmmsg via ctypes, which sends several packets on a socket with one system call.
+"""
+
+import ctypes
+import errno
+import os
+
+# the maximum number of messages the kernel accepts per call (UIO_MAXIOV)
+MAX_MESSAGES = 1024
+
+
+class iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint),
+        ("msg_iov", ctypes.POINTER(iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", msghdr), ("msg_len", ctypes.c_uint)]
+
+
+_sendmmsg = None
+
+
+def load():
+    """
+    Load sendmmsg from the C library of the process (once).
+    :return: Whether sendmmsg is available.
+    :rtype: boolean
+    """
+    global _sendmmsg
+    if _sendmmsg is None:
+        try:
+            function = ctypes.CDLL(None, use_errno=True).sendmmsg
+        except (OSError, AttributeError):
+            _sendmmsg = False
+        else:
+            function.argtypes = [
+                ctypes.c_int,
+                ctypes.POINTER(mmsghdr),
+                ctypes.c_uint,
+                ctypes.c_int,
+            ]
+            function.restype = ctypes.c_int
+            _sendmmsg = function
+    return bool(_sendmmsg)
+
+
+def sendmmsg(fd, frames):
+    """
+    Send the given frames on the (connected or bound) socket with as few calls of sendmmsg as possible. Sending stops
+    early if the socket would block (e.g. its send queue is full).
+    :param fd: The file descriptor of the socket.
+    :type fd: int
+    :param frames: The frames to send.
+    :type frames: List[bytes]
+    :return: The number of frames sent.
+    :rtype: int
+    """
+    if not load():
+        raise OSError(errno.ENOSYS, "sendmmsg is not available")
+    sent = 0
+    while sent < len(frames):
+        chunk = frames[sent : sent + MAX_MESSAGES]
+        # the buffers must stay referenced until the call returns
+        buffers = [ctypes.create_string_buffer(frame, len(frame)) for frame in chunk]
+        vectors = (iovec * len(chunk))()
+        messages = (mmsghdr * len(chunk))()
+        for index, buffer in enumerate(buffers):
+            vectors[index].iov_base = ctypes.addressof(buffer)
+            vectors[index].iov_len = len(chunk[index])
+            messages[index].msg_hdr.msg_iov = ctypes.pointer(vectors[index])
+            messages[index].msg_hdr.msg_iovlen = 1
+
+        result = _sendmmsg(fd, messages, len(chunk), 0)
+        if result < 0:
+            error = ctypes.get_errno()
+            if error in (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS):
+                break
+            raise OSError(error, os.strerror(error))
+        sent += result
+        if result < len(chunk):
+            break
+    return sent
@@ -0,0 +1,97 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import collections
+
+# frames received and dropped by a transport
+PacketStatistics = collections.namedtuple("PacketStatistics", ["packets", "drops"])
+
+# the direction of a frame written to a capture (the values of the epb_flags option of pcapng), 0 if unknown
+INBOUND = 1
+OUTBOUND = 2
+
+
+class Frame(bytes):
+    """
+    A received raw frame together with the time it was received, taken as close to the wire as the transport allows
+    (e.g. the kernel receive timestamp). It can be used like the raw bytes of the frame.
+    """
+
+    def __new__(cls, data, timestamp=None):
+        """
+        Create a new frame.
+        :param data: The raw frame.
+        :type data: bytes
+        :param timestamp: The receive time in seconds since the epoch (or on the clock of the transport), None if
+        unknown.
+        :type timestamp: Optional[float]
+        """
+        frame = super().__new__(cls, data)
+        frame.timestamp = timestamp
+        return frame
+
+
+class L2Transport:
+    """
+    The interface DCP uses to send and receive raw ethernet frames. The L2 sockets implement it on top of the network
+    interfaces of the host, other implementations (e.g. L2MemorySocket) can be passed to DCP directly.
+    """
+
+    # The mac address of the transport (as ':' separated lower-case string). DCP uses it as source address of its
+    # requests if the transport is passed to DCP directly. None for transports on a network interface of the host.
+    mac = None
+    # The clock the transport measures its timeouts with (see profi_dcp.clock), None for transports on a network
+    # interface of the host which rely on the timeouts of the operating system. DCP uses it by default.
+    clock = None
+    # The metrics of the transport (see profi_dcp.metrics) counting the frames it sent, received and dropped, None if
+    # the transport does not count them.
+    metrics = None
+
+    def statistics(self):
+        """
+        Get the number of frames received and dropped by the transport since it was opened, e.g. from the kernel.
+        :return: The statistics or None if the transport does not report them.
+        :rtype: Optional[PacketStatistics]
+        """
+        return None
+
+    def reserve_frames(self, frame_count):
+        """
+        Make sure the receive queue of the transport can hold at least the given number of frames (e.g. by growing the
+        socket receive buffer), so that a burst of responses is not dropped. Transports without a bounded queue ignore
+        this.
+        :param frame_count: The number of frames expected in a burst.
+        :type frame_count: int
+        """
+
+    def recv(self):
+        """
+        Receive the next frame, wait up to the timeout of the transport if no frame is available. Transports that know
+        the receive time of the frame return it as Frame.
+        :return: The next raw packet (or None if no packet has been received e.g. due to a timeout).
+        :rtype: Optional(bytes)
+        """
+        raise NotImplementedError
+
+    def send(self, data):
+        """
+        Send the given data as raw packet.
+        :param data: The data to send.
+        :type data: Any, will be converted to bytes
+        """
+        raise NotImplementedError
+
+    def send_batch(self, frames):
+        """
+        Send several raw packets, e.g. the requests of a sweep. Transports that can send several packets with a single
+        system call override this, the default sends the packets one by one.
+        :param frames: The packets to send.
+        :type frames: Iterable[bytes]
+        """
+        for frame in frames:
+            self.send(frame)
+
+    def close(self):
+        """Close the transport."""
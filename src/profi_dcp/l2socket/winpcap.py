@@ -7,8 +7,11 @@ All Rights Reserved.
 import ctypes
 import os
 import pathlib
+import sys
 import ctypes.util
 
+from profi_dcp.utils.logging import Logging
+
 # Define all necessary structs and type aliases
 bpf_u_int32 = ctypes.c_uint32
 pcap_t = ctypes.c_void_p
@@ -37,6 +40,12 @@ class pcap_pkthdr(ctypes.Structure):
     _fields_ = [("ts", timeval), ("caplen", bpf_u_int32), ("len", bpf_u_int32)]
 
 
+# callback type used by pcap_dispatch: user data, packet header, packet data
+pcap_handler = ctypes.CFUNCTYPE(
+    None, ctypes.POINTER(u_char), ctypes.POINTER(pcap_pkthdr), ctypes.POINTER(u_char)
+)
+
+
 class sockaddr(ctypes.Structure):
     _fields_ = [("sa_family", ctypes.c_ushort), ("sa_data", ctypes.c_ubyte * 14)]
 
@@ -96,6 +105,7 @@ class WinPcap:
     """
     Wrapper class for (a subset of) pcap. See e.g. https://www.winpcap.org/docs/docs_412/html/main.html for a more
     detailed documentation of the underlying functionality.
+    Loads WinPcap/Npcap on Windows and libpcap on all other platforms.
     """
 
     __pcap_dll = None
@@ -107,10 +117,12 @@ class WinPcap:
 
     def __load_pcap_dll(self):
         """
-        Try loading WinPcap or Npcap DLL if it is not already loaded.
-        Will raise an OSError if neither WinPcap nor Npcap can be found.
+        Try loading WinPcap or Npcap DLL (libpcap on other platforms than Windows) if it is not already loaded.
+        Will raise an OSError if neither WinPcap nor Npcap (or libpcap) can be found.
         """
-        if self.__pcap_dll is None:
+        if self.__pcap_dll is None and sys.platform != "win32":
+            self.__pcap_dll = load_dll("pcap")
+        elif self.__pcap_dll is None:
             npcap_path = pathlib.Path(os.environ["WINDIR"], "System32", "Npcap")
             if npcap_path.exists():
                 os.environ["PATH"] = f"{npcap_path};{os.environ['PATH']}"
@@ -122,7 +134,14 @@ class WinPcap:
         Import all necessary functions from the DLL and set their argument and return types
         The following functions are imported:
           - pcap_open_live
-          - pcap_setmintocopy
+          - pcap_setmintocopy (WinPcap/Npcap only)
+          - pcap_create, pcap_set_snaplen, pcap_set_promisc, pcap_set_timeout, pcap_set_buffer_size, pcap_activate
+          - pcap_set_immediate_mode (libpcap >= 1.5 and Npcap only)
+          - pcap_dispatch
+          - pcap_setnonblock
+          - pcap_get_selectable_fd (not available on Windows)
+          - pcap_getevent (WinPcap/Npcap only)
+          - pcap_geterr
           - pcap_close
           - pcap_next_ex
           - pcap_sendpacket
@@ -140,9 +159,73 @@ class WinPcap:
         ]
         self._pcap_open_live.restype = ctypes.POINTER(pcap_t)
 
-        self._pcap_setmintocopy = self.__pcap_dll.pcap_setmintocopy
-        self._pcap_setmintocopy.argtype = [ctypes.POINTER(pcap_t), ctypes.c_int]
-        self._pcap_setmintocopy.restype = ctypes.c_int
+        self._pcap_setmintocopy = getattr(self.__pcap_dll, "pcap_setmintocopy", None)
+        if self._pcap_setmintocopy is not None:
+            self._pcap_setmintocopy.argtype = [ctypes.POINTER(pcap_t), ctypes.c_int]
+            self._pcap_setmintocopy.restype = ctypes.c_int
+
+        self._pcap_create = getattr(self.__pcap_dll, "pcap_create", None)
+        if self._pcap_create is not None:
+            self._pcap_create.argtypes = [c_string, c_string]
+            self._pcap_create.restype = ctypes.POINTER(pcap_t)
+
+            for name in [
+                "pcap_set_snaplen",
+                "pcap_set_promisc",
+                "pcap_set_timeout",
+                "pcap_set_buffer_size",
+            ]:
+                function = getattr(self.__pcap_dll, name)
+                function.argtypes = [ctypes.POINTER(pcap_t), ctypes.c_int]
+                function.restype = ctypes.c_int
+                setattr(self, f"_{name}", function)
+
+            self._pcap_activate = self.__pcap_dll.pcap_activate
+            self._pcap_activate.argtypes = [ctypes.POINTER(pcap_t)]
+            self._pcap_activate.restype = ctypes.c_int
+
+        self._pcap_set_immediate_mode = getattr(
+            self.__pcap_dll, "pcap_set_immediate_mode", None
+        )
+        if self._pcap_set_immediate_mode is not None:
+            self._pcap_set_immediate_mode.argtypes = [
+                ctypes.POINTER(pcap_t),
+                ctypes.c_int,
+            ]
+            self._pcap_set_immediate_mode.restype = ctypes.c_int
+
+        self._pcap_dispatch = self.__pcap_dll.pcap_dispatch
+        self._pcap_dispatch.argtypes = [
+            ctypes.POINTER(pcap_t),
+            ctypes.c_int,
+            pcap_handler,
+            ctypes.POINTER(u_char),
+        ]
+        self._pcap_dispatch.restype = ctypes.c_int
+
+        self._pcap_setnonblock = self.__pcap_dll.pcap_setnonblock
+        self._pcap_setnonblock.argtypes = [
+            ctypes.POINTER(pcap_t),
+            ctypes.c_int,
+            c_string,
+        ]
+        self._pcap_setnonblock.restype = ctypes.c_int
+
+        self._pcap_get_selectable_fd = getattr(
+            self.__pcap_dll, "pcap_get_selectable_fd", None
+        )
+        if self._pcap_get_selectable_fd is not None:
+            self._pcap_get_selectable_fd.argtypes = [ctypes.POINTER(pcap_t)]
+            self._pcap_get_selectable_fd.restype = ctypes.c_int
+
+        self._pcap_getevent = getattr(self.__pcap_dll, "pcap_getevent", None)
+        if self._pcap_getevent is not None:
+            self._pcap_getevent.argtypes = [ctypes.POINTER(pcap_t)]
+            self._pcap_getevent.restype = ctypes.c_void_p
+
+        self._pcap_geterr = self.__pcap_dll.pcap_geterr
+        self._pcap_geterr.argtypes = [ctypes.POINTER(pcap_t)]
+        self._pcap_geterr.restype = c_string
 
         self._pcap_close = self.__pcap_dll.pcap_close
         self._pcap_close.argtypes = [ctypes.POINTER(pcap_t)]
@@ -216,6 +299,70 @@ class WinPcap:
 
         return p
 
+    def pcap_create(
+        self, device, to_ms, snaplen=0xFFFF, promisc=0, buffer_size=None, immediate=True
+    ):
+        """
+        Create and activate a pcap object with pcap_create and pcap_activate. In contrast to pcap_open_live, this allows
+        to set the buffer size and to enable immediate mode, i.e. packets are delivered as soon as they arrive instead of
+        being buffered until the timeout expires.
+        Raises an OSError if the pcap object cannot be created, configured or activated.
+        :param device: The network device to open.
+        :type device: string
+        :param to_ms: The read timeout in milliseconds.
+        :type to_ms: int
+        :param snaplen: The maximum number of bytes to capture.
+        :type snaplen: int
+        :param promisc: Whether the interface should be put into promiscuous mode.
+        :type promisc: int
+        :param buffer_size: The size of the capture buffer in bytes, the default of pcap is used if None.
+        :type buffer_size: Optional[int]
+        :param immediate: Whether to enable immediate mode (if supported by the loaded pcap library).
+        :type immediate: boolean
+        :return: The activated pcap object.
+        :rtype: POINTER(pcap_t)
+        """
+        device_buffer = ctypes.create_string_buffer(device.encode("utf8"))
+        error_buffer = ctypes.create_string_buffer(256)
+        p = self._pcap_create(device_buffer, error_buffer)
+        if not p:
+            raise OSError(error_buffer.value)
+
+        settings = [
+            (self._pcap_set_snaplen, snaplen),
+            (self._pcap_set_promisc, promisc),
+            (self._pcap_set_timeout, to_ms),
+        ]
+        if buffer_size is not None:
+            settings.append((self._pcap_set_buffer_size, buffer_size))
+        if immediate and self._pcap_set_immediate_mode is not None:
+            settings.append((self._pcap_set_immediate_mode, 1))
+        for function, value in settings:
+            result = function(p, value)
+            if result != 0:
+                self._pcap_close(p)
+                raise OSError(f"{function.__name__}({value}) failed with {result}")
+
+        # warnings are positive, errors negative
+        result = self._pcap_activate(p)
+        if result < 0:
+            error = self._pcap_geterr(p)
+            self._pcap_close(p)
+            raise OSError(error)
+        if result > 0:
+            Logging.logger.warning(
+                "pcap_activate on %s: %s", device, self._pcap_geterr(p)
+            )
+        return p
+
+    def has_pcap_create(self):
+        """
+        Check whether the loaded pcap library supports pcap_create (WinPcap versions prior to 4.1 do not).
+        :return: Whether pcap_create can be used.
+        :rtype: boolean
+        """
+        return self._pcap_create is not None
+
     def pcap_close(self, p):
         """
         Closes a given pcap object, closing all associated files and deallocating resources.
@@ -224,6 +371,16 @@ class WinPcap:
         """
         self._pcap_close(p)
 
+    def pcap_geterr(self, p):
+        """
+        Get the error message of the last error on the given pcap object.
+        :param p: The pcap object.
+        :type p: POINTER(pcap_t)
+        :return: The error message.
+        :rtype: bytes
+        """
+        return self._pcap_geterr(p)
+
     def pcap_setmintocopy(self, p, size):
         """
         Set minimum amount of data received in a single system call (unless the timeout expires).
@@ -234,6 +391,9 @@ class WinPcap:
         :return: 0 on success, -1 on failure.
         :rtype: int
         """
+        if self._pcap_setmintocopy is None:
+            # only available in WinPcap/Npcap, libpcap always copies packets as configured with immediate mode
+            return 0
         return self._pcap_setmintocopy(p, size)
 
     def pcap_next_ex(self, p, pkt_header, pkt_data):
@@ -250,6 +410,77 @@ class WinPcap:
         """
         return self._pcap_next_ex(p, pkt_header, pkt_data)
 
+    def pcap_dispatch(self, p, cnt, callback, user=None):
+        """
+        Process the packets of one buffer (at most cnt packets) by calling the given callback for each packet.
+        :param p: The pcap object to read from.
+        :type p: POINTER(pcap_t)
+        :param cnt: The maximum number of packets to process, -1 to process all packets of the buffer.
+        :type cnt: int
+        :param callback: The callback called with the user data, the packet header and the packet data.
+        :type callback: pcap_handler
+        :param user: User data passed to the callback.
+        :type user: Optional[POINTER(u_char)]
+        :return: The number of processed packets (0 on timeout), -1 on error, -2 if the loop was broken.
+        :rtype: int
+        """
+        return self._pcap_dispatch(p, cnt, callback, user)
+
+    def pcap_setnonblock(self, p, nonblock):
+        """
+        Put a capture into non-blocking mode (or back into blocking mode), where reading returns immediately if no
+        packets are available.
+        :param p: The pcap object.
+        :type p: POINTER(pcap_t)
+        :param nonblock: Whether to enable non-blocking mode.
+        :type nonblock: boolean
+        :return: -1 on failure, 0 on success.
+        :rtype: int
+        """
+        error_buffer = ctypes.create_string_buffer(256)
+        return self._pcap_setnonblock(p, int(nonblock), error_buffer)
+
+    def pcap_get_selectable_fd(self, p):
+        """
+        Return a file descriptor which can be used with select/poll to wait for packets of the capture.
+        :param p: The pcap object.
+        :type p: POINTER(pcap_t)
+        :return: The file descriptor or -1 if there is none (always on Windows).
+        :rtype: int
+        """
+        if self._pcap_get_selectable_fd is None:
+            return -1
+        return self._pcap_get_selectable_fd(p)
+
+    def pcap_getevent(self, p):
+        """
+        Return the event of a capture which is signaled when packets are available (WinPcap/Npcap only).
+        :param p: The pcap object.
+        :type p: POINTER(pcap_t)
+        :return: The event handle or None if there is none (always on other platforms).
+        :rtype: Optional[int]
+        """
+        if self._pcap_getevent is None:
+            return None
+        return self._pcap_getevent(p)
+
+    @staticmethod
+    def wait_for_event(event, timeout_ms):
+        """
+        Wait until the given event (see pcap_getevent) is signaled or the timeout expires.
+        :param event: The event handle.
+        :type event: int
+        :param timeout_ms: The timeout in milliseconds.
+        :type timeout_ms: int
+        :return: Whether the event was signaled.
+        :rtype: boolean
+        """
+        wait_for_single_object = ctypes.windll.kernel32.WaitForSingleObject
+        wait_for_single_object.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        wait_for_single_object.restype = ctypes.c_uint32
+        # WAIT_OBJECT_0
+        return wait_for_single_object(event, timeout_ms) == 0
+
     def pcap_sendpacket(self, p, buf, size=None):
         """
         Send a raw packet to the network.
@@ -0,0 +1,227 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import bisect
+import collections
+
+# upper bounds (in seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# reasons for rejecting a received frame
+REJECT_WRONG_MAC = "wrong_mac"
+REJECT_WRONG_ETHER_TYPE = "wrong_ether_type"
+REJECT_WRONG_SERVICE_TYPE = "wrong_service_type"
+REJECT_WRONG_XID = "wrong_xid"
+REJECT_MALFORMED = "malformed"
+REJECT_REASONS = (
+    REJECT_WRONG_MAC,
+    REJECT_WRONG_ETHER_TYPE,
+    REJECT_WRONG_SERVICE_TYPE,
+    REJECT_WRONG_XID,
+    REJECT_MALFORMED,
+)
+
+
+class Histogram:
+    """A histogram with fixed buckets, as used by Prometheus (each bucket counts the values up to its bound)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Create a new empty histogram.
+        :param buckets: The sorted upper bounds of the buckets, a last bucket without bound is added automatically.
+        :type buckets: Sequence[float]
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Add a value to the histogram.
+        :param value: The observed value.
+        :type value: float
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        """
+        Get the number of values up to each bucket bound (including the last bucket without bound).
+        :return: Pairs of bucket bound (inf for the last bucket) and cumulative count.
+        :rtype: List[Tuple[float, int]]
+        """
+        bounds = self.buckets + (float("inf"),)
+        cumulative = 0
+        result = []
+        for bound, count in zip(bounds, self.counts):
+            cumulative += count
+            result.append((bound, cumulative))
+        return result
+
+    def as_dict(self):
+        """
+        Export the histogram as dict.
+        :return: The cumulative bucket counts (by bound formatted as string), the sum and the count of all values.
+        :rtype: dict
+        """
+        return {
+            "buckets": {
+                format_bound(bound): count for bound, count in self.cumulative_counts()
+            },
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class Metrics:
+    """
+    Runtime metrics of DCP or of an L2 socket: counters of sent, received and rejected frames, parse errors, timeouts
+    and retries as well as latency histograms per operation. The metrics can be exported as dict or in the Prometheus
+    text format.
+    """
+
+    # help texts of the counters in the Prometheus export
+    COUNTERS = {
+        "frames_sent": "Frames sent.",
+        "frames_received": "Frames received.",
+        "frames_dropped": "Frames dropped before they could be received.",
+        "parse_errors": "Received frames that could not be parsed.",
+        "timeouts": "Requests without response before the timeout.",
+        "retries": "Requests sent again after a timeout.",
+    }
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Create new metrics with all counters at zero.
+        :param buckets: The bucket bounds of the latency histograms in seconds.
+        :type buckets: Sequence[float]
+        """
+        self.buckets = buckets
+        self.frames_sent = 0
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.parse_errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.frames_rejected = collections.Counter()
+        self.latencies = {}
+
+    def reject(self, reason):
+        """
+        Count a received frame that was rejected.
+        :param reason: The reason, e.g. REJECT_WRONG_XID.
+        :type reason: string
+        """
+        self.frames_rejected[reason] += 1
+
+    def observe_latency(self, operation, seconds):
+        """
+        Add a latency to the histogram of the given operation.
+        :param operation: The operation, e.g. "identify".
+        :type operation: string
+        :param seconds: The latency in seconds.
+        :type seconds: float
+        """
+        histogram = self.latencies.get(operation)
+        if histogram is None:
+            histogram = self.latencies[operation] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    def as_dict(self):
+        """
+        Export the metrics as dict.
+        :return: The counters, the rejected frames by reason and the latency histograms by operation.
+        :rtype: dict
+        """
+        result = {name: getattr(self, name) for name in self.COUNTERS}
+        result["frames_rejected"] = dict(self.frames_rejected)
+        result["latency_seconds"] = {
+            operation: histogram.as_dict()
+            for operation, histogram in self.latencies.items()
+        }
+        return result
+
+    def to_prometheus(self, prefix="profi_dcp", labels=None):
+        """
+        Export the metrics in the Prometheus text exposition format.
+        :param prefix: The prefix of all metric names. Default is "profi_dcp".
+        :type prefix: string
+        :param labels: Additional labels added to all samples, e.g. {"interface": "eth0"}.
+        :type labels: Optional[dict]
+        :return: The metrics in Prometheus text format.
+        :rtype: string
+        """
+        labels = labels or {}
+        lines = []
+        for name, help_text in self.COUNTERS.items():
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{format_labels(labels)} {getattr(self, name)}")
+
+        metric = f"{prefix}_frames_rejected_total"
+        lines.append(f"# HELP {metric} Received frames rejected by reason.")
+        lines.append(f"# TYPE {metric} counter")
+        for reason, count in sorted(self.frames_rejected.items()):
+            sample_labels = dict(labels, reason=reason)
+            lines.append(f"{metric}{format_labels(sample_labels)} {count}")
+
+        metric = f"{prefix}_request_latency_seconds"
+        lines.append(
+            f"# HELP {metric} Time from sending a request to receiving a response."
+        )
+        lines.append(f"# TYPE {metric} histogram")
+        for operation, histogram in sorted(self.latencies.items()):
+            operation_labels = dict(labels, operation=operation)
+            for bound, count in histogram.cumulative_counts():
+                sample_labels = dict(operation_labels, le=format_bound(bound))
+                lines.append(f"{metric}_bucket{format_labels(sample_labels)} {count}")
+            lines.append(
+                f"{metric}_sum{format_labels(operation_labels)} {histogram.sum}"
+            )
+            lines.append(
+                f"{metric}_count{format_labels(operation_labels)} {histogram.count}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+def format_bound(bound):
+    """
+    Format a bucket bound like Prometheus does.
+    :param bound: The bucket bound.
+    :type bound: float
+    :return: The formatted bound, "+Inf" for infinity.
+    :rtype: string
+    """
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def format_labels(labels):
+    """
+    Format labels of a sample in the Prometheus text format.
+    :param labels: The labels by name.
+    :type labels: dict
+    :return: The formatted labels (including braces) or an empty string if there are none.
+    :rtype: string
+    """
+    if not labels:
+        return ""
+    formatted = ",".join(
+        f'{name}="{escape_label_value(str(value))}"' for name, value in labels.items()
+    )
+    return f"{{{formatted}}}"
+
+
+def escape_label_value(value):
+    """
+    Escape a label value for the Prometheus text format.
+    :param value: The label value.
+    :type value: string
+    :return: The value with backslashes, double quotes and line feeds escaped.
+    :rtype: string
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
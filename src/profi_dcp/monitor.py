@@ -0,0 +1,213 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import multiprocessing
+import os
+import queue
+import socket
+import struct
+import threading
+
+import profi_dcp.dcp_constants as dcp_constants
+import profi_dcp.parsing as parsing
+import profi_dcp.util as util
+from profi_dcp.profi_dcp import Device
+from profi_dcp.utils.logging import Logging
+
+SOL_PACKET = 263
+PACKET_FANOUT = 18
+SO_TIMESTAMPNS = 35
+TIMESPEC = struct.Struct("@ll")
+MTU = 0xFFFF
+
+
+class DCPMonitor:
+    """
+    Passively monitors the DCP traffic on a network interface (Linux only), e.g. on the mirror port of a plant backbone,
+    and reports every device seen in an identify or get response, regardless of which host sent the request.
+    The frames are received and parsed by several worker processes which join a PACKET_FANOUT group: the kernel
+    distributes the frames among their sockets, so parsing scales across cores. The workers send the decoded devices
+    back to this process over a multiprocessing queue.
+    Opening the sockets requires the capability CAP_NET_RAW.
+    """
+
+    # fanout modes: by flow hash, round robin, or by the CPU that received the frame
+    FANOUT_HASH = 0
+    FANOUT_LB = 1
+    FANOUT_CPU = 2
+
+    def __init__(
+        self, interface, workers=None, mode=FANOUT_HASH, group_id=None, max_queue=0
+    ):
+        """
+        Create a new monitor, start it with start().
+        :param interface: The network interface to monitor.
+        :type interface: string
+        :param workers: The number of worker processes. Default is the number of CPUs.
+        :type workers: Optional[int]
+        :param mode: How the kernel distributes the frames among the workers, one of the FANOUT_* modes.
+        :type mode: int
+        :param group_id: The id of the fanout group (16 bit), must be unique on the interface. Default is derived from
+        the process id.
+        :type group_id: Optional[int]
+        :param max_queue: The maximum number of devices queued for this process, 0 for no limit.
+        :type max_queue: int
+        """
+        self.interface = interface
+        self.workers = workers or os.cpu_count() or 1
+        self.mode = mode
+        self.group_id = (os.getpid() if group_id is None else group_id) & 0xFFFF
+        self.__queue = multiprocessing.Queue(max_queue)
+        self.__stop = multiprocessing.Event()
+        # frames received and responses decoded per worker, each worker only writes its own slot
+        self.__frames = multiprocessing.Array("Q", self.workers, lock=False)
+        self.__responses = multiprocessing.Array("Q", self.workers, lock=False)
+        self.__processes = []
+
+    def start(self, timeout=5):
+        """
+        Start the worker processes, returns once all of them joined the fanout group. If a worker cannot open its
+        socket (e.g. without the capability CAP_NET_RAW), all workers are stopped and an OSError is raised.
+        :param timeout: The time in seconds to wait for the workers to join the fanout group.
+        :type timeout: float
+        """
+        ready = multiprocessing.Barrier(self.workers + 1)
+        self.__stop.clear()
+        self.__processes = [
+            multiprocessing.Process(
+                target=monitor_worker,
+                args=(
+                    index,
+                    self.interface,
+                    self.group_id | self.mode << 16,
+                    self.__queue,
+                    self.__stop,
+                    ready,
+                    self.__frames,
+                    self.__responses,
+                ),
+                daemon=True,
+            )
+            for index in range(self.workers)
+        ]
+        for process in self.__processes:
+            process.start()
+        try:
+            ready.wait(timeout)
+        except threading.BrokenBarrierError:
+            self.stop()
+            raise OSError(f"Could not start monitoring {self.interface}")
+        Logging.logger.debug(
+            "Monitoring %s with %s workers", self.interface, self.workers
+        )
+
+    def stop(self, timeout=1):
+        """
+        Stop the worker processes. Devices already queued can still be read with get.
+        :param timeout: The time in seconds to wait for each worker to exit before it is terminated.
+        :type timeout: float
+        """
+        self.__stop.set()
+        for process in self.__processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.__processes = []
+
+    def get(self, timeout=None):
+        """
+        Get the next device seen by the workers.
+        :param timeout: The time in seconds to wait for a device, None to wait forever.
+        :type timeout: Optional[float]
+        :return: The device (with the receive time of the response as timestamp) or None after the timeout.
+        :rtype: Optional[Device]
+        """
+        try:
+            return self.__queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    @property
+    def frames_received(self):
+        """
+        The number of frames received by all workers.
+        :rtype: int
+        """
+        return sum(self.__frames)
+
+    @property
+    def responses(self):
+        """
+        The number of identify and get responses decoded by all workers.
+        :rtype: int
+        """
+        return sum(self.__responses)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def monitor_worker(index, interface, fanout, devices, stop, ready, frames, responses):
+    """
+    The main function of a worker process of DCPMonitor: receive the frames of the fanout group and put the devices of
+    all identify and get responses into the queue.
+    :param index: The index of the worker, i.e. its slot in frames and responses.
+    :type index: int
+    :param interface: The network interface.
+    :type interface: string
+    :param fanout: The fanout group id and mode, the argument of the socket option PACKET_FANOUT.
+    :type fanout: int
+    :param devices: The queue to put the devices into.
+    :type devices: multiprocessing.Queue
+    :param stop: Set to stop the worker.
+    :type stop: multiprocessing.Event
+    :param ready: Passed once the socket joined the fanout group.
+    :type ready: multiprocessing.Barrier
+    :param frames: The number of received frames per worker.
+    :type frames: Array
+    :param responses: The number of decoded responses per worker.
+    :type responses: Array
+    """
+    try:
+        raw_socket = socket.socket(
+            socket.AF_PACKET, socket.SOCK_RAW, socket.htons(dcp_constants.ETHER_TYPE)
+        )
+        raw_socket.bind((interface, 0))
+        raw_socket.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+        raw_socket.setsockopt(SOL_PACKET, PACKET_FANOUT, fanout)
+        raw_socket.settimeout(0.1)
+    except OSError:
+        # let start() fail instead of waiting for this worker
+        ready.abort()
+        raise
+    ancillary_size = socket.CMSG_SPACE(TIMESPEC.size)
+
+    try:
+        ready.wait()
+        while not stop.is_set():
+            try:
+                frame, ancillary_data, _, _ = raw_socket.recvmsg(MTU, ancillary_size)
+            except socket.timeout:
+                continue
+            frames[index] += 1
+            response = parsing.parse_observed_response(frame)
+            if response is None:
+                continue
+            device = Device()
+            device.MAC = util.mac_address_to_string(frame[6:12])
+            if not parsing.decode_device(response[2], device):
+                continue
+            for level, kind, data in ancillary_data:
+                if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS:
+                    seconds, nanoseconds = TIMESPEC.unpack_from(data)
+                    device.timestamp = seconds + nanoseconds * 1e-9
+            responses[index] += 1
+            devices.put(device)
+    finally:
+        raw_socket.close()
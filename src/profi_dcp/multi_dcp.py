@@ -0,0 +1,118 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import profi_dcp.interfaces as interfaces
+from profi_dcp.inventory import Inventory
+from profi_dcp.profi_dcp import DCP
+
+
+class MultiDCP:
+    """
+    Provides DCP-functions on several network interfaces at once. A DCP instance is opened for each interface and
+    requests to all interfaces are handled concurrently (one thread per interface), so that e.g. identifying all
+    devices takes as long as on the slowest interface instead of the sum of all interfaces.
+    """
+
+    def __init__(
+        self, ips=None, share_socket=False, conflict_policy=Inventory.KEEP_NEWEST
+    ):
+        """
+        Create a new instance for the network interfaces with the given IP addresses.
+        :param ips: The IP addresses used to select the network interfaces. If None, all interfaces which are up and
+        have an IPv4 and a mac address are used (except loopback interfaces).
+        :type ips: Optional[List[string]]
+        :param share_socket: Passed to the DCP instances, see DCP.
+        :type share_socket: boolean
+        :param conflict_policy: Which data to keep if the responses of a device differ, on each interface and across the
+        interfaces, see Inventory.
+        :type conflict_policy: string
+        """
+        self.conflict_policy = conflict_policy
+        if ips is None:
+            ips = self.all_interface_ips()
+        self.instances = []
+        try:
+            for ip in ips:
+                instance = DCP(ip, share_socket=share_socket)
+                instance.conflict_policy = conflict_policy
+                self.instances.append(instance)
+        except BaseException:
+            # do not leak the sockets of the instances already opened
+            self.close()
+            raise
+
+    @staticmethod
+    def all_interface_ips():
+        """
+        Return an IPv4 address of each network interface usable for DCP.
+        :return: One IPv4 address per interface.
+        :rtype: List[string]
+        """
+        ips = []
+        for interface in interfaces.default_resolver().interfaces():
+            if not (interface.is_up and interface.ipv4_addresses):
+                continue
+            if interface.mac_address in (None, "00:00:00:00:00:00"):
+                continue
+            ip_address, _ = interface.ipv4_addresses[0]
+            if not ip_address.startswith("127."):
+                ips.append(ip_address)
+        return ips
+
+    def identify_all(self, timeout=None, response_delay=None, auto_tune=False):
+        """
+        Identify all devices on all network interfaces at once, see DCP.identify_all.
+        The devices of all interfaces are merged into one inventory (with conflict_policy). Each device carries the names
+        of all network interfaces it was found on (attribute 'interfaces') and the name of the interface of the kept
+        response (attribute 'interface'). The dropped frames and the duplicate responses of all interfaces are summed
+        up.
+        :param timeout: Optional timeout in seconds, see DCP.identify_all.
+        :type timeout: Optional[float]
+        :param response_delay: Optional response delay factor, see DCP.identify_all.
+        :type response_delay: Optional[int]
+        :param auto_tune: Whether to tune the response delay per interface, see DCP.identify_all.
+        :type auto_tune: boolean
+        :return: All devices found on all interfaces.
+        :rtype: Inventory
+        """
+        results = self.__run_concurrently(
+            lambda instance: instance.identify_all(timeout, response_delay, auto_tune)
+        )
+
+        inventory = Inventory(conflict_policy=self.conflict_policy)
+        for instance, devices in zip(self.instances, results):
+            if devices.drops is not None:
+                inventory.drops = (inventory.drops or 0) + devices.drops
+            inventory.duplicates += devices.duplicates
+            inventory.conflicts.extend(devices.conflicts)
+            for device in devices:
+                device.interface = instance.network_interface
+                existing = inventory.by_mac.get(device.MAC)
+                interfaces = {instance.network_interface}
+                if existing is not None:
+                    interfaces |= existing.interfaces
+                inventory.add(device)
+                inventory.by_mac[device.MAC].interfaces = interfaces
+        return inventory
+
+    def close(self):
+        """Close the DCP instances of all network interfaces."""
+        for instance in self.instances:
+            instance.close()
+
+    def __run_concurrently(self, function):
+        """
+        Call the given function for each DCP instance in its own thread and wait for all results.
+        :param function: The function to call with the DCP instance.
+        :type function: Callable[[DCP], Any]
+        :return: The results in the order of the instances.
+        :rtype: List[Any]
+        """
+        if not self.instances:
+            return []
+        with ThreadPoolExecutor(max_workers=len(self.instances)) as executor:
+            return list(executor.map(function, self.instances))
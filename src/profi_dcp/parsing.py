@@ -0,0 +1,200 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+
+Bounds-checked decoding of received DCP frames. In contrast to the Packet classes of profi_dcp.protocol (which are used
+to build requests), these functions never raise for malformed or truncated frames: they check every length against the
+size of the frame and report malformed frames as result instead.
+"""
+
+import collections
+import socket
+import struct
+
+import profi_dcp.dcp_constants as dcp_constants
+from profi_dcp.dcp_constants import Option, ServiceID, ServiceType
+from profi_dcp.metrics import (
+    REJECT_MALFORMED,
+    REJECT_WRONG_ETHER_TYPE,
+    REJECT_WRONG_MAC,
+    REJECT_WRONG_SERVICE_TYPE,
+    REJECT_WRONG_XID,
+)
+
+# offsets of the DCP header fields in an (untagged) ethernet frame
+ETHER_TYPE_OFFSET = 12
+FRAME_ID_OFFSET = 14
+SERVICE_ID_OFFSET = 16
+SERVICE_TYPE_OFFSET = 17
+XID_OFFSET = 18
+LENGTH_OFFSET = 24
+# offset of the first DCP block, i.e. the size of the ethernet and DCP headers
+BLOCKS_OFFSET = 26
+
+ETHER_TYPE = struct.pack(">H", dcp_constants.ETHER_TYPE)
+UINT16 = struct.Struct(">H")
+UINT32 = struct.Struct(">I")
+BLOCK_HEADER = struct.Struct(">BBH")
+
+# a DCP block of a response: option, sub-option, the block status (or the first two bytes of the block data for blocks
+# without status, e.g. control blocks) and the remaining block data
+Block = collections.namedtuple("Block", ["option", "suboption", "status", "value"])
+
+
+def check_response(frame, destination, xid):
+    """
+    Check whether the frame is a DCP response with the given XID addressed to the given mac address, without decoding
+    anything but the header fields needed for the check.
+    :param frame: The received ethernet frame.
+    :type frame: bytes
+    :param destination: The mac address of the receiver.
+    :type destination: bytes
+    :param xid: The XID of the request.
+    :type xid: int
+    :return: None for a valid response, otherwise the reason for rejecting it (one of the REJECT_* constants of
+    profi_dcp.metrics).
+    :rtype: Optional[string]
+    """
+    if len(frame) < BLOCKS_OFFSET:
+        return REJECT_MALFORMED
+    if frame[:6] != destination:
+        return REJECT_WRONG_MAC
+    if frame[ETHER_TYPE_OFFSET:FRAME_ID_OFFSET] != ETHER_TYPE:
+        return REJECT_WRONG_ETHER_TYPE
+    if frame[SERVICE_TYPE_OFFSET] != ServiceType.RESPONSE:
+        return REJECT_WRONG_SERVICE_TYPE
+    if UINT32.unpack_from(frame, XID_OFFSET)[0] != xid:
+        return REJECT_WRONG_XID
+    if BLOCKS_OFFSET + UINT16.unpack_from(frame, LENGTH_OFFSET)[0] > len(frame):
+        return REJECT_MALFORMED
+    return None
+
+
+def parse_observed_response(frame):
+    """
+    Decode an identify or get response observed on the network, e.g. by passive monitoring: in contrast to
+    check_response, responses to any host and any request are accepted.
+    :param frame: The received ethernet frame.
+    :type frame: bytes
+    :return: The service ID, the XID and the blocks of the response or None if the frame is not a (well-formed)
+    identify or get response.
+    :rtype: Optional[Tuple[int, int, List[Block]]]
+    """
+    if (
+        len(frame) < BLOCKS_OFFSET
+        or frame[ETHER_TYPE_OFFSET:FRAME_ID_OFFSET] != ETHER_TYPE
+    ):
+        return None
+    service_id = frame[SERVICE_ID_OFFSET]
+    if frame[SERVICE_TYPE_OFFSET] != ServiceType.RESPONSE or service_id not in (
+        ServiceID.IDENTIFY,
+        ServiceID.GET,
+    ):
+        return None
+    blocks = parse_blocks(frame)
+    if blocks is None:
+        return None
+    return service_id, UINT32.unpack_from(frame, XID_OFFSET)[0], blocks
+
+
+def parse_blocks(frame, start=BLOCKS_OFFSET, end=None):
+    """
+    Split the DCP data of a frame into its blocks. Each block must fit completely into the DCP data, the padding of a
+    block with odd length may be missing after the last block. A trailing fragment too short to be a block (less than
+    header and status) is ignored like padding.
+    :param frame: The frame containing the DCP data.
+    :type frame: bytes
+    :param start: The offset of the first block. Default is the offset in an ethernet frame.
+    :type start: int
+    :param end: The end of the DCP data. Default is given by the length field of the DCP header of the frame.
+    :type end: Optional[int]
+    :return: The blocks or None if the data is malformed.
+    :rtype: Optional[List[Block]]
+    """
+    if end is None:
+        if len(frame) < BLOCKS_OFFSET:
+            return None
+        end = BLOCKS_OFFSET + UINT16.unpack_from(frame, LENGTH_OFFSET)[0]
+    if end > len(frame):
+        return None
+
+    blocks = []
+    offset = start
+    while offset < end:
+        if offset + 6 > end:
+            break
+        option, suboption, length = BLOCK_HEADER.unpack_from(frame, offset)
+        value_end = offset + 4 + length
+        if length < 2 or value_end > end:
+            return None
+        status = UINT16.unpack_from(frame, offset + 4)[0]
+        blocks.append(Block(option, suboption, status, frame[offset + 6 : value_end]))
+        # blocks are padded to even length
+        offset = value_end + (length % 2)
+    return blocks
+
+
+def decode_string(value):
+    """
+    Decode a string value (e.g. the name of station) of a DCP block, without raising for invalid encodings.
+    :param value: The block value.
+    :type value: bytes
+    :return: The decoded string.
+    :rtype: string
+    """
+    return value.rstrip(b"\x00").decode(errors="replace")
+
+
+def decode_ip_parameters(value):
+    """
+    Decode the value of an IP parameter block.
+    :param value: The block value.
+    :type value: bytes
+    :return: IP address, subnet mask and gateway as strings or None if the value is too short.
+    :rtype: Optional[Tuple[string, string, string]]
+    """
+    if len(value) < 12:
+        return None
+    return (
+        socket.inet_ntoa(value[0:4]),
+        socket.inet_ntoa(value[4:8]),
+        socket.inet_ntoa(value[8:12]),
+    )
+
+
+def decode_device(blocks, device):
+    """
+    Set the attributes of the device (name_of_station, IP, netmask, gateway, family) from the blocks of an identify or
+    get response. Blocks of other options are ignored.
+    :param blocks: The blocks of the response.
+    :type blocks: Iterable[Block]
+    :param device: The device to fill, e.g. a profi_dcp.Device.
+    :type device: Any
+    :return: False if a block is malformed, True otherwise.
+    :rtype: boolean
+    """
+    for block in blocks:
+        block_option = (block.option, block.suboption)
+        if block_option == Option.NAME_OF_STATION:
+            device.name_of_station = decode_string(block.value)
+        elif block_option == Option.IP_ADDRESS:
+            ip_parameters = decode_ip_parameters(block.value)
+            if ip_parameters is None:
+                return False
+            device.IP, device.netmask, device.gateway = ip_parameters
+        elif block_option == Option.DEVICE_FAMILY:
+            device.family = decode_string(block.value)
+    return True
+
+
+def decode_response_code(blocks):
+    """
+    Extract the response code of a set response from its control block.
+    :param blocks: The blocks of the response.
+    :type blocks: List[Block]
+    :return: The response code or None if the response does not start with a (complete) control block.
+    :rtype: Optional[int]
+    """
+    if not blocks or blocks[0].option != 5 or not blocks[0].value:
+        return None
+    return blocks[0].value[0]
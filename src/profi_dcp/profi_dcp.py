@@ -4,15 +4,15 @@ Copyright (c) 2020 Codewerk GmbH, Karlsruhe.
 All Rights Reserved.
 """
 
+import math
 import random
 import re
-import socket
-import time
-
-import psutil
-import ipaddress
+import struct
 
 import profi_dcp.dcp_constants as dcp_constants
+import profi_dcp.interfaces as interfaces
+import profi_dcp.metrics as metrics
+import profi_dcp.parsing as parsing
 import profi_dcp.util as util
 from profi_dcp.dcp_constants import (
     ServiceType,
@@ -22,17 +22,29 @@ from profi_dcp.dcp_constants import (
     BlockQualifier,
     ResetFactoryModes,
 )
+from profi_dcp.clock import system_clock
 from profi_dcp.error import DcpTimeoutError
-from profi_dcp.l2socket import L2Socket
+from profi_dcp.inventory import Inventory
+from profi_dcp.scheduler import TransmitScheduler
+from profi_dcp.metrics import Metrics
+from profi_dcp.l2socket import L2Socket, get_l2socket
+from profi_dcp.l2socket.transport import INBOUND, OUTBOUND
 from profi_dcp.protocol import (
     DCPPacket,
     EthernetPacket,
-    DCPBlock,
     DCPBlockRequest,
     DCPBlockRequestGet,
 )
+from profi_dcp.response_delay import ResponseDelayTuner
 from profi_dcp.utils.logging import Logging
 
+# names of the DCP services, used as operation names in the metrics
+SERVICE_NAMES = {
+    ServiceID.GET: "get",
+    ServiceID.SET: "set",
+    ServiceID.IDENTIFY: "identify",
+}
+
 
 class Device:
     """A DCP device defined by its properties (name of station, mac address, ip address etc.)."""
@@ -45,6 +57,13 @@ class Device:
         self.netmask = ""
         self.gateway = ""
         self.family = ""
+        # the receive time of the response and the time from sending the request to receiving the response in seconds
+        self.timestamp = None
+        self.response_time = None
+        # the name of the network interface the response was received on and the names of all network interfaces the
+        # device was found on, set by MultiDCP
+        self.interface = None
+        self.interfaces = set()
 
     def __str__(self):
         """
@@ -56,9 +75,84 @@ class Device:
         return f"Device({', '.join(parameters)})"
 
     def to_log(self):
-        Logging.logger.info(f"Device '{self.name_of_station}':")
+        Logging.logger.info("Device '%s':", self.name_of_station)
         for key, value in self.__dict__.items():
-            Logging.logger.info(f"\t{key}: '{value}'")
+            Logging.logger.info("\t%s: '%s'", key, value)
+
+
+class SweepPartition:
+    """
+    One partition of a discovery sweep (see DCP.identify_sweep). A partition is a single identify request, optionally
+    filtered so that only the matching devices respond, and sent with its own response delay factor.
+    """
+
+    def __init__(self, option=Option.ALL, value=None, response_delay=None):
+        """
+        Create a new sweep partition.
+        :param option: The option and sub-option pair used as identify filter. Default is Option.ALL (no filter).
+        :type option: Tuple[int, int]
+        :param value: The filter value expected by the devices for the given option (None for Option.ALL).
+        :type value: Optional[bytes]
+        :param response_delay: The response delay factor sent with the request. If None, it is chosen by the sweep.
+        :type response_delay: Optional[int]
+        """
+        self.option = option
+        self.value = value
+        self.response_delay = response_delay
+
+    @classmethod
+    def by_device_id(cls, vendor_id, device_id, response_delay=None):
+        """
+        Create a partition only matching devices with the given vendor and device ID.
+        :param vendor_id: The PROFINET vendor ID.
+        :type vendor_id: int
+        :param device_id: The PROFINET device ID.
+        :type device_id: int
+        :param response_delay: Optional response delay factor for this partition.
+        :type response_delay: Optional[int]
+        :return: The new partition.
+        :rtype: SweepPartition
+        """
+        value = struct.pack(">HH", vendor_id, device_id)
+        return cls(Option.DEVICE_ID, value, response_delay)
+
+    @classmethod
+    def by_name_of_station(cls, name, response_delay=None):
+        """
+        Create a partition only matching the device with the given name of station. Note that DCP compares the full
+        name, a prefix of the name does not match.
+        :param name: The name of station.
+        :type name: string
+        :param response_delay: Optional response delay factor for this partition.
+        :type response_delay: Optional[int]
+        :return: The new partition.
+        :rtype: SweepPartition
+        """
+        return cls(Option.NAME_OF_STATION, name.encode("ascii"), response_delay)
+
+    @classmethod
+    def by_family(cls, family, response_delay=None):
+        """
+        Create a partition only matching devices of the given device family (i.e. type of station).
+        :param family: The device family.
+        :type family: string
+        :param response_delay: Optional response delay factor for this partition.
+        :type response_delay: Optional[int]
+        :return: The new partition.
+        :rtype: SweepPartition
+        """
+        return cls(Option.DEVICE_FAMILY, family.encode("ascii"), response_delay)
+
+    def __str__(self):
+        """
+        Return a human-readable string representation of the partition.
+        :return: String representation of this partition.
+        :rtype: string
+        """
+        return (
+            f"SweepPartition(option={self.option}, value={self.value}, "
+            f"response_delay={self.response_delay})"
+        )
 
 
 class DCP:
@@ -68,134 +162,318 @@ class DCP:
     available through this instance.
     """
 
-    def __init__(self, ip):
+    def __init__(
+        self,
+        ip=None,
+        share_socket=False,
+        backend=None,
+        socket_options=None,
+        transport=None,
+        clock=None,
+        metrics=None,
+        tracer=None,
+        scheduler=None,
+        capture=None,
+    ):
         """
         Create a new instance, use the given ip to select the network interface.
-        :param ip: The ip address used to select the network interface.
-        :type ip: string
+        :param ip: The ip address used to select the network interface. Not used if a transport is given.
+        :type ip: Optional[string]
+        :param share_socket: If True, all instances on the same network interface share a single socket (see
+        SocketRegistry). This makes creating instances cheaper and avoids receiving every frame once per instance.
+        :type share_socket: boolean
+        :param backend: The L2 socket backend, "raw" (Linux only) or "pcap". Default is the platform's default backend.
+        :type backend: Optional[string]
+        :param socket_options: Additional keyword arguments for the L2 socket, e.g. buffer_size for the pcap backend.
+        :type socket_options: Optional[dict]
+        :param transport: Use this transport (e.g. an L2MemorySocket) instead of opening an L2 socket. Its mac address
+        is used as source address and no network interface is looked up.
+        :type transport: Optional[L2Transport]
+        :param clock: The clock used to measure timeouts, e.g. a VirtualClock for simulations. Default is the clock of
+        the transport (if it has one) or the system clock.
+        :type clock: Optional[Clock]
+        :param metrics: The metrics to count frames, rejected frames, timeouts and latencies in, e.g. to share them
+        between several instances. Default is a new Metrics object.
+        :type metrics: Optional[Metrics]
+        :param tracer: A tracer notified about requests, received frames and responses, e.g. a ChromeTracer to record a
+        timeline of all operations. Default is None (no tracing).
+        :type tracer: Optional[Tracer]
+        :param scheduler: A transmit scheduler limiting the rate of the requests, e.g. shared with other instances on the
+        same network. The requests are sent with the priority class self.transmit_priority. Default is None (requests
+        are sent immediately).
+        :type scheduler: Optional[TransmitScheduler]
+        :param capture: A writer all frames sent and received by this instance are written to, e.g. a PcapngWriter.
+        Writing only queues the frames, they are written to the file by a separate thread. Default is None.
+        :type capture: Optional[PcapngWriter]
         """
-        (
-            self.src_mac,
-            network_interface,
-            if_ip_address,
-        ) = self.__get_network_interface_and_mac_address(ip)
+        if clock is None:
+            clock = getattr(transport, "clock", None) or system_clock
+        self.clock = clock
+        self.metrics = Metrics() if metrics is None else metrics
+        self.tracer = tracer
+        self.scheduler = scheduler
+        self.capture = capture
+        self.transmit_priority = TransmitScheduler.INTERACTIVE
+        # time and operation of the last request, to measure the latency of the responses
+        self.__request_sent = None
+        self.__request_operation = None
+
+        if transport is not None:
+            self.src_mac = transport.mac
+            self.network_interface = None
+        elif ip is not None:
+            (
+                self.src_mac,
+                self.network_interface,
+                if_ip_address,
+            ) = self.__get_network_interface_and_mac_address(ip)
+        else:
+            raise ValueError("Either an ip address or a transport must be given.")
+        # compared with the destination of the received frames
+        self.__src_mac_bytes = util.mac_address_to_bytes(self.src_mac)
 
         self.default_timeout = 7  # default timeout for requests (in seconds)
         self.identify_all_timeout = (
             7  # timeout to receive all responses for identify_all
         )
+        # chooses the response delay for identify_all(auto_tune=True) from the previous scans
+        self.response_delay_tuner = ResponseDelayTuner()
+        # which data identify_all and identify_sweep keep if a device responds more than once with different data
+        self.conflict_policy = Inventory.KEEP_NEWEST
 
         # the XID is the id of the current transaction and can be used to identify the responses to a request
         # initialize it with a random value
         self.__xid = int(random.getrandbits(32))
 
+        if transport is not None:
+            self.__socket = transport
+            return
+
         # This filter in BPF format filters all unrelated packets (i.e. wrong mac address or ether type) before they are
         # processed by python. This solves issues in high traffic networks, as otherwise packets might be missed under
         # heavy load when python is not fast enough processing them.
         socket_filter = (
             f"ether host {self.src_mac} and ether proto {dcp_constants.ETHER_TYPE}"
         )
-        self.__socket = L2Socket(
-            ip=if_ip_address,
-            interface=network_interface,
-            bpf_filter=socket_filter,
-            protocol=dcp_constants.ETHER_TYPE,
-        )
+        socket_class = L2Socket if backend is None else get_l2socket(backend)
+        socket_options = socket_options or {}
+        if share_socket:
+            # the registry is imported here as its receive threads are only needed when sharing sockets
+            from profi_dcp.l2socket import registry
+
+            self.__socket = registry.default_registry().acquire(
+                socket_class,
+                ip=if_ip_address,
+                interface=self.network_interface,
+                bpf_filter=socket_filter,
+                protocol=dcp_constants.ETHER_TYPE,
+                **socket_options,
+            )
+        else:
+            self.__socket = socket_class(
+                ip=if_ip_address,
+                interface=self.network_interface,
+                bpf_filter=socket_filter,
+                protocol=dcp_constants.ETHER_TYPE,
+                **socket_options,
+            )
+
+    def close(self):
+        """Close the socket of this instance (or release it, if it is shared with other instances)."""
+        self.__socket.close()
 
     @staticmethod
     def __get_network_interface_and_mac_address(
         ip_address, subnet_mask="255.255.255.0"
     ):
         """
-        Get the mac address and name of the network interface corresponding to the given IP address by iterating over
-        all available network interfaces and comparing the IP addresses.
+        Get the mac address and name of the network interface corresponding to the given IP address with the (cached)
+        default interface resolver, see InterfaceResolver.resolve.
         If no interface with the given IP address is found, a ValueError is raised.
         :param ip_address: The IP address to select the network interface with.
         :type ip_address: string
-        :return: MAC-address, Interface name
-        :rtype: Tuple[string, string]
-        """
-        stats = psutil.net_if_stats()
-        for network_interface, addresses in psutil.net_if_addrs().items():
-            addresses_by_family = {}
-            for address in addresses:
-                addresses_by_family.setdefault(address.family, []).append(address)
-
-            # try to match either ipv4 or ipv6 address, ipv6 addresses may have additional suffix
-            ipv4_match = any(
-                address.address == ip_address
-                for address in addresses_by_family.get(socket.AF_INET, [])
-            )
-            ipv6_match = any(
-                address.address.startswith(ip_address)
-                for address in addresses_by_family.get(socket.AF_INET6, [])
-            )
-
-            network = ipaddress.ip_network(f"{ip_address}/{subnet_mask}", strict=False)
-            network_match = any(
-                ipaddress.ip_address(address.address) in network
-                for address in addresses_by_family.get(socket.AF_INET, [])
-            )
-            if ipv4_match or ipv6_match or network_match:
-                if not addresses_by_family.get(psutil.AF_LINK, False):
-                    Logging.logger.warning(
-                        f"Found network interface '{network_interface}' matching the ip {ip_address} but no corresponding mac address "
-                        f"with AF_LINK = {psutil.AF_LINK}"
-                    )
-                    continue
-                if not (
-                    network_interface in stats
-                    and getattr(stats[network_interface], "isup")
-                ):
-                    Logging.logger.warning(
-                        f"Found network interface '{network_interface}' matching the ip {ip_address} but is not up."
-                    )
-                    continue
-                mac_address = addresses_by_family[psutil.AF_LINK][0].address
-                if_ip_address = addresses_by_family[socket.AF_INET][0].address
-                Logging.logger.info(
-                    f"Found network interface '{network_interface}' by ip {ip_address}"
-                )
-                return (
-                    mac_address.replace("-", ":").lower(),
-                    network_interface,
-                    if_ip_address,
-                )
-        Logging.logger.debug(
-            f"Could not find a network interface for ip {ip_address} in {psutil.net_if_addrs()}"
-        )
-        raise ValueError(f"Could not find a network interface for ip {ip_address}.")
+        :return: MAC-address, Interface name, IPv4 address of the interface
+        :rtype: Tuple[string, string, string]
+        """
+        return interfaces.default_resolver().resolve(ip_address, subnet_mask)
 
-    def identify_all(self, timeout=None):
+    def identify_all(
+        self, timeout=None, response_delay=None, auto_tune=False, expected_devices=None
+    ):
         """
         Send multicast request to identify ALL devices in current network interface and get information about them.
         :param timeout: Optional timeout in seconds. Since it is unknown how many devices will respond to the request,
         responses are received for the full duration of the timeout. The default is defined in self.default_timeout.
         :type timeout: integer
-        :return: A list containing all devices found.
-        :rtype: List[Device]
+        :param response_delay: Optional response delay factor, the devices spread their responses over
+        response_delay * 10ms. The default is defined in dcp_constants.RESPONSE_DELAY.
+        :type response_delay: Optional[int]
+        :param auto_tune: If True, the response delay factor and the timeout (unless given) are chosen by
+        self.response_delay_tuner based on the previous scans, and the result of this scan is fed back to the tuner.
+        :type auto_tune: boolean
+        :param expected_devices: Optional number of devices expected to respond, the receive queue of the socket is
+        grown to hold all their responses (see L2Transport.reserve_frames). With auto_tune, the number of devices
+        found by the previous scans is used by default.
+        :type expected_devices: Optional[int]
+        :return: All devices found, each device only once (see Inventory and self.conflict_policy), with the number of
+        frames dropped by the socket during the scan.
+        :rtype: Inventory
+        """
+        if auto_tune:
+            response_delay = self.response_delay_tuner.response_delay
+            if timeout is None:
+                timeout = self.response_delay_tuner.timeout(response_delay)
+            if expected_devices is None:
+                expected_devices = self.response_delay_tuner.expected_devices
+        elif response_delay is None:
+            response_delay = dcp_constants.RESPONSE_DELAY
+
+        if timeout is None:
+            response_window = response_delay * dcp_constants.RESPONSE_DELAY_UNIT
+            timeout = max(self.identify_all_timeout, response_window)
+
+        if expected_devices:
+            self.__socket.reserve_frames(expected_devices)
+
+        devices = self.__identify_multicast(Option.ALL, None, response_delay, timeout)
+
+        if auto_tune:
+            self.response_delay_tuner.update(
+                len(devices), devices.duplicates, drops=devices.drops or 0
+            )
+        return devices
+
+    def identify_sweep(self, partitions, max_frames_per_second=None, timeout=None):
+        """
+        Identify devices with several (filtered) identify requests instead of a single identify_all. On large network
+        segments this avoids that all devices respond within the same response delay window, which can overflow switch
+        buffers and the receive queue of the socket.
+        The partitions are sent one after another and the found devices are merged into a single inventory, where each
+        device (identified by its MAC address) occurs only once (see self.conflict_policy).
+        If max_frames_per_second is given, the sweep keeps the response rate below this budget: the response delay
+        factor of partitions without explicit delay is chosen from the largest number of responses seen so far, and
+        the next partition is only sent once the responses received so far fit into the budget.
+        :param partitions: The partitions of the sweep.
+        :type partitions: Iterable[SweepPartition]
+        :param max_frames_per_second: Optional upper limit for the rate of responses.
+        :type max_frames_per_second: Optional[float]
+        :param timeout: Optional timeout in seconds for each partition. It is extended if the response delay of a
+        partition is longer. The default is defined in self.identify_all_timeout.
+        :type timeout: Optional[float]
+        :return: All devices found, with the number of frames dropped by the socket during the sweep.
+        :rtype: Inventory
+        """
+        timeout = self.identify_all_timeout if timeout is None else timeout
+
+        devices = Inventory(conflict_policy=self.conflict_policy)
+        expected_responses = 0
+        received_responses = 0
+        sweep_start = self.clock.time()
+        for partition in partitions:
+            response_delay = partition.response_delay
+            if response_delay is None:
+                response_delay = dcp_constants.RESPONSE_DELAY
+                if max_frames_per_second:
+                    response_delay = max(
+                        response_delay,
+                        self.response_delay_for(
+                            expected_responses, max_frames_per_second
+                        ),
+                    )
+
+            if max_frames_per_second:
+                # wait until all responses received so far fit into the frame budget
+                next_start = sweep_start + received_responses / max_frames_per_second
+                now = self.clock.time()
+                if next_start > now:
+                    self.clock.sleep(next_start - now)
+
+            option, value = partition.option, partition.value
+            response_window = response_delay * dcp_constants.RESPONSE_DELAY_UNIT
+            partition_devices = self.__identify_multicast(
+                option, value, response_delay, max(timeout, response_window)
+            )
+            Logging.logger.debug(
+                "%s identified %s devices", partition, len(partition_devices)
+            )
+
+            expected_responses = max(expected_responses, len(partition_devices))
+            received_responses += len(partition_devices) + partition_devices.duplicates
+            devices.duplicates += partition_devices.duplicates
+            devices.conflicts.extend(partition_devices.conflicts)
+            devices.update(partition_devices)
+            if partition_devices.drops is not None:
+                devices.drops = (devices.drops or 0) + partition_devices.drops
+
+        return devices
+
+    @staticmethod
+    def response_delay_for(device_count, max_frames_per_second):
+        """
+        Compute the smallest response delay factor that spreads the responses of the given number of devices so that
+        the given response rate is not exceeded.
+        :param device_count: The number of devices expected to respond.
+        :type device_count: int
+        :param max_frames_per_second: The maximum rate of responses.
+        :type max_frames_per_second: float
+        :return: The response delay factor, limited to the range allowed by the DCP specification.
+        :rtype: int
+        """
+        window = device_count / max_frames_per_second
+        factor = math.ceil(window / dcp_constants.RESPONSE_DELAY_UNIT)
+        return min(max(factor, 1), dcp_constants.MAX_RESPONSE_DELAY)
+
+    def __identify_multicast(self, option, value, response_delay, timeout):
+        """
+        Send a multicast identify request with the given filter and receive all responses until the timeout occurs.
+        :param option: The option and sub-option pair used as filter (Option.ALL to identify all devices).
+        :type option: Tuple[int, int]
+        :param value: The filter value, None for Option.ALL.
+        :type value: Optional[bytes]
+        :param response_delay: The response delay factor sent with the request.
+        :type response_delay: int
+        :param timeout: Time in seconds to receive responses.
+        :type timeout: float
+        :return: All devices found, with the number of frames dropped by the socket meanwhile.
+        :rtype: Inventory
         """
         dst_mac = dcp_constants.PROFINET_MULTICAST_MAC_IDENTIFY
-        option, suboption = Option.ALL
-        response_delay = dcp_constants.RESPONSE_DELAY
+        option, suboption = option
+        statistics_before = self.__socket.statistics()
         self.__send_request(
             dst_mac,
             FrameID.IDENTIFY_REQUEST,
             ServiceID.IDENTIFY,
             option,
             suboption,
+            value,
             response_delay=response_delay,
         )
 
         # Receive all responses until the timeout occurs
-        timeout = self.identify_all_timeout if timeout is None else timeout
-        timed_out = time.time() + timeout
-        devices = []
-        while time.time() < timed_out:
-            device = self.__read_response()
+        timed_out = self.clock.time() + timeout
+        devices = Inventory(conflict_policy=self.conflict_policy)
+        responses = 0
+        while self.clock.time() < timed_out:
+            device = self.__read_response(
+                timeout=timed_out - self.clock.time(), expect_response=False
+            )
             if device:
-                devices.append(device)
+                devices.add(device)
+                responses += 1
+        if self.tracer is not None:
+            self.tracer.request_completed(
+                self.clock.time(), self.__xid, self.__request_operation, responses
+            )
 
+        statistics_after = self.__socket.statistics()
+        if statistics_before is not None and statistics_after is not None:
+            devices.drops = statistics_after.drops - statistics_before.drops
+            if devices.drops:
+                Logging.logger.warning(
+                    "%s frames dropped by the socket during identify, devices may be missing",
+                    devices.drops,
+                )
         return devices
 
     def identify(self, mac):
@@ -219,10 +497,79 @@ class DCP:
 
         response = self.__read_response()
         if not response:
-            Logging.logger.debug(f"Timeout: no answer from device with MAC {mac}")
+            Logging.logger.debug("Timeout: no answer from device with MAC %s", mac)
             raise DcpTimeoutError
         return response
 
+    def identify_many(self, macs, timeout=None):
+        """
+        Identify several devices with unicast identify requests. All requests share one XID and are sent at once as a
+        batch (see L2Transport.send_batch), then the responses are received until all devices responded or the
+        timeout occurs. Devices that do not respond are missing from the result, no DcpTimeoutError is raised.
+        :param macs: MAC-addresses of the devices to identify (as ':' separated strings).
+        :type macs: Iterable[string]
+        :param timeout: Optional timeout in seconds for all responses. The default is defined in self.default_timeout.
+        :type timeout: Optional[float]
+        :return: The devices that responded.
+        :rtype: Inventory
+        """
+        macs = list(dict.fromkeys(mac.lower() for mac in macs))
+        timeout = self.default_timeout if timeout is None else timeout
+        option, suboption = Option.ALL
+
+        self.__xid += 1
+        packets = [
+            self.__build_request(
+                mac,
+                FrameID.IDENTIFY_REQUEST,
+                ServiceID.IDENTIFY,
+                option,
+                suboption,
+                response_delay=dcp_constants.RESPONSE_DELAY,
+                trace=False,
+            )
+            for mac in macs
+        ]
+        if self.tracer is not None:
+            # the requests share the XID, so they are traced as a single request
+            self.tracer.request_built(
+                self.clock.time(), self.__xid, self.__request_operation, None
+            )
+        if self.scheduler is None:
+            self.__socket.send_batch(packets)
+        else:
+            for packet in packets:
+                self.scheduler.send(self.__socket, packet, self.transmit_priority)
+        self.__request_sent = self.clock.time()
+        self.metrics.frames_sent += len(packets)
+        if self.capture is not None:
+            for packet in packets:
+                self.capture.write(packet, self.__request_sent, OUTBOUND)
+        if self.tracer is not None:
+            for mac in macs:
+                self.tracer.request_sent(
+                    self.__request_sent, self.__xid, self.__request_operation, mac
+                )
+
+        pending = set(macs)
+        devices = Inventory(conflict_policy=self.conflict_policy)
+        timed_out = self.clock.time() + timeout
+        while pending and self.clock.time() < timed_out:
+            device = self.__read_response(
+                timeout=timed_out - self.clock.time(), expect_response=False
+            )
+            if device and device.MAC in pending:
+                pending.discard(device.MAC)
+                devices.add(device)
+        if pending:
+            self.metrics.timeouts += len(pending)
+            Logging.logger.debug("Timeout: no answer from %s devices", len(pending))
+        if self.tracer is not None:
+            self.tracer.request_completed(
+                self.clock.time(), self.__xid, self.__request_operation, len(devices)
+            )
+        return devices
+
     def set_ip_address(self, mac, ip_conf, store_permanent=True):
         """
         Send a request to set or change the IP configuration of the device with the given mac address.
@@ -255,11 +602,11 @@ class DCP:
 
         if response is None:
             Logging.logger.debug(
-                f"Timeout: no answer from device with MAC {mac} to set ip request."
+                "Timeout: no answer from device with MAC %s to set ip request.", mac
             )
             raise DcpTimeoutError
         elif not response:
-            Logging.logger.debug(f"Set unsuccessful: {response.get_message()}")
+            Logging.logger.debug("Set unsuccessful: %s", response.get_message())
 
         return response
 
@@ -299,11 +646,11 @@ class DCP:
 
         if response is None:
             Logging.logger.debug(
-                f"Timeout: no answer from device with MAC {mac} to set name request."
+                "Timeout: no answer from device with MAC %s to set name request.", mac
             )
             raise DcpTimeoutError
         elif not response:
-            Logging.logger.debug(f"Set unsuccessful: {response.get_message()}")
+            Logging.logger.debug("Set unsuccessful: %s", response.get_message())
 
         return response
 
@@ -320,7 +667,7 @@ class DCP:
 
         response = self.__read_response()
         if not response:
-            Logging.logger.debug(f"Timeout: no answer from device with MAC {mac}")
+            Logging.logger.debug("Timeout: no answer from device with MAC %s", mac)
             raise DcpTimeoutError
         return response.IP
 
@@ -337,7 +684,7 @@ class DCP:
 
         response = self.__read_response()
         if not response:
-            Logging.logger.debug(f"Timeout: no answer from device with MAC {mac}")
+            Logging.logger.debug("Timeout: no answer from device with MAC %s", mac)
             raise DcpTimeoutError
         return response.name_of_station
 
@@ -362,11 +709,13 @@ class DCP:
 
         if response is None:
             Logging.logger.debug(
-                f"Timeout: no answer from device with MAC {mac} to reset request."
+                "Timeout: no answer from device with MAC %s to reset request.", mac
             )
             raise DcpTimeoutError
         elif not response:
-            Logging.logger.debug(f"LED flashing unsuccessful: {response.get_message()}")
+            Logging.logger.debug(
+                "LED flashing unsuccessful: %s", response.get_message()
+            )
 
         return response
 
@@ -392,11 +741,11 @@ class DCP:
 
         if response is None:
             Logging.logger.debug(
-                f"Timeout: no answer from device with MAC {mac} to reset request."
+                "Timeout: no answer from device with MAC %s to reset request.", mac
             )
             raise DcpTimeoutError
         elif not response:
-            Logging.logger.debug(f"Reset unsuccessful: {response.get_message()}")
+            Logging.logger.debug("Reset unsuccessful: %s", response.get_message())
 
         return response
 
@@ -419,11 +768,11 @@ class DCP:
 
         if response is None:
             Logging.logger.debug(
-                f"Timeout: no answer from device with MAC {mac} to reset request."
+                "Timeout: no answer from device with MAC %s to reset request.", mac
             )
             raise DcpTimeoutError
         elif not response:
-            Logging.logger.debug(f"Reset unsuccessful: {response.get_message()}")
+            Logging.logger.debug("Reset unsuccessful: %s", response.get_message())
 
         return response
 
@@ -458,7 +807,42 @@ class DCP:
             # increment the XID wih each request (used to identify a transaction)
             1
         )
+        packet = self.__build_request(
+            dst_mac, frame_id, service, option, suboption, value, response_delay
+        )
+
+        # Send the request, the send time is taken right after the frame was passed to the kernel
+        if self.scheduler is None:
+            self.__socket.send(packet)
+        else:
+            self.scheduler.send(self.__socket, packet, self.transmit_priority)
+        self.__request_sent = self.clock.time()
+        self.metrics.frames_sent += 1
+        if self.capture is not None:
+            self.capture.write(packet, self.__request_sent, OUTBOUND)
+        if self.tracer is not None:
+            self.tracer.request_sent(
+                self.__request_sent, self.__xid, self.__request_operation, dst_mac
+            )
 
+    def __build_request(
+        self,
+        dst_mac,
+        frame_id,
+        service: ServiceID,
+        option,
+        suboption,
+        value=None,
+        response_delay=0,
+        trace=True,
+    ):
+        """
+        Build a DCP request with the current XID, see __send_request for the parameters.
+        :param trace: Whether to report the request to the tracer, requests sent as a batch are reported by the caller.
+        :type trace: boolean
+        :return: The ethernet frame of the request.
+        :rtype: bytes
+        """
         # Construct the DCPBlockRequest
         if service == ServiceID.GET:
             block = DCPBlockRequestGet(option, suboption)
@@ -481,11 +865,14 @@ class DCP:
         ethernet_packet = EthernetPacket(
             dst_mac, self.src_mac, dcp_constants.ETHER_TYPE, payload=dcp_packet
         )
+        self.__request_operation = SERVICE_NAMES.get(service, str(service))
+        if trace and self.tracer is not None:
+            self.tracer.request_built(
+                self.clock.time(), self.__xid, self.__request_operation, dst_mac
+            )
+        return bytes(ethernet_packet)
 
-        # Send the request
-        self.__socket.send(bytes(ethernet_packet))
-
-    def __read_response(self, timeout=None, set_request=False):
+    def __read_response(self, timeout=None, set_request=False, expect_response=True):
         """
         Receive packets and parse the response:
         - receive packets on the L2 socket addressed to the specified host mac address
@@ -499,36 +886,64 @@ class DCP:
         :param set_request: Whether this function was called inside a set-function. True enables error detection.
         Default: False
         :type set_request: boolean
+        :param expect_response: Whether receiving no response is counted as timeout in the metrics. Default: True
+        :type expect_response: boolean
         :return: The received response (or None): a ResponseCode for set requests or a device.
         :rtype: Optional[Union[Device, ResponseCode]]
         """
         timeout = self.default_timeout if timeout is None else timeout
-        timed_out = time.time() + timeout
-        while time.time() < timed_out:
-            received_packet = self.__receive_packet()
+        timed_out = self.clock.time() + timeout
+        while self.clock.time() < timed_out:
+            received_packet, received_at = self.__receive_packet()
 
             if received_packet:
                 parsed_response = self.__parse_raw_packet(received_packet, set_request)
                 if parsed_response is not None:
+                    parsed_response.timestamp = received_at
+                    parsed_response.response_time = received_at - self.__request_sent
+                    self.metrics.observe_latency(
+                        self.__request_operation, parsed_response.response_time
+                    )
+                    if self.tracer is not None and expect_response:
+                        self.tracer.request_completed(
+                            self.clock.time(), self.__xid, self.__request_operation, 1
+                        )
                     return parsed_response
 
+        if expect_response:
+            self.metrics.timeouts += 1
+            if self.tracer is not None:
+                self.tracer.request_completed(
+                    self.clock.time(), self.__xid, self.__request_operation, 0
+                )
+
     def __receive_packet(self):
         """
         Receive a packet on the L2 socket addressed to the specified host mac address and convert it to bytes.
-        Might return None if no data is received.
-        :return: The received packet as bytes or None if no data was received.
-        :rtype: Optional[bytes]
+        Might return None if no data is received. The receive time is taken from the socket if it timestamps its
+        frames (e.g. the kernel receive timestamp), otherwise it is read from the clock.
+        :return: The received packet as bytes (or None if no data was received) and its receive time.
+        :rtype: Tuple[Optional[bytes], Optional[float]]
         """
         received_packet = self.__socket.recv()
-        if received_packet is not None:
-            received_packet = bytes(received_packet)
-        return received_packet
+        if received_packet is None:
+            return None, None
+        self.metrics.frames_received += 1
+        timestamp = getattr(received_packet, "timestamp", None)
+        if timestamp is None:
+            timestamp = self.clock.time()
+        if self.capture is not None:
+            self.capture.write(received_packet, timestamp, INBOUND)
+        if self.tracer is not None:
+            self.tracer.frame_received(timestamp, len(received_packet))
+        return bytes(received_packet), timestamp
 
     def __parse_raw_packet(self, raw_packet, set_request):
         """
         Validate and parse a dcp response from the received raw packet:
-        Parse the data as ethernet packet, check if it is a valid DCP response and convert it to a DCPPacket object.
-        Then, parse to DCP payload to extract and return the response value.
+        Check if the packet is a valid DCP response to the current request (see parsing.check_response), then split the
+        DCP payload into its blocks to extract and return the response value. All lengths are checked against the
+        size of the packet, malformed packets are counted and rejected.
         If this the response to a set requests (i.e. the set_request parameter is True): the return code is extracted
         from the payload and returned.
         Otherwise: a Device object is constructed from the response which is then returned.
@@ -540,97 +955,54 @@ class DCP:
         :return: Valid response: if set request: return code, otherwise: Device object. Invalid response: None
         :rtype: Optional[Union[ResponseCode, Device]]
         """
-        # Parse the data as ethernet packet.
-        ethernet_packet = EthernetPacket(data=raw_packet)
-
-        # Check if the packet is a valid DCP response to the latest request and convert the ethernet payload to a
-        # DCPPacket object
-        dcp_packet = self.__parse_and_validate_dcp_packet(ethernet_packet)
-
-        # return None immediately for invalid responses
-        if not dcp_packet:
-            return
+        reason = parsing.check_response(raw_packet, self.__src_mac_bytes, self.__xid)
+        if reason is not None:
+            self.__reject(reason, raw_packet)
+            return None
 
-        # parse the DCP blocks in the payload
-        dcp_blocks = dcp_packet.payload
+        blocks = parsing.parse_blocks(raw_packet)
+        if blocks is None:
+            self.__reject(metrics.REJECT_MALFORMED, raw_packet)
+            return None
+        source = util.mac_address_to_string(raw_packet[6:12])
 
         # If called inside a set request and the option of the response is 5 ('Control'):
         # extract and return the return code
-        if set_request and dcp_blocks[0] == 5:
-            return ResponseCode(int(dcp_blocks[6]))
-
-        # Otherwise, extract a device from the DCP payload
-        length = dcp_packet.length
-        device = Device()
-        device.MAC = ethernet_packet.source
-        # Process each DCP data block in the payload and modify the attributes of the device accordingly
-        while length > 6:
-            device, block_len = self.__process_block(dcp_blocks, device)
-            # advance to the start of the next block
-            dcp_blocks = dcp_blocks[block_len + 4 :]
-            length -= 4 + block_len
-
-        return device
-
-    def __parse_and_validate_dcp_packet(self, ethernet_packet):
-        """
-        Check and parse the given ethernet packet.
-        Check if the received packed is a valid DCP-response to the last request. That is: it is addressed to this
-        src_mac address, has the correct ether type, has the service type for 'response', and the XID of the last
-        request.
-        If the response is valid, return the ethernet payload as DCPPacket object. Otherwise, None is returned.
-        :param ethernet_packet: The ethernet packet to validate and parse.
-        :type ethernet_packet: EthernetPacket
-        :return: The ethernet payload as DCPPacket object if the response is valid, None otherwise.
-        :rtype: Optional[DCPPacket]
-        """
-        valid_ethernet = (
-            ethernet_packet.destination == self.src_mac
-            and ethernet_packet.ether_type == dcp_constants.ETHER_TYPE
-        )
-
-        dcp_packet = DCPPacket(data=ethernet_packet.payload)
-        valid_dcp = (
-            dcp_packet.service_type == ServiceType.RESPONSE
-            and dcp_packet.xid == self.__xid
-        )
-
-        return dcp_packet if valid_ethernet and valid_dcp else None
+        if set_request and blocks and blocks[0].option == 5:
+            code = parsing.decode_response_code(blocks)
+            if code is None:
+                self.__reject(metrics.REJECT_MALFORMED, raw_packet)
+                return None
+            response = ResponseCode(code)
+        else:
+            # Otherwise, extract a device from the DCP blocks
+            response = Device()
+            response.MAC = source
+            if not parsing.decode_device(blocks, response):
+                self.__reject(metrics.REJECT_MALFORMED, raw_packet)
+                return None
+
+        if self.tracer is not None:
+            self.tracer.response_parsed(self.clock.time(), self.__xid, source)
+        return response
 
-    @staticmethod
-    def __process_block(blocks, device):
-        """
-        Extract and parse the first DCP data block in the given payload data and fill the given Device object with the
-        extracted values.
-        :param blocks: The DCP payload to process. Must contain a valid DCP data block as prefix, all data after the
-        first complete block is ignored.
-        :type blocks: bytes
-        :param device: The Device object to be filled.
-        :type device: Device
-        :return: The modified Device object and the length of the processed DCP data block
-        :rtype: Device, int
-        """
-        # Extract the first DCPBlock from the given payload.
-        # Other blocks may follow after the first, they are ignored by this method.
-        block = DCPBlock(data=blocks)
-
-        # use the option and sub-option to determine which value is encoded in the current block
-        # then, extract the value accordingly, decode it and set the corresponding attribute of the device
-        block_option = (block.opt, block.subopt)
-        if block_option == Option.NAME_OF_STATION:
-            device.name_of_station = block.payload.rstrip(b"\x00").decode()
-        elif block_option == Option.IP_ADDRESS:
-            device.IP = util.ip_address_to_string(block.payload[0:4])
-            device.netmask = util.ip_address_to_string(block.payload[4:8])
-            device.gateway = util.ip_address_to_string(block.payload[8:12])
-        elif block_option == Option.DEVICE_FAMILY:
-            device.family = block.payload.rstrip(b"\x00").decode()
-
-        # round up the block length to the next even number
-        block_len = block.length + (block.length % 2)
-
-        # Return the modified device and the length of the processed block
-        return device, block_len
+    def __reject(self, reason, raw_packet):
+        """
+        Count a received frame that is not a valid response to the current request and notify the tracer.
+        Malformed frames are also counted as parse errors.
+        :param reason: The reason, one of the REJECT_* constants of profi_dcp.metrics.
+        :type reason: string
+        :param raw_packet: The rejected frame.
+        :type raw_packet: bytes
+        """
+        self.metrics.reject(reason)
+        if reason == metrics.REJECT_MALFORMED:
+            self.metrics.parse_errors += 1
+        if self.tracer is not None:
+            source = None
+            if reason != metrics.REJECT_MALFORMED:
+                source = util.mac_address_to_string(raw_packet[6:12])
+            self.tracer.frame_rejected(self.clock.time(), reason, source)
 
 
 class ResponseCode:
@@ -653,6 +1025,9 @@ class ResponseCode:
         :type code: int
         """
         self.code = code
+        # the receive time of the response and the time from sending the request to receiving the response in seconds
+        self.timestamp = None
+        self.response_time = None
 
     def get_message(self):
         """
@@ -106,7 +106,7 @@ class Packet:
             ]
             if invalid_kwargs:
                 logger.warning(
-                    f"Invalid kwargs passed to Packet for keys: {invalid_kwargs}"
+                    "Invalid kwargs passed to Packet for keys: %s", invalid_kwargs
                 )
 
             for name, value in kwargs.items():
@@ -0,0 +1,103 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import math
+
+import profi_dcp.dcp_constants as dcp_constants
+
+
+class ResponseDelayTuner:
+    """
+    Chooses the response delay factor (and the matching receive timeout) for identify_all from the results of the
+    previous scans. The goal is the smallest factor with which no responses are lost: small networks are scanned within
+    a few milliseconds, while large networks spread their responses far enough to not overflow any buffers.
+    """
+
+    def __init__(
+        self,
+        responses_per_unit=4,
+        margin=0.05,
+        initial_response_delay=dcp_constants.RESPONSE_DELAY,
+    ):
+        """
+        Create a new tuner.
+        :param responses_per_unit: The number of responses that can be received without loss within one step of the
+        response delay factor (i.e. within RESPONSE_DELAY_UNIT seconds).
+        :type responses_per_unit: float
+        :param margin: Additional time in seconds to wait for responses after the response delay has passed.
+        :type margin: float
+        :param initial_response_delay: The response delay factor used as long as no scan results are known.
+        :type initial_response_delay: int
+        """
+        self.responses_per_unit = responses_per_unit
+        self.margin = margin
+        self.response_delay = initial_response_delay
+        self.expected_devices = None
+        # the number of devices found by the last scan if it doubled the factor only because devices were missing
+        self.__probe = None
+
+    def timeout(self, response_delay=None):
+        """
+        Return the time to receive responses to an identify request with the given response delay factor.
+        :param response_delay: The response delay factor, the currently suggested factor is used if None.
+        :type response_delay: Optional[int]
+        :return: The receive timeout in seconds.
+        :rtype: float
+        """
+        response_delay = (
+            self.response_delay if response_delay is None else response_delay
+        )
+        return response_delay * dcp_constants.RESPONSE_DELAY_UNIT + self.margin
+
+    def update(self, device_count, duplicates=0, drops=0):
+        """
+        Adapt the response delay factor to the result of a scan.
+        If responses were lost, the factor is doubled. Otherwise, the smallest factor which spreads all received frames
+        (devices and duplicate responses) is chosen. Responses count as lost if frames were dropped, or if fewer devices
+        than expected were found and duplicate responses were received. If fewer devices were found without such
+        evidence, the factor is doubled once: if the next scan finds no more devices, they were removed from the network
+        and the new number of devices is expected from then on.
+        :param device_count: The number of distinct devices found by the scan.
+        :type device_count: int
+        :param duplicates: The number of duplicate responses received during the scan.
+        :type duplicates: int
+        :param drops: The number of frames dropped by the receiving side during the scan.
+        :type drops: int
+        :return: The response delay factor to use for the next scan.
+        :rtype: int
+        """
+        probe, self.__probe = self.__probe, None
+        shortfall = (
+            self.expected_devices is not None and device_count < self.expected_devices
+        )
+        if drops > 0 or (shortfall and duplicates > 0):
+            lost = True
+        elif shortfall and (probe is None or device_count > probe):
+            # double the factor to find out whether the missing devices were lost or removed
+            lost = True
+            self.__probe = device_count
+        else:
+            lost = False
+        minimal = self.__factor_for(device_count + duplicates + drops)
+
+        if lost:
+            response_delay = max(self.response_delay * 2, minimal)
+            self.expected_devices = max(self.expected_devices or 0, device_count)
+        else:
+            response_delay = minimal
+            self.expected_devices = device_count
+
+        self.response_delay = min(response_delay, dcp_constants.MAX_RESPONSE_DELAY)
+        return self.response_delay
+
+    def __factor_for(self, frame_count):
+        """
+        Compute the smallest response delay factor to receive the given number of frames without loss.
+        :param frame_count: The number of frames expected in response to an identify request.
+        :type frame_count: int
+        :return: The response delay factor (at least 1).
+        :rtype: int
+        """
+        return max(math.ceil(frame_count / self.responses_per_unit), 1)
@@ -0,0 +1,161 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import itertools
+import threading
+
+from profi_dcp.clock import system_clock
+
+# frames within this time in seconds of being allowed are sent, so that rounding errors of the times never leave a
+# frame waiting for a time too short to advance the clock
+TOLERANCE = 1e-9
+
+# the number of destinations remembered for pacing before the destinations that may be sent to again are forgotten
+PRUNE_SIZE = 1024
+
+
+class TransmitScheduler:
+    """
+    Limits the rate at which frames are sent, e.g. to avoid flooding a cell with DCP traffic during cyclic real-time
+    operation. The scheduler can be shared by several DCP instances (and threads), which are then limited together:
+    - the overall rate is limited with a token bucket: up to burst frames can be sent at once, afterwards the frames
+      are sent with the given rate
+    - frames to the same destination (mac address) are sent at least destination_interval seconds apart
+    - frames waiting to be sent are sent in order of their priority class, so interactive requests (e.g. blink or get)
+      go ahead of bulk traffic (e.g. a background refresh or a commissioning script)
+    Sending blocks until the frame may be sent.
+    """
+
+    # priority classes, frames of a lower class are sent first
+    INTERACTIVE = 0
+    BULK = 1
+
+    def __init__(self, rate=None, burst=1, destination_interval=0.0, clock=None):
+        """
+        Create a new scheduler.
+        :param rate: The maximum sustained rate in frames per second, None for no limit.
+        :type rate: Optional[float]
+        :param burst: The maximum number of frames sent at once, i.e. the size of the token bucket.
+        :type burst: int
+        :param destination_interval: The minimum time in seconds between two frames to the same destination.
+        :type destination_interval: float
+        :param clock: The clock used to wait. Default is the system clock.
+        :type clock: Optional[Clock]
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError("The rate must be positive.")
+        if burst < 1:
+            raise ValueError("The burst must be at least one frame.")
+        self.rate = rate
+        self.burst = burst
+        self.destination_interval = destination_interval
+        self.clock = system_clock if clock is None else clock
+        # the number of frames sent and the number of frames that had to wait
+        self.frames_sent = 0
+        self.frames_delayed = 0
+
+        self.__tokens = float(burst)
+        self.__refilled = self.clock.time()
+        # the earliest time the next frame may be sent to a destination, by destination mac address (bytes)
+        self.__next_send = {}
+        # the size of __next_send at which the destinations that may be sent to again are removed
+        self.__prune_size = PRUNE_SIZE
+        # the frames waiting to be sent as (priority, sequence number, destination)
+        self.__waiting = []
+        self.__sequence = itertools.count()
+        self.__condition = threading.Condition()
+
+    def send(self, transport, data, priority=INTERACTIVE):
+        """
+        Send a frame with the given transport as soon as the limits of the scheduler allow it.
+        :param transport: The transport to send the frame with.
+        :type transport: L2Transport
+        :param data: The raw frame, starting with the destination mac address.
+        :type data: bytes
+        :param priority: The priority class of the frame, INTERACTIVE or BULK.
+        :type priority: int
+        """
+        data = bytes(data)
+        ticket = (priority, next(self.__sequence), data[:6])
+        with self.__condition:
+            self.__waiting.append(ticket)
+            try:
+                delayed = False
+                while True:
+                    now = self.clock.time()
+                    self.__refill(now)
+                    chosen, wait = self.__next_ticket(now)
+                    if chosen is ticket:
+                        break
+                    delayed = True
+                    if chosen is not None:
+                        # wake up the thread of the chosen frame, it sends first and wakes up the waiting frames
+                        # afterwards
+                        self.__condition.notify_all()
+                    if wait is None:
+                        self.__condition.wait()
+                    else:
+                        self.clock.wait(self.__condition, wait)
+
+                if self.rate is not None:
+                    self.__tokens -= 1
+                if self.destination_interval:
+                    self.__next_send[ticket[2]] = now + self.destination_interval
+                    if len(self.__next_send) >= self.__prune_size:
+                        self.__prune(now)
+                self.frames_sent += 1
+                self.frames_delayed += delayed
+            finally:
+                self.__waiting.remove(ticket)
+                self.__condition.notify_all()
+        # the token and the destination are reserved, send without blocking the other senders
+        transport.send(data)
+
+    def __refill(self, now):
+        """
+        Add the tokens earned since the last refill to the token bucket.
+        :param now: The current time in seconds.
+        :type now: float
+        """
+        if self.rate is not None:
+            elapsed = max(now - self.__refilled, 0)
+            self.__tokens = min(self.__tokens + elapsed * self.rate, self.burst)
+        self.__refilled = now
+
+    def __prune(self, now):
+        """
+        Forget the destinations that may be sent to again, so that the pacing state only grows with the number of
+        recently used destinations. The next pruning happens once the number of destinations has doubled.
+        :param now: The current time in seconds.
+        :type now: float
+        """
+        self.__next_send = {
+            destination: next_send
+            for destination, next_send in self.__next_send.items()
+            if next_send > now
+        }
+        self.__prune_size = max(2 * len(self.__next_send), PRUNE_SIZE)
+
+    def __next_ticket(self, now):
+        """
+        Choose the waiting frame to send next: the frame with the highest priority (and the oldest of these) whose
+        destination may be sent to, if a token is available.
+        :param now: The current time in seconds.
+        :type now: float
+        :return: The chosen frame or None, and the time in seconds until the choice may change because a token or
+        the destination of a frame of higher priority becomes available (None if only sending the chosen frame changes
+        it).
+        :rtype: Tuple[Optional[Tuple], Optional[float]]
+        """
+        if self.rate is not None and self.__tokens < 1 - TOLERANCE * self.rate:
+            return None, (1 - self.__tokens) / self.rate
+
+        wait = None
+        for ticket in sorted(self.__waiting):
+            destination_wait = self.__next_send.get(ticket[2], now) - now
+            if destination_wait <= TOLERANCE:
+                return ticket, wait
+            wait = destination_wait if wait is None else min(wait, destination_wait)
+        return None, wait
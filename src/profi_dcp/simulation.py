@@ -0,0 +1,405 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import random
+import struct
+
+import profi_dcp.dcp_constants as dcp_constants
+import profi_dcp.util as util
+from profi_dcp.dcp_constants import FrameID, Option, ServiceID, ServiceType
+from profi_dcp.l2socket.memory import L2MemorySocket, MemoryNetwork
+
+# header of an ethernet frame containing a DCP packet: destination, source, ether type, frame id, service id, service
+# type, xid, response delay and length of the DCP data
+DCP_FRAME_HEADER = struct.Struct(">6s6sHHBBIHH")
+MULTICAST_MAC_IDENTIFY = util.mac_address_to_bytes(
+    dcp_constants.PROFINET_MULTICAST_MAC_IDENTIFY
+)
+
+# response codes of set requests, see ResponseCode
+SET_SUCCESSFUL = 0
+OPTION_UNSUPPORTED = 1
+SUBOPTION_UNSUPPORTED = 2
+
+
+def dcp_block(option, value, status=0):
+    """
+    Pack a DCP block of a response, padded to even length.
+    :param option: The option and sub-option of the block.
+    :type option: Tuple[int, int]
+    :param value: The value of the block.
+    :type value: bytes
+    :param status: The block info (status) of the block.
+    :type status: int
+    :return: The packed block.
+    :rtype: bytes
+    """
+    length = len(value) + 2
+    return struct.pack(">BBHH", *option, length, status) + value + bytes(length % 2)
+
+
+def control_block(option, code):
+    """
+    Pack the control block of a response to a set request, containing the response code to the given option.
+    :param option: The option and sub-option of the set request.
+    :type option: Tuple[int, int]
+    :param code: The response code.
+    :type code: int
+    :return: The packed block.
+    :rtype: bytes
+    """
+    return struct.pack(">BBHBBBx", 0x05, 0x04, 3, *option, code)
+
+
+class SimulatedDevice:
+    """
+    A simulated DCP device, answering identify, get and set (including blink and reset) requests like a real device.
+    """
+
+    def __init__(
+        self,
+        mac,
+        name_of_station="",
+        ip="0.0.0.0",
+        netmask="0.0.0.0",
+        gateway="0.0.0.0",
+        family="",
+        vendor_id=0,
+        device_id=0,
+    ):
+        """
+        Create a new simulated device. The given name of station and IP configuration are also its factory settings.
+        :param mac: The mac address of the device (as ':' separated string).
+        :type mac: string
+        :param name_of_station: The name of station.
+        :type name_of_station: string
+        :param ip: The IP address.
+        :type ip: string
+        :param netmask: The subnet mask.
+        :type netmask: string
+        :param gateway: The default gateway.
+        :type gateway: string
+        :param family: The device family (i.e. type of station).
+        :type family: string
+        :param vendor_id: The PROFINET vendor ID.
+        :type vendor_id: int
+        :param device_id: The PROFINET device ID.
+        :type device_id: int
+        """
+        self.MAC = mac.lower()
+        self.mac_bytes = util.mac_address_to_bytes(self.MAC)
+        self.name_of_station = name_of_station
+        self.IP = ip
+        self.netmask = netmask
+        self.gateway = gateway
+        self.family = family
+        self.vendor_id = vendor_id
+        self.device_id = device_id
+        self.factory_settings = (name_of_station, ip, netmask, gateway)
+        self.blink_count = 0
+        self.__identify_blocks = None
+
+    def matches(self, option, value):
+        """
+        Check whether the device matches the filter of an identify request.
+        :param option: The option and sub-option of the filter.
+        :type option: Tuple[int, int]
+        :param value: The filter value.
+        :type value: bytes
+        :return: Whether the device responds to the identify request.
+        :rtype: boolean
+        """
+        if option == Option.ALL:
+            return True
+        if option == Option.NAME_OF_STATION:
+            return value == self.name_of_station.encode()
+        if option == Option.DEVICE_FAMILY:
+            return value == self.family.encode()
+        if option == Option.DEVICE_ID:
+            return value == struct.pack(">HH", self.vendor_id, self.device_id)
+        if option == Option.IP_ADDRESS:
+            return value[:4] == util.ip_address_to_bytes(self.IP)
+        return False
+
+    def identify_blocks(self):
+        """
+        Get the DCP blocks of the device's identify response (cached until a parameter is changed by a set request).
+        :return: The packed DCP blocks.
+        :rtype: bytes
+        """
+        if self.__identify_blocks is None:
+            self.__identify_blocks = (
+                dcp_block(Option.NAME_OF_STATION, self.name_of_station.encode())
+                + self.__ip_block()
+                + dcp_block(Option.DEVICE_FAMILY, self.family.encode())
+                + dcp_block(
+                    Option.DEVICE_ID,
+                    struct.pack(">HH", self.vendor_id, self.device_id),
+                )
+            )
+        return self.__identify_blocks
+
+    def get(self, option):
+        """
+        Answer a get request.
+        :param option: The requested option and sub-option.
+        :type option: Tuple[int, int]
+        :return: The DCP blocks of the response.
+        :rtype: bytes
+        """
+        if option == Option.IP_ADDRESS:
+            return self.__ip_block()
+        if option == Option.NAME_OF_STATION:
+            return dcp_block(Option.NAME_OF_STATION, self.name_of_station.encode())
+        if option == Option.DEVICE_FAMILY:
+            return dcp_block(Option.DEVICE_FAMILY, self.family.encode())
+        return control_block(option, OPTION_UNSUPPORTED)
+
+    def set(self, option, value):
+        """
+        Answer a set request (including blink and reset requests) and apply it.
+        :param option: The option and sub-option to set.
+        :type option: Tuple[int, int]
+        :param value: The value of the request, starting with the block qualifier.
+        :type value: bytes
+        :return: The DCP blocks of the response.
+        :rtype: bytes
+        """
+        code = SET_SUCCESSFUL
+        if option == Option.IP_ADDRESS and len(value) >= 14:
+            self.IP = util.ip_address_to_string(value[2:6])
+            self.netmask = util.ip_address_to_string(value[6:10])
+            self.gateway = util.ip_address_to_string(value[10:14])
+        elif option == Option.NAME_OF_STATION:
+            self.name_of_station = value[2:].decode("ascii", errors="replace")
+        elif option == Option.BLINK_LED:
+            self.blink_count += 1
+        elif option in (Option.RESET_FACTORY, Option.RESET_TO_FACTORY):
+            self.name_of_station, self.IP, self.netmask, self.gateway = (
+                self.factory_settings
+            )
+        elif option[0] in (0x01, 0x02, 0x05):
+            code = SUBOPTION_UNSUPPORTED
+        else:
+            code = OPTION_UNSUPPORTED
+        self.__identify_blocks = None
+        return control_block(option, code)
+
+    def __ip_block(self):
+        """
+        Pack the IP parameter block of the device.
+        :return: The packed block.
+        :rtype: bytes
+        """
+        value = b"".join(
+            util.ip_address_to_bytes(address)
+            for address in (self.IP, self.netmask, self.gateway)
+        )
+        return dcp_block(Option.IP_ADDRESS, value)
+
+    def __str__(self):
+        """
+        Return a human-readable string representation of the simulated device.
+        :return: String representation of this device.
+        :rtype: string
+        """
+        return (
+            f"SimulatedDevice(MAC={self.MAC}, name_of_station={self.name_of_station}, IP={self.IP}, "
+            f"family={self.family})"
+        )
+
+
+class SimulatedFleet:
+    """
+    A fleet of simulated devices on a MemoryNetwork. The fleet receives all requests sent on the network and schedules
+    the responses of the addressed devices on the requesting L2MemorySocket.
+
+    Each response is delayed by the fleet's delay plus a uniformly distributed jitter. Responses to multicast identify
+    requests are additionally spread over the response delay window of the request like real devices do, and every
+    response is lost with the given probability.
+    """
+
+    def __init__(
+        self, devices=(), delay=0.0, jitter=0.0, loss=0.0, seed=None, network=None
+    ):
+        """
+        Create a new fleet and attach it to the given network.
+        :param devices: The simulated devices of the fleet.
+        :type devices: Iterable[SimulatedDevice]
+        :param delay: The delay in seconds until a device responds. Default is 0.
+        :type delay: float
+        :param jitter: The maximum random deviation in seconds from the delay. Default is 0.
+        :type jitter: float
+        :param loss: The probability that a response is lost. Default is 0.
+        :type loss: float
+        :param seed: Seed of the random number generator used for jitter, response delays and loss.
+        :type seed: Optional[int]
+        :param network: The network to attach to. Default is a new network.
+        :type network: Optional[MemoryNetwork]
+        """
+        self.devices = {device.mac_bytes: device for device in devices}
+        self.delay = delay
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.network = MemoryNetwork() if network is None else network
+        self.network.attach(self)
+
+    @classmethod
+    def generate(
+        cls, count, family="Simulated", vendor_id=0x002A, device_id=0x0001, **kwargs
+    ):
+        """
+        Create a fleet of the given number of devices with unique mac addresses, names of station and IP addresses.
+        :param count: The number of devices.
+        :type count: int
+        :param family: The device family of all devices.
+        :type family: string
+        :param vendor_id: The vendor ID of all devices.
+        :type vendor_id: int
+        :param device_id: The device ID of all devices.
+        :type device_id: int
+        :param kwargs: Passed to the SimulatedFleet constructor.
+        :return: The new fleet.
+        :rtype: SimulatedFleet
+        """
+        devices = (
+            SimulatedDevice(
+                util.mac_address_to_string(b"\x02\x00" + index.to_bytes(4, "big")),
+                name_of_station=f"device-{index}",
+                ip=f"10.{index >> 16 & 0xFF}.{index >> 8 & 0xFF}.{index & 0xFF}",
+                netmask="255.0.0.0",
+                gateway="10.0.0.1",
+                family=family,
+                vendor_id=vendor_id,
+                device_id=device_id,
+            )
+            for index in range(count)
+        )
+        return cls(devices, **kwargs)
+
+    def connect(self, mac="02:00:00:00:ff:01", recv_timeout=1, clock=None):
+        """
+        Create a new L2MemorySocket on the network of the fleet, e.g. to be passed to DCP as transport.
+        :param mac: The mac address of the socket. Default is 02:00:00:00:ff:01.
+        :type mac: string
+        :param recv_timeout: The timeout in seconds for recv. Default is 1.
+        :type recv_timeout: float
+        :param clock: The clock of the socket, e.g. a VirtualClock to run the simulation without waiting. Default is
+        the system clock.
+        :type clock: Optional[Clock]
+        :return: The new socket.
+        :rtype: L2MemorySocket
+        """
+        return L2MemorySocket(mac, self.network, recv_timeout, clock)
+
+    def __iter__(self):
+        """
+        Iterate over all devices of the fleet.
+        :return: An iterator over the devices.
+        :rtype: Iterator[SimulatedDevice]
+        """
+        return iter(self.devices.values())
+
+    def __len__(self):
+        """
+        Get the number of devices in the fleet.
+        :return: The number of devices.
+        :rtype: int
+        """
+        return len(self.devices)
+
+    def receive(self, frame, sender):
+        """
+        Called by the network for every frame sent by another node: answer the frame if it is a DCP request to a
+        device of the fleet.
+        :param frame: The raw frame.
+        :type frame: bytes
+        :param sender: The node that sent the frame, the responses are delivered to it.
+        :type sender: L2MemorySocket
+        """
+        if len(frame) < DCP_FRAME_HEADER.size + 2:
+            return
+        (
+            destination,
+            source,
+            ether_type,
+            frame_id,
+            service_id,
+            service_type,
+            xid,
+            response_delay,
+            length,
+        ) = DCP_FRAME_HEADER.unpack_from(frame)
+        if (
+            ether_type != dcp_constants.ETHER_TYPE
+            or service_type != ServiceType.REQUEST
+        ):
+            return
+
+        block = frame[DCP_FRAME_HEADER.size : DCP_FRAME_HEADER.size + length]
+        if len(block) < 2:
+            return
+        option = (block[0], block[1])
+        # the block of a get request only consists of option and sub-option
+        value = b""
+        if len(block) >= 4:
+            value = block[4 : 4 + struct.unpack_from(">H", block, 2)[0]]
+
+        if destination == MULTICAST_MAC_IDENTIFY:
+            if service_id != ServiceID.IDENTIFY:
+                return
+            devices = [device for device in self if device.matches(option, value)]
+        else:
+            device = self.devices.get(destination)
+            if device is None:
+                return
+            devices = [device]
+            response_delay = 0
+
+        responses = []
+        for device in devices:
+            if self.loss and self.random.random() < self.loss:
+                continue
+            if service_id == ServiceID.IDENTIFY:
+                frame_id, blocks = FrameID.IDENTIFY_RESPONSE, device.identify_blocks()
+            elif service_id == ServiceID.GET:
+                frame_id, blocks = FrameID.GET_SET, device.get(option)
+            elif service_id == ServiceID.SET:
+                frame_id, blocks = FrameID.GET_SET, device.set(option, value)
+            else:
+                continue
+            header = DCP_FRAME_HEADER.pack(
+                source,
+                device.mac_bytes,
+                dcp_constants.ETHER_TYPE,
+                frame_id,
+                service_id,
+                ServiceType.RESPONSE,
+                xid,
+                0,
+                len(blocks),
+            )
+            responses.append((self.__response_time(response_delay), header + blocks))
+        sender.deliver_many(responses)
+
+    def __response_time(self, response_delay):
+        """
+        Choose the time until a device responds.
+        :param response_delay: The response delay factor of the request, the response is sent at a random multiple of
+        RESPONSE_DELAY_UNIT within the response delay window.
+        :type response_delay: int
+        :return: The time until the response in seconds.
+        :rtype: float
+        """
+        response_time = self.delay
+        if self.jitter:
+            response_time += self.random.uniform(-self.jitter, self.jitter)
+        if response_delay > 1:
+            response_time += (
+                self.random.randrange(response_delay)
+                * dcp_constants.RESPONSE_DELAY_UNIT
+            )
+        return max(response_time, 0)
@@ -0,0 +1,241 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import json
+import os
+import threading
+
+from profi_dcp.metrics import REJECT_REASONS
+from profi_dcp.utils.event_log import EventLog
+
+
+class Tracer:
+    """
+    Receives the events of the DCP operations, e.g. to record a timeline. All methods do nothing, subclasses override
+    the events they are interested in. DCP only calls the tracer if one is attached, so tracing costs nothing
+    otherwise. The timestamps are read from the clock of DCP, except for received frames which use the receive time
+    of the socket. MAC addresses are ':' separated strings.
+    """
+
+    def request_built(self, timestamp, xid, operation, destination):
+        """
+        Called when a request has been built, before it is sent. Requests to several devices sharing an XID (see
+        DCP.identify_many) are reported once for the whole batch.
+        :param timestamp: The time in seconds.
+        :type timestamp: float
+        :param xid: The XID of the request.
+        :type xid: int
+        :param operation: The operation of the request ("identify", "get" or "set").
+        :type operation: string
+        :param destination: The destination MAC address of the request, None for a batch of requests.
+        :type destination: Optional[string]
+        """
+
+    def request_sent(self, timestamp, xid, operation, destination):
+        """
+        Called when a request has been sent.
+        :param timestamp: The time in seconds.
+        :type timestamp: float
+        :param xid: The XID of the request.
+        :type xid: int
+        :param operation: The operation of the request ("identify", "get" or "set").
+        :type operation: string
+        :param destination: The destination MAC address of the request.
+        :type destination: string
+        """
+
+    def frame_received(self, timestamp, length):
+        """
+        Called for each frame received from the socket, before it is validated.
+        :param timestamp: The receive time of the frame in seconds.
+        :type timestamp: float
+        :param length: The length of the frame in bytes.
+        :type length: int
+        """
+
+    def frame_rejected(self, timestamp, reason, source):
+        """
+        Called for each received frame that is not a valid response to the current request.
+        :param timestamp: The time in seconds.
+        :type timestamp: float
+        :param reason: The reason, one of the REJECT_* constants of profi_dcp.metrics.
+        :type reason: string
+        :param source: The source MAC address of the frame, None if the frame is malformed.
+        :type source: Optional[string]
+        """
+
+    def response_parsed(self, timestamp, xid, source):
+        """
+        Called for each valid response after it has been parsed.
+        :param timestamp: The time in seconds.
+        :type timestamp: float
+        :param xid: The XID of the request.
+        :type xid: int
+        :param source: The MAC address of the responding device.
+        :type source: string
+        """
+
+    def request_completed(self, timestamp, xid, operation, responses):
+        """
+        Called when a request is completed: after the response was received, the timeout expired or, for identify
+        requests to several devices, the time to receive responses has passed.
+        :param timestamp: The time in seconds.
+        :type timestamp: float
+        :param xid: The XID of the request.
+        :type xid: int
+        :param operation: The operation of the request ("identify", "get" or "set").
+        :type operation: string
+        :param responses: The number of valid responses received.
+        :type responses: int
+        """
+
+
+class ChromeTracer(Tracer):
+    """
+    Records the events as Chrome trace events, which can be viewed e.g. in Perfetto (https://ui.perfetto.dev) or in
+    chrome://tracing. Each request is shown as a slice from building it to its completion, the frames and responses as
+    instant events in the thread that performed the request.
+    """
+
+    def __init__(self):
+        """Create a new tracer without events."""
+        self.events = []
+        self.pid = os.getpid()
+        # start time of the pending requests by XID
+        self.__requests = {}
+
+    def request_built(self, timestamp, xid, operation, destination):
+        self.__requests[xid] = timestamp
+
+    def request_sent(self, timestamp, xid, operation, destination):
+        self.__instant(
+            timestamp, "request sent", {"xid": xid, "destination": destination}
+        )
+
+    def frame_received(self, timestamp, length):
+        self.__instant(timestamp, "frame received", {"length": length})
+
+    def frame_rejected(self, timestamp, reason, source):
+        self.__instant(
+            timestamp, "frame rejected", {"reason": reason, "source": source}
+        )
+
+    def response_parsed(self, timestamp, xid, source):
+        self.__instant(timestamp, "response", {"xid": xid, "source": source})
+
+    def request_completed(self, timestamp, xid, operation, responses):
+        start = self.__requests.pop(xid, timestamp)
+        self.events.append(
+            {
+                "name": operation,
+                "cat": "dcp",
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (timestamp - start) * 1e6,
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+                "args": {"xid": xid, "responses": responses},
+            }
+        )
+
+    def to_json(self):
+        """
+        Export the recorded events in the Chrome trace event format.
+        :return: The trace as JSON object.
+        :rtype: string
+        """
+        return json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"})
+
+    def save(self, path):
+        """
+        Write the recorded events to a file in the Chrome trace event format.
+        :param path: The path of the file.
+        :type path: string
+        """
+        with open(path, "w") as file:
+            file.write(self.to_json())
+
+    def __instant(self, timestamp, name, args):
+        """
+        Record an instant event in the current thread.
+        :param timestamp: The time of the event in seconds.
+        :type timestamp: float
+        :param name: The name of the event.
+        :type name: string
+        :param args: The arguments shown with the event.
+        :type args: dict
+        """
+        self.events.append(
+            {
+                "name": name,
+                "cat": "dcp",
+                "ph": "i",
+                "s": "t",
+                "ts": timestamp * 1e6,
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+
+class EventLogTracer(Tracer):
+    """
+    Records the events in an EventLog, a ring buffer with fixed memory, e.g. to keep the recent frame events of a
+    long-running service without formatting log messages. The kinds of the events and their values are:
+    - REQUEST_SENT: the XID and the destination MAC address (as int)
+    - FRAME_RECEIVED: the length of the frame
+    - FRAME_REJECTED: the index of the reason in profi_dcp.metrics.REJECT_REASONS and the source MAC address (as int,
+      0 for malformed frames)
+    - RESPONSE: the XID and the source MAC address (as int)
+    - REQUEST_COMPLETED: the XID and the number of responses
+    """
+
+    REQUEST_SENT = 1
+    FRAME_RECEIVED = 2
+    FRAME_REJECTED = 3
+    RESPONSE = 4
+    REQUEST_COMPLETED = 5
+
+    def __init__(self, event_log=None):
+        """
+        Create a new tracer.
+        :param event_log: The log to record the events in. Default is a new EventLog with the default capacity.
+        :type event_log: Optional[EventLog]
+        """
+        self.event_log = EventLog() if event_log is None else event_log
+
+    def request_sent(self, timestamp, xid, operation, destination):
+        self.event_log.record(
+            timestamp, self.REQUEST_SENT, xid, mac_address_to_int(destination)
+        )
+
+    def frame_received(self, timestamp, length):
+        self.event_log.record(timestamp, self.FRAME_RECEIVED, length)
+
+    def frame_rejected(self, timestamp, reason, source):
+        self.event_log.record(
+            timestamp,
+            self.FRAME_REJECTED,
+            REJECT_REASONS.index(reason),
+            mac_address_to_int(source) if source else 0,
+        )
+
+    def response_parsed(self, timestamp, xid, source):
+        self.event_log.record(timestamp, self.RESPONSE, xid, mac_address_to_int(source))
+
+    def request_completed(self, timestamp, xid, operation, responses):
+        self.event_log.record(timestamp, self.REQUEST_COMPLETED, xid, responses)
+
+
+def mac_address_to_int(mac_address):
+    """
+    Convert a MAC address to an int, e.g. to store it in an EventLog.
+    :param mac_address: The MAC address as ':' separated string.
+    :type mac_address: string
+    :return: The MAC address as int.
+    :rtype: int
+    """
+    return int(mac_address.replace(":", ""), 16)
@@ -0,0 +1,88 @@
+"""
+Copyright (c) 2024 Elias Rosch, Esslingen.
+All Rights Reserved.
+"""
+
+import array
+import collections
+
+# an event of the log: its time in seconds, its kind and two integer values whose meaning depends on the kind
+Event = collections.namedtuple("Event", ["timestamp", "kind", "value", "detail"])
+
+
+class EventLog:
+    """
+    A ring buffer of structured events for high-rate events (e.g. every received frame), as an alternative to logging.
+    The events are stored in arrays allocated once when the log is created, so recording an event neither formats
+    anything nor creates objects kept by the log, and the memory of the log never grows. When the log is full, the
+    oldest events are overwritten.
+    Recording is not synchronized, use one log per thread (or per DCP instance).
+    """
+
+    def __init__(self, capacity=65536):
+        """
+        Create a new, empty event log.
+        :param capacity: The maximum number of events kept in the log.
+        :type capacity: int
+        """
+        self.capacity = capacity
+        self.__timestamps = array.array("d", bytes(8 * capacity))
+        self.__kinds = array.array("B", bytes(capacity))
+        self.__values = array.array("q", bytes(8 * capacity))
+        self.__details = array.array("q", bytes(8 * capacity))
+        # the total number of recorded events, the next event is stored at recorded % capacity
+        self.recorded = 0
+
+    def record(self, timestamp, kind, value=0, detail=0):
+        """
+        Record an event, overwriting the oldest event if the log is full.
+        :param timestamp: The time of the event in seconds.
+        :type timestamp: float
+        :param kind: The kind of the event, in the range 0 to 255.
+        :type kind: int
+        :param value: The first value of the event (signed 64 bit).
+        :type value: int
+        :param detail: The second value of the event (signed 64 bit).
+        :type detail: int
+        """
+        index = self.recorded % self.capacity
+        self.__timestamps[index] = timestamp
+        self.__kinds[index] = kind
+        self.__values[index] = value
+        self.__details[index] = detail
+        self.recorded += 1
+
+    @property
+    def overwritten(self):
+        """
+        The number of events that were overwritten because the log was full.
+        :rtype: int
+        """
+        return max(self.recorded - self.capacity, 0)
+
+    def events(self):
+        """
+        Iterate over the events in the log, from the oldest to the newest.
+        :return: The events.
+        :rtype: Iterator[Event]
+        """
+        for position in range(self.overwritten, self.recorded):
+            index = position % self.capacity
+            yield Event(
+                self.__timestamps[index],
+                self.__kinds[index],
+                self.__values[index],
+                self.__details[index],
+            )
+
+    def clear(self):
+        """Remove all events from the log."""
+        self.recorded = 0
+
+    def __len__(self):
+        """
+        Return the number of events in the log.
+        :return: The number of events.
+        :rtype: int
+        """
+        return min(self.recorded, self.capacity)
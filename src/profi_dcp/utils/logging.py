@@ -1,30 +1,45 @@
 """Contains class which contains logging methods."""
 
 import logging
-from rich.logging import RichHandler
 
 
 class Logging:
-    """Class that contains common functions for logging."""
+    """
+    Class that contains common functions for logging.
+    The library only logs to the 'profi-dcp' logger, with lazy %-style arguments that are only formatted if a record is
+    actually emitted. It does not configure any handlers unless an instance of this class is created (e.g. by the CLI).
+    """
 
     logger = logging.getLogger("profi-dcp")
-
-    def __init__(self, logging_level=logging.INFO, filename=None):
-        logging.basicConfig(
-            format="%(message)s", datefmt="[%X]", handlers=[RichHandler()]
-        )
-
+    logger.addHandler(logging.NullHandler())
+
+    def __init__(self, logging_level=logging.INFO, filename=None, rich=False):
+        """
+        Configure the logger of the library.
+        :param logging_level: The logging level.
+        :type logging_level: int
+        :param filename: If given, log to this file instead of stderr.
+        :type filename: Optional[string]
+        :param rich: Whether to render the log messages on stderr with rich (only meant for the CLI).
+        :type rich: boolean
+        """
         Logging.logger.setLevel(logging_level)
         Logging.logger.propagate = False
 
         if filename:
             self.enable_file_logging(filename, logging_level)
         else:
-            self.enable_stream_logging(logging_level)
+            self.enable_stream_logging(logging_level, rich)
 
-    def enable_stream_logging(self, logging_level):
-        """Enables logging to stream using the provided log level with rich log formatting."""
-        handler = RichHandler()
+    def enable_stream_logging(self, logging_level, rich=False):
+        """Enables logging to stderr using the provided log level, optionally with rich log formatting."""
+        if rich:
+            # rich is imported here to only load it when it is actually used
+            from rich.logging import RichHandler
+
+            handler = RichHandler()
+        else:
+            handler = logging.StreamHandler()
         handler.setLevel(logging_level)
         formatter = logging.Formatter(fmt="%(message)s", datefmt="[%X]")
         handler.setFormatter(formatter)
@@ -1,17 +1,23 @@
 import pytest
+from profi_dcp.clock import VirtualClock
 from profi_dcp.profi_dcp import DCP
+from profi_dcp.interfaces import InterfaceResolver, psutil_interfaces
 import configparser
 from unittest.mock import patch, MagicMock
 
 
 @pytest.fixture(scope='function')
 @patch('profi_dcp.profi_dcp.L2Socket')
-@patch('profi_dcp.profi_dcp.psutil.net_if_addrs')
-@patch('profi_dcp.profi_dcp.psutil.net_if_stats')
+@patch('profi_dcp.interfaces.default_resolver', lambda: InterfaceResolver(psutil_interfaces, watch_changes=False))
+@patch('psutil.net_if_addrs')
+@patch('psutil.net_if_stats')
 def instance_dcp(psutil_net_if_stats, psutil_net_if_addrs, socket, mock_return):
     """
     Provides a dcp instance with a mocked socket and the mocked socket.
+    The instance uses a virtual clock advancing by 1ms each time it is read, so timeouts expire without waiting.
+    The mocked socket does not report statistics.
     """
+    socket.return_value.statistics.return_value = None
     psutil_net_if_addrs.return_value = mock_return.testnet_addrs
     psutil_net_if_stats.return_value = mock_return.testnet_stats
 
@@ -19,7 +25,7 @@ def instance_dcp(psutil_net_if_stats, psutil_net_if_addrs, socket, mock_return):
     config.read('tests/testconfig.ini')
     ip = config.get('BasicConfigurations', 'ip')
     assert ip, 'IP-Address is not set'
-    dcp = DCP(ip)
+    dcp = DCP(ip, clock=VirtualClock(step=0.001))
     dcp.default_timeout = 0.5
     dcp.identify_all_timeout = 0.5
     return dcp, socket
@@ -0,0 +1,117 @@
+import pytest
+
+import profi_dcp.dcp_constants as dcp_constants
+from profi_dcp.dcp_constants import FrameID, ServiceID, ServiceType
+from profi_dcp.simulation import DCP_FRAME_HEADER, SimulatedFleet, control_block
+
+np = pytest.importorskip("numpy")
+from profi_dcp import bulk  # noqa: E402
+
+HOST_MAC = "02:00:00:00:ff:01"
+
+
+def response(
+    device, xid=1, destination=HOST_MAC, service_id=ServiceID.IDENTIFY, blocks=None
+):
+    """
+    Build a response of a simulated device.
+    """
+    blocks = device.identify_blocks() if blocks is None else blocks
+    header = DCP_FRAME_HEADER.pack(
+        bytes.fromhex(destination.replace(":", "")),
+        device.mac_bytes,
+        dcp_constants.ETHER_TYPE,
+        FrameID.IDENTIFY_RESPONSE,
+        service_id,
+        ServiceType.RESPONSE,
+        xid,
+        0,
+        len(blocks),
+    )
+    return header + blocks
+
+
+@pytest.fixture(scope="module")
+def fleet():
+    """
+    Provides a fleet of 50 simulated devices.
+    """
+    return SimulatedFleet.generate(50, seed=1)
+
+
+class TestBulkDecoder:
+    """
+    Test the vectorized decoding of many frames.
+    """
+
+    def test_pack_frames(self):
+        """
+        The offsets point to the frames in the buffer.
+        """
+        buffer, offsets = bulk.pack_frames([b"abc", b"", b"defg"])
+        assert buffer == b"abcdefg"
+        assert offsets.tolist() == [0, 3, 3, 7]
+
+    def test_decode(self, fleet):
+        """
+        All identify responses are decoded, other frames are filtered by their headers.
+        """
+        devices = list(fleet)
+        frames = [response(device) for device in devices]
+        # a frame shorter than the header, a request, a set response and a response with an invalid length
+        frames.insert(10, bytes(20))
+        request = bytearray(frames[0])
+        request[17] = ServiceType.REQUEST
+        frames.insert(20, bytes(request))
+        frames.append(
+            response(
+                devices[0], service_id=ServiceID.SET, blocks=control_block((1, 2), 0)
+            )
+        )
+        frames.append(frames[5][:-10])
+        buffer, offsets = bulk.pack_frames(frames)
+
+        inventory = bulk.decode_bulk(buffer, offsets)
+        assert [device.MAC for device in inventory] == [
+            device.MAC for device in devices
+        ]
+        device = inventory.by_mac["02:00:00:00:00:07"]
+        assert device.name_of_station == "device-7"
+        assert device.IP == "10.0.0.7"
+        assert device.family == "Simulated"
+
+    def test_filter(self, fleet):
+        """
+        Only responses with the given destination and XID are decoded.
+        """
+        devices = list(fleet)[:3]
+        frames = [
+            response(devices[0], xid=1),
+            response(devices[1], xid=2),
+            response(devices[2], xid=1, destination="02:00:00:00:ff:02"),
+        ]
+        buffer, offsets = bulk.pack_frames(frames)
+
+        inventory = bulk.decode_bulk(buffer, offsets, destination=HOST_MAC, xid=1)
+        assert [device.MAC for device in inventory] == [devices[0].MAC]
+
+    def test_headers(self, fleet):
+        """
+        The header fields of all frames are extracted at once.
+        """
+        frames = [response(device, xid=index) for index, device in enumerate(fleet)]
+        headers, lengths = bulk.decode_headers(*bulk.pack_frames(frames))
+
+        assert headers["xid"].tolist() == list(range(len(frames)))
+        assert (headers["ether_type"] == dcp_constants.ETHER_TYPE).all()
+        assert lengths.tolist() == [len(frame) for frame in frames]
+        assert bytes(headers["source"][7]) == bytes.fromhex("020000000007")
+
+    def test_duplicates(self, fleet):
+        """
+        Repeated responses of a device are merged.
+        """
+        device = next(iter(fleet))
+        inventory = bulk.decode_bulk(*bulk.pack_frames([response(device)] * 3))
+        assert len(inventory) == 1
+        assert inventory.duplicates == 2
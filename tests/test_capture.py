@@ -0,0 +1,181 @@
+import struct
+
+import pytest
+
+import profi_dcp.dcp_constants as dcp_constants
+from profi_dcp.capture import CaptureReader, ingest_capture
+from profi_dcp.dcp_constants import FrameID, ServiceID, ServiceType
+from profi_dcp.simulation import DCP_FRAME_HEADER, SimulatedDevice, SimulatedFleet
+
+
+def identify_response(device, xid=1):
+    """
+    Build the identify response of a simulated device.
+    """
+    blocks = device.identify_blocks()
+    header = DCP_FRAME_HEADER.pack(
+        bytes.fromhex("020000aaaaaa"),
+        device.mac_bytes,
+        dcp_constants.ETHER_TYPE,
+        FrameID.IDENTIFY_RESPONSE,
+        ServiceID.IDENTIFY,
+        ServiceType.RESPONSE,
+        xid,
+        0,
+        len(blocks),
+    )
+    return header + blocks
+
+
+def write_pcap(path, records, byte_order="<", nanoseconds=False):
+    """
+    Write the (timestamp, frame) records to a pcap file.
+    """
+    magic = 0xA1B23C4D if nanoseconds else 0xA1B2C3D4
+    resolution = 1e9 if nanoseconds else 1e6
+    with open(path, "wb") as file:
+        file.write(struct.pack(byte_order + "IHHiIII", magic, 2, 4, 0, 0, 65535, 1))
+        for timestamp, frame in records:
+            seconds = int(timestamp)
+            fraction = round((timestamp - seconds) * resolution)
+            file.write(struct.pack(byte_order + "IIII", seconds, fraction, len(frame), len(frame)) + frame)
+
+
+def write_pcapng(path, records, byte_order="<"):
+    """
+    Write the (timestamp, frame) records to a pcapng file with nanosecond timestamps and an interface of another link
+    type, whose packets must be skipped.
+    """
+
+    def block(block_type, body):
+        length = 12 + len(body)
+        return struct.pack(byte_order + "II", block_type, length) + body + struct.pack(byte_order + "I", length)
+
+    with open(path, "wb") as file:
+        file.write(block(0x0A0D0D0A, struct.pack(byte_order + "IHHq", 0x1A2B3C4D, 1, 0, -1)))
+        options = struct.pack(byte_order + "HHB3x", 9, 1, 9) + struct.pack(byte_order + "HH", 0, 0)
+        file.write(block(1, struct.pack(byte_order + "HHI", 1, 0, 65535) + options))
+        file.write(block(1, struct.pack(byte_order + "HHI", 101, 0, 65535)))
+        for timestamp, frame in records:
+            ticks = round(timestamp * 1e9)
+            padding = bytes(-len(frame) % 4)
+            for interface in (0, 1):
+                header = struct.pack(
+                    byte_order + "IIIII", interface, ticks >> 32, ticks & 0xFFFFFFFF, len(frame), len(frame)
+                )
+                file.write(block(6, header + frame + padding))
+
+
+@pytest.fixture(scope="module")
+def records():
+    """
+    Provides the identify responses of 30 devices, seen three times each, and a device that is renamed.
+    """
+    fleet = SimulatedFleet.generate(30, seed=1)
+    records = []
+    for scan in range(3):
+        for index, device in enumerate(fleet):
+            records.append((1700000000 + scan * 10 + index * 0.001, identify_response(device, scan)))
+    renamed = SimulatedDevice("02:00:00:00:01:00", name_of_station="old-name")
+    records.insert(0, (1699999999.5, identify_response(renamed)))
+    renamed = SimulatedDevice("02:00:00:00:01:00", name_of_station="new-name")
+    records.append((1700000100.25, identify_response(renamed)))
+    return records
+
+
+class TestCaptureReader:
+    """Test reading pcap and pcapng files."""
+
+    @pytest.mark.parametrize("byte_order", ["<", ">"])
+    @pytest.mark.parametrize("writer", [write_pcap, write_pcapng])
+    def test_records(self, tmp_path, records, writer, byte_order):
+        """
+        Test reading all records of a file.
+        Expected results: the frames and timestamps are read, frames of other link types are skipped.
+        """
+        path = tmp_path / "capture"
+        writer(path, records, byte_order)
+        with CaptureReader(path) as reader:
+            read = list(reader.records())
+
+        assert [frame for _, frame in read] == [frame for _, frame in records]
+        assert [timestamp for timestamp, _ in read] == pytest.approx([timestamp for timestamp, _ in records])
+
+    @pytest.mark.parametrize("writer", [write_pcap, write_pcapng])
+    def test_chunks(self, tmp_path, records, writer):
+        """
+        Test splitting a file into chunks.
+        Expected results: the chunks are aligned to records and together contain all records.
+        """
+        path = tmp_path / "capture"
+        writer(path, records)
+        with CaptureReader(path) as reader:
+            chunks = reader.chunks(1000)
+            read = [record for chunk in chunks for record in reader.records(chunk)]
+
+        assert len(chunks) > 5
+        assert [frame for _, frame in read] == [frame for _, frame in records]
+
+    def test_nanoseconds(self, tmp_path):
+        """
+        Test reading a pcap file with nanosecond timestamps.
+        Expected results: the timestamps are read with nanosecond resolution.
+        """
+        path = tmp_path / "capture.pcap"
+        write_pcap(path, [(12.000000123, bytes(60))], nanoseconds=True)
+        with CaptureReader(path) as reader:
+            assert next(reader.records()).timestamp == pytest.approx(12.000000123, abs=1e-10)
+
+    def test_invalid_file(self, tmp_path):
+        """
+        Test opening a file that is no capture.
+        Expected results: ValueError.
+        """
+        path = tmp_path / "capture.pcap"
+        path.write_bytes(bytes(100))
+        with pytest.raises(ValueError):
+            CaptureReader(path)
+
+
+class TestIngestCapture:
+    """Test finding the devices in capture files."""
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    @pytest.mark.parametrize("writer", [write_pcap, write_pcapng])
+    def test_ingest(self, tmp_path, records, writer, workers):
+        """
+        Test ingesting a capture in several chunks.
+        Expected results: each device is found once with the time it was first and last seen and its number of
+        responses, the renamed device keeps the newest name and the conflict is recorded.
+        """
+        path = tmp_path / "capture"
+        writer(path, records)
+        inventory = ingest_capture(path, workers=workers, chunk_size=2000)
+
+        assert len(inventory) == 31
+        assert inventory.responses == 92
+        assert inventory.frames == 92
+        device = inventory.by_mac["02:00:00:00:00:07"]
+        assert device.name_of_station == "device-7"
+        assert device.first_seen == pytest.approx(1700000000.007)
+        assert device.last_seen == pytest.approx(1700000020.007)
+        assert device.responses == 3
+        renamed = inventory.by_mac["02:00:00:00:01:00"]
+        assert renamed.name_of_station == "new-name"
+        assert renamed.first_seen == pytest.approx(1699999999.5)
+        assert renamed.last_seen == pytest.approx(1700000100.25)
+        assert [conflict.discarded.name_of_station for conflict in inventory.conflicts] == ["old-name"]
+
+    def test_vlan(self, tmp_path, records):
+        """
+        Test ingesting VLAN tagged responses.
+        Expected results: the tag is removed before decoding.
+        """
+        frame = records[1][1]
+        tagged = frame[:12] + bytes.fromhex("81000064") + frame[12:]
+        path = tmp_path / "capture.pcap"
+        write_pcap(path, [(1, tagged), (2, bytes(60))])
+
+        inventory = ingest_capture(path, workers=1)
+        assert [device.MAC for device in inventory] == ["02:00:00:00:00:00"]
+        assert inventory.frames == 2
@@ -0,0 +1,80 @@
+import logging
+
+from profi_dcp.clock import VirtualClock
+from profi_dcp.profi_dcp import DCP
+from profi_dcp.simulation import SimulatedFleet
+from profi_dcp.tracing import EventLogTracer
+from profi_dcp.utils.event_log import Event, EventLog
+from profi_dcp.utils.logging import Logging
+
+
+class TestEventLog:
+    """
+    Test the event ring buffer.
+    """
+
+    def test_record(self):
+        """
+        Recorded events are returned from the oldest to the newest.
+        """
+        log = EventLog(capacity=4)
+        log.record(1.5, 2, 3, -4)
+        log.record(2.5, 7)
+
+        assert len(log) == 2
+        assert list(log.events()) == [Event(1.5, 2, 3, -4), Event(2.5, 7, 0, 0)]
+
+    def test_overwrite(self):
+        """
+        When the log is full, the oldest events are overwritten.
+        """
+        log = EventLog(capacity=3)
+        for index in range(5):
+            log.record(index, 1, index)
+
+        assert len(log) == 3
+        assert log.overwritten == 2
+        assert [event.value for event in log.events()] == [2, 3, 4]
+
+        log.clear()
+        assert len(log) == 0
+        assert list(log.events()) == []
+
+
+class TestEventLogTracer:
+    """
+    Test recording the events of DCP in an event log.
+    """
+
+    def test_identify(self):
+        """
+        Sent requests, received frames, responses and the completion are recorded.
+        """
+        fleet = SimulatedFleet.generate(3, delay=0.01, seed=1)
+        tracer = EventLogTracer(EventLog(capacity=16))
+        dcp = DCP(transport=fleet.connect(recv_timeout=0.05, clock=VirtualClock()), tracer=tracer)
+        dcp.identify_all(timeout=0.2, response_delay=1)
+
+        kinds = [event.kind for event in tracer.event_log.events()]
+        assert kinds == [EventLogTracer.REQUEST_SENT] + [EventLogTracer.FRAME_RECEIVED, EventLogTracer.RESPONSE] * 3 + [
+            EventLogTracer.REQUEST_COMPLETED
+        ]
+        events = list(tracer.event_log.events())
+        assert events[0].detail == 0x010ECF000000
+        assert {event.detail for event in events if event.kind == EventLogTracer.RESPONSE} == {
+            0x020000000000, 0x020000000001, 0x020000000002
+        }
+        assert events[-1].detail == 3
+
+
+class TestLogging:
+    """
+    Test the logging configuration of the library.
+    """
+
+    def test_no_handlers_by_default(self):
+        """
+        The library does not configure handlers of the root logger and its logger only has a NullHandler by default.
+        """
+        assert any(isinstance(handler, logging.NullHandler) for handler in Logging.logger.handlers)
+        assert not any(type(handler).__module__.startswith("rich") for handler in logging.getLogger().handlers)
@@ -3,6 +3,7 @@ import pytest
 from unittest.mock import patch
 
 from profi_dcp.profi_dcp import DCP
+from profi_dcp.interfaces import InterfaceResolver, psutil_interfaces
 
 
 class TestInvalidInput:
@@ -10,12 +11,15 @@ class TestInvalidInput:
     Test the behavior for some invalid input.
     """
 
-    @patch('profi_dcp.profi_dcp.psutil')
-    def test_init_with_invalid_ip(self, psutil, mock_return):
+    @patch('profi_dcp.interfaces.default_resolver', lambda: InterfaceResolver(psutil_interfaces, watch_changes=False))
+    @patch('psutil.net_if_stats')
+    @patch('psutil.net_if_addrs')
+    def test_init_with_invalid_ip(self, psutil_net_if_addrs, psutil_net_if_stats, mock_return):
         """
         Test the init of the dcp class with invalid ip addresses.
         """
-        psutil.net_if_addrs.return_value = mock_return.testnet_addrs
+        psutil_net_if_addrs.return_value = mock_return.testnet_addrs
+        psutil_net_if_stats.return_value = mock_return.testnet_stats
 
         invalid_ips = ["0.0.0.0",
                        "not an ip",
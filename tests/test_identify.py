@@ -1,6 +1,7 @@
 import itertools
 import pytest
-from profi_dcp.profi_dcp import DcpTimeoutError, Device
+from profi_dcp.profi_dcp import DCP, DcpTimeoutError, Device, SweepPartition
+from protocol_constants import MULTICAST_PN_ADDRESS, ResponseDelay
 from socket import timeout
 
 
@@ -79,3 +80,84 @@ class TestDCPIdentify:
 
         with pytest.raises(DcpTimeoutError):
             instance_dcp.identify(device_mac)
+
+
+class TestDCPIdentifySweep:
+    """
+    Test the partitioned discovery with identify_sweep.
+    """
+
+    def responses(self, mock_return, macs, xid):
+        """
+        Create the identify responses of the given devices with the given xid.
+        """
+        responses = []
+        for mac in macs:
+            mock_return.dst_custom = mac
+            responses.extend(mock_return.identify_response('IDENTIFY', xid=xid))
+        return responses
+
+    def test_identify_sweep_merges_partitions(self, mock_return, instance_dcp):
+        """
+        Test that devices found by several partitions are merged into a single list without duplicates.
+        """
+        instance_dcp, socket = instance_dcp
+        xid = instance_dcp._DCP__xid
+        responses = {
+            1: self.responses(mock_return, mock_return.dst[:3], xid + 1),
+            2: self.responses(mock_return, mock_return.dst[2:], xid + 2),
+        }
+
+        def recv():
+            # only return the responses to the latest request
+            pending = responses.get(socket().send.call_count)
+            return pending.pop(0) if pending else None
+        socket().recv.side_effect = recv
+
+        partitions = [SweepPartition.by_family("Win"), SweepPartition.by_family("CP16")]
+        devices = instance_dcp.identify_sweep(partitions, timeout=0.1)
+
+        assert [device.MAC for device in devices] == mock_return.dst
+
+    def test_identify_sweep_filter_packet(self, instance_dcp):
+        """
+        Check the identify request of a partition filtered by device id is build correctly.
+        """
+        instance_dcp, socket = instance_dcp
+        socket().recv.return_value = None
+
+        partition = SweepPartition.by_device_id(0x002A, 0x0313, response_delay=0x0200)
+        instance_dcp.identify_sweep([partition], timeout=0.1)
+
+        raw_packet = socket().send.call_args.args[0]
+        assert raw_packet[0:6] == MULTICAST_PN_ADDRESS, "Destination MAC wrong"
+        assert raw_packet[22:24] == b'\x02\x00', "Response delay wrong"
+        assert raw_packet[24:26] == b'\x00\x08', "Length wrong"
+        assert raw_packet[26:28] == b'\x02\x03', "Option wrong"
+        assert raw_packet[28:30] == b'\x00\x04', "DCPBlockLength wrong"
+        assert raw_packet[30:34] == b'\x00\x2A\x03\x13', "Device ID wrong"
+
+    def test_identify_sweep_scales_response_delay_to_budget(self, mock_return, instance_dcp):
+        """
+        Test that partitions without explicit response delay are spread according to the frame budget.
+        """
+        instance_dcp, socket = instance_dcp
+        xid = instance_dcp._DCP__xid
+        first = self.responses(mock_return, mock_return.dst, xid + 1)
+        socket().recv.side_effect = itertools.chain(first, itertools.cycle([None]))
+
+        partitions = [SweepPartition(), SweepPartition()]
+        instance_dcp.identify_sweep(partitions, max_frames_per_second=1, timeout=0.1)
+
+        first_request, second_request = [call.args[0] for call in socket().send.call_args_list]
+        assert first_request[22:24] == ResponseDelay.IDENTIFY
+        # 5 devices with 1 frame/s need a response window of 5s
+        assert int.from_bytes(second_request[22:24], 'big') == 500
+
+    @pytest.mark.parametrize("device_count, frames_per_second, factor", [
+        (0, 100, 1), (100, 1000, 10), (1000, 1000, 100), (10 ** 6, 1, 0x1900)])
+    def test_response_delay_for(self, device_count, frames_per_second, factor):
+        """
+        Test the computation of the response delay factor from the number of devices and the frame budget.
+        """
+        assert DCP.response_delay_for(device_count, frames_per_second) == factor
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import pytest
+
+
+def imported_modules(module):
+    """
+    Import the given module in a fresh interpreter and return the names of all modules loaded afterwards.
+    """
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    return set(result.stdout.split())
+
+
+class TestLightweightImport:
+    """
+    Test that importing the library does not load heavy modules which are only needed later on.
+    """
+
+    @pytest.mark.parametrize("module", ["profi_dcp.protocol", "profi_dcp.util", "profi_dcp.dcp_constants",
+                                        "profi_dcp.profi_dcp", "profi_dcp.cli.cli"])
+    @pytest.mark.parametrize("heavy_module", ["rich", "psutil", "ctypes"])
+    def test_no_heavy_imports(self, module, heavy_module):
+        """
+        Importing the protocol codec, the DCP class or the CLI must not import rich, psutil or the pcap bindings.
+        """
+        assert heavy_module not in imported_modules(module)
+
+    @pytest.mark.parametrize("module", ["profi_dcp.profi_dcp", "profi_dcp.cli.cli"])
+    @pytest.mark.parametrize("transport_module", ["profi_dcp.l2socket.pcap_file", "profi_dcp.l2socket.memory",
+                                                  "profi_dcp.l2socket.registry", "mmap"])
+    def test_no_eager_transports(self, module, transport_module):
+        """
+        Importing the DCP class or the CLI must not import the transports only needed for replay, recording, testing
+        or shared sockets.
+        """
+        assert transport_module not in imported_modules(module)
@@ -0,0 +1,162 @@
+import errno
+import socket
+import sys
+import pytest
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import profi_dcp.interfaces as interfaces
+from profi_dcp.interfaces import InterfaceResolver, NetworkInterface, ioctl_interfaces
+
+
+def netlink_available():
+    """
+    Checks, if rtnetlink sockets can be opened on this machine.
+    """
+    try:
+        socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, 0).close()
+        return True
+    except (AttributeError, OSError):
+        return False
+
+
+@pytest.fixture(scope='function')
+def enumerate_interfaces():
+    """
+    Provides a mocked interface enumeration with some sample interfaces.
+    """
+    return MagicMock(return_value=[
+        NetworkInterface('down0', '02:00:00:00:00:10', [('10.0.2.7', '255.255.255.0')], [], False),
+        NetworkInterface('veth0', '02:00:00:00:00:11', [('10.0.1.5', '255.255.255.0')], [], True),
+        NetworkInterface('eth0', '02:00:00:00:00:12', [('10.0.2.124', '255.255.240.0'), ('10.0.3.1', None)],
+                         ['fd00::2', 'fe80::1%eth0'], True),
+        NetworkInterface('tun0', None, [('10.0.4.1', '255.255.255.0')], [], True),
+    ])
+
+
+class TestInterfaceResolver:
+    """
+    Test resolving IP addresses to network interfaces.
+    """
+
+    @pytest.mark.parametrize('ip', ['10.0.2.124', '10.0.3.1', '10.0.2.99', 'fd00::2', 'fe80::1'])
+    def test_resolve(self, ip, enumerate_interfaces):
+        """
+        Test resolving an address of the interface, an address in its subnet and IPv6 addresses.
+        """
+        resolver = InterfaceResolver(enumerate_interfaces, watch_changes=False)
+        assert resolver.resolve(ip) == ('02:00:00:00:00:12', 'eth0', '10.0.2.124')
+
+    @pytest.mark.parametrize('ip', ['10.0.4.1', '192.0.2.1', 'not an ip', None, 5])
+    def test_resolve_invalid(self, ip, enumerate_interfaces):
+        """
+        Test that interfaces without mac address and unknown or invalid addresses raise a ValueError.
+        """
+        resolver = InterfaceResolver(enumerate_interfaces, watch_changes=False)
+        with pytest.raises(ValueError):
+            resolver.resolve(ip)
+
+    def test_no_cache_without_watcher(self, enumerate_interfaces):
+        """
+        Without watching for changes, the interfaces are enumerated for every lookup.
+        """
+        resolver = InterfaceResolver(enumerate_interfaces, watch_changes=False)
+        resolver.resolve('10.0.2.124')
+        resolver.resolve('10.0.2.124')
+        assert enumerate_interfaces.call_count == 2
+
+    @pytest.mark.skipif(not netlink_available(), reason="rtnetlink not available")
+    def test_cache(self, enumerate_interfaces):
+        """
+        While watching for changes, the interfaces are only enumerated again after invalidation.
+        """
+        resolver = InterfaceResolver(enumerate_interfaces)
+        for _ in range(10):
+            resolver.resolve('10.0.2.124')
+        assert enumerate_interfaces.call_count == 1
+
+        resolver.invalidate()
+        resolver.resolve('10.0.2.124')
+        assert enumerate_interfaces.call_count == 2
+
+    def test_lost_notifications(self, enumerate_interfaces):
+        """
+        If notifications were lost (ENOBUFS), the interfaces are enumerated again and the watcher is kept.
+        """
+        resolver = InterfaceResolver(enumerate_interfaces, watch_changes=False)
+        watcher = MagicMock()
+        watcher.recv.side_effect = [BlockingIOError(), OSError(errno.ENOBUFS, "No buffer space available"),
+                                    BlockingIOError()]
+        resolver._InterfaceResolver__watcher = watcher
+
+        resolver.resolve('10.0.2.124')
+        resolver.resolve('10.0.2.124')
+        resolver.resolve('10.0.2.124')
+        assert enumerate_interfaces.call_count == 2
+        watcher.close.assert_not_called()
+
+    def test_failed_watcher(self, enumerate_interfaces):
+        """
+        If the watcher fails persistently, it is closed and the interfaces are enumerated for every lookup.
+        """
+        resolver = InterfaceResolver(enumerate_interfaces, watch_changes=False)
+        watcher = MagicMock()
+        watcher.recv.side_effect = OSError(errno.EBADF, "Bad file descriptor")
+        resolver._InterfaceResolver__watcher = watcher
+
+        resolver.resolve('10.0.2.124')
+        resolver.resolve('10.0.2.124')
+        assert enumerate_interfaces.call_count == 2
+        assert watcher.recv.call_count == 1
+        watcher.close.assert_called_once()
+
+    def test_close(self, enumerate_interfaces):
+        """
+        Closing the resolver closes the watcher, the interfaces are enumerated for every lookup afterwards.
+        """
+        resolver = InterfaceResolver(enumerate_interfaces, watch_changes=False)
+        watcher = MagicMock()
+        watcher.recv.side_effect = BlockingIOError()
+        resolver._InterfaceResolver__watcher = watcher
+
+        resolver.resolve('10.0.2.124')
+        resolver.close()
+        resolver.resolve('10.0.2.124')
+        watcher.close.assert_called_once()
+        assert enumerate_interfaces.call_count == 2
+
+    @patch('profi_dcp.interfaces.InterfaceResolver')
+    def test_default_resolver_threads(self, resolver_class):
+        """
+        The default resolver is created only once, even if it is requested from several threads at once.
+        """
+        def create_resolver():
+            time.sleep(0.05)
+            return MagicMock()
+        resolver_class.side_effect = create_resolver
+
+        with patch('profi_dcp.interfaces._default_resolver', None):
+            threads = [threading.Thread(target=interfaces.default_resolver) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert resolver_class.call_count == 1
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="ioctl enumeration is only available on Linux")
+class TestIoctlInterfaces:
+    """
+    Test enumerating the network interfaces with ioctls.
+    """
+
+    def test_loopback(self):
+        """
+        The loopback interface is found with its address.
+        """
+        loopback = [interface for interface in ioctl_interfaces()
+                    if ('127.0.0.1', '255.0.0.0') in interface.ipv4_addresses]
+        assert loopback
+        assert loopback[0].is_up
+        assert loopback[0].mac_address == '00:00:00:00:00:00'
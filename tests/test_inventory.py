@@ -0,0 +1,161 @@
+import copy
+import pickle
+
+import pytest
+
+from profi_dcp.clock import VirtualClock
+from profi_dcp.inventory import Inventory
+from profi_dcp.profi_dcp import DCP, Device
+from profi_dcp.simulation import SimulatedDevice, SimulatedFleet
+
+
+def device(mac, name):
+    """
+    Create a device with the given mac address and name of station.
+    """
+    result = Device()
+    result.MAC = mac
+    result.name_of_station = name
+    return result
+
+
+class TestInventory:
+    """
+    Test the deduplication of devices by mac address.
+    """
+
+    def test_duplicates(self):
+        """
+        Identical responses of a device are merged, the first response is kept.
+        """
+        first = device("02:00:00:00:00:01", "a")
+        inventory = Inventory([first, device("02:00:00:00:00:02", "b")])
+
+        assert not inventory.add(device("02:00:00:00:00:01", "a"))
+        assert len(inventory) == 2
+        assert inventory.duplicates == 1
+        assert inventory.conflicts == []
+        assert inventory.by_mac["02:00:00:00:00:01"] is first
+        assert list(inventory.by_mac) == ["02:00:00:00:00:01", "02:00:00:00:00:02"]
+
+    def test_keep_newest(self):
+        """
+        With KEEP_NEWEST, a conflicting response replaces the device at its position and the conflict is recorded.
+        """
+        old, new = device("02:00:00:00:00:01", "old"), device("02:00:00:00:00:01", "new")
+        inventory = Inventory([old, device("02:00:00:00:00:02", "b"), new])
+
+        assert [d.name_of_station for d in inventory] == ["new", "b"]
+        assert inventory.by_mac["02:00:00:00:00:01"] is new
+        assert inventory.conflicts == [("02:00:00:00:00:01", new, old)]
+
+    def test_keep_newest_times(self):
+        """
+        With KEEP_NEWEST, identical responses update the receive time and response time of the device.
+        """
+        old, new = device("02:00:00:00:00:01", "a"), device("02:00:00:00:00:01", "a")
+        old.timestamp, old.response_time = 10.0, 0.1
+        new.timestamp, new.response_time = 12.0, 0.2
+        inventory = Inventory([old, new])
+
+        assert list(inventory) == [old]
+        assert (old.timestamp, old.response_time) == (12.0, 0.2)
+        assert inventory.conflicts == []
+
+        first = Inventory([device("02:00:00:00:00:01", "a")], conflict_policy=Inventory.KEEP_FIRST)
+        first.add(new)
+        assert first[0].timestamp is None
+
+    def test_keep_newest_after_reordering(self):
+        """
+        Conflicting responses replace the right device after the devices were sorted, inserted or removed.
+        """
+        devices = [device(f"02:00:00:00:00:0{index}", str(index)) for index in range(5)]
+        inventory = Inventory(devices)
+        inventory.reverse()
+        inventory.remove(devices[2])
+        inventory.insert(0, device("02:00:00:00:00:09", "9"))
+        inventory.add(device("02:00:00:00:00:01", "new"))
+        inventory.sort(key=lambda d: d.MAC)
+        inventory.add(device("02:00:00:00:00:04", "new"))
+
+        assert [d.name_of_station for d in inventory] == ["0", "new", "3", "new", "9"]
+
+    def test_keep_first(self):
+        """
+        With KEEP_FIRST, a conflicting response is discarded and the conflict is recorded.
+        """
+        old, new = device("02:00:00:00:00:01", "old"), device("02:00:00:00:00:01", "new")
+        inventory = Inventory([old, new], conflict_policy=Inventory.KEEP_FIRST)
+
+        assert list(inventory) == [old]
+        assert inventory.conflicts[0].kept is old
+        assert inventory.conflicts[0].discarded is new
+
+    def test_list_methods_merge(self):
+        """
+        Devices added with the list methods are merged like with add.
+        """
+        first = device("02:00:00:00:00:01", "a")
+        inventory = Inventory([first])
+
+        inventory.append(device("02:00:00:00:00:01", "a"))
+        inventory.extend([device("02:00:00:00:00:02", "b"), device("02:00:00:00:00:02", "b")])
+        inventory += [device("02:00:00:00:00:01", "new")]
+        inventory.insert(0, device("02:00:00:00:00:03", "c"))
+
+        assert [d.name_of_station for d in inventory] == ["c", "new", "b"]
+        assert inventory.duplicates == 3
+        assert [conflict.discarded for conflict in inventory.conflicts] == [first]
+        assert set(inventory.by_mac) == {"02:00:00:00:00:01", "02:00:00:00:00:02", "02:00:00:00:00:03"}
+        with pytest.raises(TypeError):
+            inventory[0] = device("02:00:00:00:00:04", "d")
+
+    def test_remove(self):
+        """
+        Removed devices are removed from the mac address lookup and can be added again.
+        """
+        devices = [device(f"02:00:00:00:00:0{index}", str(index)) for index in range(5)]
+        inventory = Inventory(devices)
+
+        inventory.remove(devices[0])
+        assert inventory.pop() is devices[4]
+        del inventory[1:]
+        assert list(inventory.by_mac) == ["02:00:00:00:00:01"]
+        assert inventory.add(devices[0])
+        inventory.clear()
+        assert inventory.by_mac == {}
+
+    def test_copy(self):
+        """
+        Inventories can be pickled and copied with all their attributes.
+        """
+        inventory = Inventory([device("02:00:00:00:00:01", "a"), device("02:00:00:00:00:01", "b")], drops=3)
+        for restored in (pickle.loads(pickle.dumps(inventory)), copy.copy(inventory)):
+            assert [d.name_of_station for d in restored] == ["b"]
+            assert restored.drops == 3
+            assert restored.duplicates == 1
+            assert not restored.add(device("02:00:00:00:00:01", "b"))
+        copy.copy(inventory).add(device("02:00:00:00:00:02", "c"))
+        assert list(inventory.by_mac) == ["02:00:00:00:00:01"]
+
+    def test_unknown_policy(self):
+        """
+        Unknown conflict policies are rejected.
+        """
+        with pytest.raises(ValueError):
+            Inventory(conflict_policy="last")
+
+    def test_identify_all(self):
+        """
+        identify_all returns each device only once, even if two devices respond with the same mac address.
+        """
+        fleet = SimulatedFleet.generate(10, seed=1)
+        SimulatedFleet([SimulatedDevice("02:00:00:00:00:03", name_of_station="clone")], network=fleet.network)
+        dcp = DCP(transport=fleet.connect(recv_timeout=0.05, clock=VirtualClock()))
+
+        devices = dcp.identify_all(timeout=0.2, response_delay=1)
+        assert len(devices) == 10
+        assert devices.duplicates == 1
+        assert [conflict.mac for conflict in devices.conflicts] == ["02:00:00:00:00:03"]
+        assert devices.by_mac["02:00:00:00:00:03"] is devices.conflicts[0].kept
@@ -0,0 +1,133 @@
+import pytest
+
+from profi_dcp.clock import VirtualClock
+from profi_dcp.error import DcpTimeoutError
+from profi_dcp.l2socket.memory import L2MemorySocket
+from profi_dcp.metrics import Histogram, Metrics
+from profi_dcp.profi_dcp import DCP
+from profi_dcp.simulation import SimulatedFleet
+
+HOST_MAC = "02:00:00:00:ff:01"
+
+
+@pytest.fixture(scope='function')
+def fleet():
+    """
+    Provides a fleet of 20 simulated devices without delay.
+    """
+    return SimulatedFleet.generate(20, seed=1)
+
+
+@pytest.fixture(scope='function')
+def dcp(fleet):
+    """
+    Provides a DCP instance connected to the simulated fleet, running on a virtual clock.
+    """
+    instance = DCP(transport=fleet.connect(mac=HOST_MAC, recv_timeout=0.05, clock=VirtualClock()))
+    instance.default_timeout = 0.5
+    yield instance
+    instance.close()
+
+
+def response_frame(xid, destination=HOST_MAC, service_type=0x01, payload=b""):
+    """
+    Build a minimal identify response frame.
+    """
+    header = bytes.fromhex(destination.replace(":", "")) + bytes.fromhex("020000000001") + bytes.fromhex("8892")
+    dcp_header = bytes.fromhex("feff05") + bytes([service_type]) + xid.to_bytes(4, "big") + bytes(2)
+    return header + dcp_header + len(payload).to_bytes(2, "big") + payload
+
+
+class TestHistogram:
+    """
+    Test the latency histogram.
+    """
+
+    def test_cumulative_counts(self):
+        """
+        Each bucket counts all values up to its bound, the last bucket counts all values.
+        """
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+
+        assert histogram.cumulative_counts() == [(0.1, 2), (1, 3), (float("inf"), 4)]
+        assert histogram.as_dict() == {"buckets": {"0.1": 2, "1.0": 3, "+Inf": 4}, "sum": 3.65, "count": 4}
+
+
+class TestDcpMetrics:
+    """
+    Test the metrics collected by DCP.
+    """
+
+    def test_identify_all(self, fleet, dcp):
+        """
+        All sent requests and received responses are counted, the latency is measured per operation.
+        """
+        devices = dcp.identify_all(timeout=0.2, response_delay=1)
+        assert dcp.get_name_of_station("02:00:00:00:00:01") == "device-1"
+
+        metrics = dcp.metrics.as_dict()
+        assert metrics["frames_sent"] == 2
+        assert metrics["frames_received"] == len(devices) + 1
+        assert metrics["timeouts"] == 0
+        assert metrics["latency_seconds"]["identify"]["count"] == len(devices)
+        assert metrics["latency_seconds"]["get"]["count"] == 1
+        assert dcp._DCP__socket.metrics.frames_sent == 2
+
+    def test_timeout(self, dcp):
+        """
+        Requests without response are counted as timeouts.
+        """
+        with pytest.raises(DcpTimeoutError):
+            dcp.get_ip_address("02:00:00:00:ff:ff")
+        assert dcp.metrics.timeouts == 1
+
+    def test_rejected_frames(self):
+        """
+        Received frames not matching the request are counted by reason, malformed frames as parse errors.
+        """
+        socket = L2MemorySocket(HOST_MAC, recv_timeout=0.01, clock=VirtualClock())
+        dcp = DCP(transport=socket)
+        dcp.default_timeout = 0.1
+        xid = dcp._DCP__xid + 1
+
+        socket.deliver(response_frame(xid, destination="02:00:00:00:ff:02"))
+        socket.deliver(response_frame(xid, service_type=0x00))
+        socket.deliver(response_frame(xid + 1))
+        socket.deliver(response_frame(xid)[:20])
+        with pytest.raises(DcpTimeoutError):
+            dcp.identify("02:00:00:00:00:01")
+
+        assert dict(dcp.metrics.frames_rejected) == {
+            "wrong_mac": 1,
+            "wrong_service_type": 1,
+            "wrong_xid": 1,
+            "malformed": 1,
+        }
+        assert dcp.metrics.parse_errors == 1
+        assert dcp.metrics.frames_received == 4
+
+
+class TestPrometheus:
+    """
+    Test the export in the Prometheus text format.
+    """
+
+    def test_export(self):
+        """
+        Counters, rejected frames and histograms are exported with the given labels.
+        """
+        metrics = Metrics(buckets=(0.5,))
+        metrics.frames_sent = 3
+        metrics.reject("wrong_xid")
+        metrics.observe_latency("identify", 0.25)
+
+        lines = metrics.to_prometheus(labels={"interface": 'eth"0'}).splitlines()
+        assert "# TYPE profi_dcp_frames_sent_total counter" in lines
+        assert 'profi_dcp_frames_sent_total{interface="eth\\"0"} 3' in lines
+        assert 'profi_dcp_frames_rejected_total{interface="eth\\"0",reason="wrong_xid"} 1' in lines
+        assert "# TYPE profi_dcp_request_latency_seconds histogram" in lines
+        assert 'profi_dcp_request_latency_seconds_bucket{interface="eth\\"0",operation="identify",le="0.5"} 1' in lines
+        assert 'profi_dcp_request_latency_seconds_bucket{interface="eth\\"0",operation="identify",le="+Inf"} 1' in lines
+        assert 'profi_dcp_request_latency_seconds_count{interface="eth\\"0",operation="identify"} 1' in lines
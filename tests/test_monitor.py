@@ -0,0 +1,73 @@
+import sys
+import time
+
+import pytest
+
+import profi_dcp.dcp_constants as dcp_constants
+from profi_dcp.dcp_constants import FrameID, ServiceID, ServiceType
+from profi_dcp.simulation import DCP_FRAME_HEADER, SimulatedFleet
+
+
+def identify_response(device, xid):
+    """
+    Build the identify response of a simulated device to a request of another host.
+    """
+    blocks = device.identify_blocks()
+    header = DCP_FRAME_HEADER.pack(
+        bytes.fromhex("020000aaaaaa"),
+        device.mac_bytes,
+        dcp_constants.ETHER_TYPE,
+        FrameID.IDENTIFY_RESPONSE,
+        ServiceID.IDENTIFY,
+        ServiceType.RESPONSE,
+        xid,
+        0,
+        len(blocks),
+    )
+    return header + blocks
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+class TestDCPMonitor:
+    """Test passive monitoring with a fanout group of worker processes on the loopback interface."""
+
+    @pytest.mark.parametrize("mode", ["FANOUT_HASH", "FANOUT_LB"])
+    def test_monitor(self, mode):
+        """
+        Test monitoring identify responses sent to another host.
+        Expected results: every device is reported once per response, frames that are no responses are only counted.
+        """
+        from profi_dcp.l2socket.l2socket import L2LinuxSocket
+        from profi_dcp.monitor import DCPMonitor
+
+        fleet = SimulatedFleet.generate(20, seed=1)
+        sender = L2LinuxSocket("lo", protocol=dcp_constants.ETHER_TYPE)
+        monitor = DCPMonitor("lo", workers=2, mode=getattr(DCPMonitor, mode))
+        try:
+            with monitor:
+                sender.send_batch(identify_response(device, 1) for device in fleet)
+                # a truncated response is received but not reported
+                sender.send(identify_response(fleet.devices[bytes.fromhex("020000000001")], 2)[:30])
+                devices = [monitor.get(timeout=2) for _ in fleet]
+                time.sleep(0.2)
+        finally:
+            sender.close()
+
+        assert sorted(device.MAC for device in devices) == sorted(device.MAC for device in fleet)
+        device = next(device for device in devices if device.MAC == "02:00:00:00:00:07")
+        assert device.name_of_station == "device-7"
+        assert device.IP == "10.0.0.7"
+        assert device.timestamp is not None
+        assert monitor.responses == 20
+        assert monitor.frames_received == 21
+        assert monitor.get(timeout=0.1) is None
+
+    def test_unknown_interface(self):
+        """
+        Test monitoring a network interface that does not exist.
+        Expected results: OSError.
+        """
+        from profi_dcp.monitor import DCPMonitor
+
+        with pytest.raises(OSError):
+            DCPMonitor("does-not-exist", workers=1).start()
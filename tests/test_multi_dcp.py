@@ -0,0 +1,128 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from profi_dcp.interfaces import InterfaceResolver, NetworkInterface
+from profi_dcp.inventory import Inventory
+from profi_dcp.multi_dcp import MultiDCP
+from profi_dcp.profi_dcp import Device
+
+
+def create_instance(ip):
+    """
+    Create a mocked DCP instance which identifies one device after a short delay.
+    """
+    instance = MagicMock()
+    instance.network_interface = f"if-{ip}"
+
+    def identify_all(*args):
+        time.sleep(0.3)
+        device = Device()
+        device.MAC = f"02:00:00:00:00:{ip.split('.')[2]}{ip.split('.')[3]}"
+        shared = Device()
+        shared.MAC = "02:00:00:00:00:ff"
+        inventory = Inventory([device, shared, shared], drops=int(ip.split('.')[2]))
+        return inventory
+    instance.identify_all.side_effect = identify_all
+    return instance
+
+
+class TestMultiDCP:
+    """
+    Test DCP on multiple network interfaces.
+    """
+
+    @patch('profi_dcp.multi_dcp.DCP', side_effect=lambda ip, share_socket: create_instance(ip))
+    def test_identify_all_concurrent(self, dcp):
+        """
+        Identify all runs on all interfaces concurrently and tags the devices with their interface.
+        """
+        multi_dcp = MultiDCP(['10.0.1.1', '10.0.2.1', '10.0.3.1', '10.0.4.1'])
+
+        start = time.time()
+        devices = multi_dcp.identify_all()
+        duration = time.time() - start
+
+        assert duration < 0.9
+        assert isinstance(devices, Inventory)
+        assert [device.MAC for device in devices] == ['02:00:00:00:00:11', '02:00:00:00:00:ff', '02:00:00:00:00:21',
+                                                      '02:00:00:00:00:31', '02:00:00:00:00:41']
+        # the device found on all interfaces keeps the interface of the first response and knows all interfaces
+        assert [device.interface for device in devices] == ['if-10.0.1.1', 'if-10.0.1.1', 'if-10.0.2.1',
+                                                            'if-10.0.3.1', 'if-10.0.4.1']
+        assert devices.by_mac['02:00:00:00:00:ff'].interfaces == {'if-10.0.1.1', 'if-10.0.2.1', 'if-10.0.3.1',
+                                                                  'if-10.0.4.1'}
+        assert devices.by_mac['02:00:00:00:00:21'].interfaces == {'if-10.0.2.1'}
+        # one duplicate per interface and three merged across the interfaces
+        assert devices.duplicates == 7
+        assert devices.drops == 1 + 2 + 3 + 4
+
+        multi_dcp.close()
+        for instance in multi_dcp.instances:
+            instance.close.assert_called_once()
+
+    @patch('profi_dcp.multi_dcp.DCP')
+    def test_conflict_policy(self, dcp):
+        """
+        The conflict policy is passed to the DCP instances and used to merge the devices of all interfaces.
+        """
+        def create(ip, share_socket):
+            instance = MagicMock()
+            instance.network_interface = f"if-{ip}"
+            device = Device()
+            device.MAC = "02:00:00:00:00:01"
+            device.name_of_station = ip
+            instance.identify_all.return_value = Inventory([device])
+            return instance
+        dcp.side_effect = create
+
+        multi_dcp = MultiDCP(['10.0.1.1', '10.0.2.1'], conflict_policy=Inventory.KEEP_FIRST)
+        assert [instance.conflict_policy for instance in multi_dcp.instances] == [Inventory.KEEP_FIRST] * 2
+
+        devices = multi_dcp.identify_all()
+        assert devices.conflict_policy == Inventory.KEEP_FIRST
+        assert [device.name_of_station for device in devices] == ['10.0.1.1']
+        assert devices[0].interfaces == {'if-10.0.1.1', 'if-10.0.2.1'}
+        assert len(devices.conflicts) == 1
+
+        # with KEEP_NEWEST, the kept device of the second interface still knows both interfaces
+        multi_dcp = MultiDCP(['10.0.1.1', '10.0.2.1'])
+        devices = multi_dcp.identify_all()
+        assert [(device.name_of_station, device.interface) for device in devices] == [('10.0.2.1', 'if-10.0.2.1')]
+        assert devices[0].interfaces == {'if-10.0.1.1', 'if-10.0.2.1'}
+
+    def test_open_failure_closes_instances(self):
+        """
+        If a DCP instance cannot be opened, the instances already opened are closed.
+        """
+        opened = []
+
+        def open_instance(ip, share_socket):
+            if ip == '10.0.3.1':
+                raise ValueError(f"No interface with ip {ip}")
+            opened.append(create_instance(ip))
+            return opened[-1]
+
+        with patch('profi_dcp.multi_dcp.DCP', side_effect=open_instance):
+            with pytest.raises(ValueError):
+                MultiDCP(['10.0.1.1', '10.0.2.1', '10.0.3.1', '10.0.4.1'])
+
+        assert len(opened) == 2
+        for instance in opened:
+            instance.close.assert_called_once()
+
+    @patch('profi_dcp.interfaces.default_resolver')
+    def test_all_interface_ips(self, default_resolver):
+        """
+        By default, all interfaces which are up and have an IPv4 and a mac address are used, except loopback.
+        """
+        default_resolver.return_value = InterfaceResolver(lambda: [
+            NetworkInterface('lo', '00:00:00:00:00:00', [('127.0.0.1', '255.0.0.0')], ['::1'], True),
+            NetworkInterface('eth0', '02:00:00:00:00:10', [('10.0.1.1', None)], [], True),
+            NetworkInterface('eth1', '02:00:00:00:00:11', [('10.0.2.1', None), ('10.0.2.2', None)], [], True),
+            NetworkInterface('eth2', '02:00:00:00:00:12', [('10.0.3.1', None)], [], False),
+            NetworkInterface('eth3', '02:00:00:00:00:13', [], ['fd00::3'], True),
+            NetworkInterface('tun0', None, [('10.0.4.1', None)], [], True),
+        ], watch_changes=False)
+
+        assert MultiDCP.all_interface_ips() == ['10.0.1.1', '10.0.2.1']
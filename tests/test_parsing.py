@@ -0,0 +1,144 @@
+import random
+import struct
+
+from profi_dcp import parsing
+from profi_dcp.clock import VirtualClock
+from profi_dcp.dcp_constants import Option
+from profi_dcp.profi_dcp import DCP, Device
+from profi_dcp.simulation import DCP_FRAME_HEADER, SimulatedDevice, SimulatedFleet, control_block, dcp_block
+
+HOST_MAC = bytes.fromhex("02000000ff01")
+XID = 0x12345678
+
+
+def response(blocks, xid=XID, service_type=1, length=None):
+    """
+    Build an identify response frame with the given blocks to the host.
+    """
+    length = len(blocks) if length is None else length
+    header = DCP_FRAME_HEADER.pack(HOST_MAC, bytes.fromhex("020000000001"), 0x8892, 0xFEFF, 5, service_type, xid, 0,
+                                   length)
+    return header + blocks
+
+
+def identify_response():
+    """
+    Build a complete identify response of a simulated device.
+    """
+    device = SimulatedDevice("02:00:00:00:00:01", name_of_station="device-1", ip="10.0.0.1", netmask="255.0.0.0",
+                             gateway="10.0.0.254", family="Simulated", vendor_id=0x2A, device_id=1)
+    return response(device.identify_blocks())
+
+
+class TestCheckResponse:
+    """
+    Test the validation of the header of received frames.
+    """
+
+    def test_valid(self):
+        """
+        A response to the request is valid.
+        """
+        assert parsing.check_response(identify_response(), HOST_MAC, XID) is None
+
+    def test_rejected(self):
+        """
+        Each invalid header field is reported with its reason.
+        """
+        frame = identify_response()
+        assert parsing.check_response(frame, bytes(6), XID) == "wrong_mac"
+        assert parsing.check_response(frame[:12] + b"\x08\x00" + frame[14:], HOST_MAC, XID) == "wrong_ether_type"
+        assert parsing.check_response(response(b"", service_type=0), HOST_MAC, XID) == "wrong_service_type"
+        assert parsing.check_response(frame, HOST_MAC, XID + 1) == "wrong_xid"
+        assert parsing.check_response(frame[:20], HOST_MAC, XID) == "malformed"
+        assert parsing.check_response(frame[:-1], HOST_MAC, XID) == "malformed"
+
+
+class TestParseBlocks:
+    """
+    Test splitting the DCP data into blocks and decoding them.
+    """
+
+    def test_identify(self):
+        """
+        All blocks of an identify response are decoded into the device.
+        """
+        blocks = parsing.parse_blocks(identify_response())
+        device = Device()
+        assert parsing.decode_device(blocks, device)
+        assert (device.name_of_station, device.IP, device.netmask, device.gateway, device.family) == (
+            "device-1", "10.0.0.1", "255.0.0.0", "10.0.0.254", "Simulated")
+
+    def test_response_code(self):
+        """
+        The response code is extracted from the control block of a set response.
+        """
+        blocks = parsing.parse_blocks(response(control_block(Option.NAME_OF_STATION, 3)))
+        assert parsing.decode_response_code(blocks) == 3
+
+    def test_block_past_payload(self):
+        """
+        Blocks whose length points past the DCP data are malformed.
+        """
+        block = struct.pack(">BBHH", 2, 2, 40, 0) + b"short"
+        assert parsing.parse_blocks(response(block)) is None
+        assert parsing.parse_blocks(response(identify_response()[26:], length=30)) is None
+
+    def test_short_ip_block(self):
+        """
+        IP blocks with less than 12 bytes of data are malformed.
+        """
+        blocks = parsing.parse_blocks(response(dcp_block(Option.IP_ADDRESS, bytes(8))))
+        assert not parsing.decode_device(blocks, Device())
+
+    def test_invalid_name(self):
+        """
+        Invalid characters in names do not make the response malformed.
+        """
+        blocks = parsing.parse_blocks(response(dcp_block(Option.NAME_OF_STATION, b"name\xff")))
+        device = Device()
+        assert parsing.decode_device(blocks, device)
+        assert device.name_of_station.startswith("name")
+
+    def test_fuzz(self):
+        """
+        Truncated and randomly corrupted frames never raise.
+        """
+        frame = identify_response()
+        generator = random.Random(1)
+        candidates = [frame[:length] for length in range(len(frame))]
+        for _ in range(2000):
+            corrupted = bytearray(frame)
+            for _ in range(generator.randint(1, 4)):
+                corrupted[generator.randrange(14, len(frame))] = generator.randrange(256)
+            candidates.append(bytes(corrupted))
+
+        for candidate in candidates:
+            if parsing.check_response(candidate, HOST_MAC, XID) is None:
+                blocks = parsing.parse_blocks(candidate)
+                if blocks is not None:
+                    parsing.decode_device(blocks, Device())
+                    parsing.decode_response_code(blocks)
+
+
+class TestMalformedResponses:
+    """
+    Test that malformed responses do not abort a scan.
+    """
+
+    def test_scan_continues(self):
+        """
+        Malformed responses are counted and skipped, all valid responses are still received.
+        """
+        fleet = SimulatedFleet.generate(10, seed=1)
+        socket = fleet.connect(recv_timeout=0.05, clock=VirtualClock())
+        dcp = DCP(transport=socket)
+        xid = dcp._DCP__xid + 1
+        truncated = response(struct.pack(">BBHH", 2, 2, 100, 0), xid=xid)
+        broken_length = response(bytes(10), xid=xid, length=500)
+        socket.deliver_many([(0.001, truncated), (0.002, broken_length)])
+
+        devices = dcp.identify_all(timeout=0.2, response_delay=1)
+        assert len(devices) == 10
+        assert dcp.metrics.parse_errors == 2
+        assert dcp.metrics.frames_rejected["malformed"] == 2
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from profi_dcp.clock import VirtualClock
+from profi_dcp.l2socket import CaptureReader, PcapFileSocket, PcapngWriter
+from profi_dcp.profi_dcp import DCP
+from profi_dcp.simulation import SimulatedFleet
+
+
+@pytest.fixture(scope='function')
+def session(tmp_path):
+    """
+    Provides a pcapng file recording an identify_all of a DCP instance on a fleet of 20 simulated devices, with the
+    devices of the fleet.
+    """
+    path = tmp_path / "session.pcapng"
+    fleet = SimulatedFleet.generate(20, seed=1)
+    with PcapngWriter(path) as writer:
+        dcp = DCP(transport=fleet.connect(recv_timeout=0.05, clock=VirtualClock(1700000000)), capture=writer)
+        dcp.identify_all(timeout=0.5, response_delay=20)
+    return path, fleet
+
+
+class TestPcapngWriter:
+    """
+    Test writing frames to pcapng files.
+    """
+
+    def test_write(self, tmp_path):
+        """
+        The written frames are read back with their timestamps.
+        """
+        path = tmp_path / "frames.pcapng"
+        frames = [(1700000000.123456789, bytes(range(60))), (1700000001.5, bytes(61)), (1700000002.0, b"\xff" * 62)]
+        with PcapngWriter(path) as writer:
+            for index, (timestamp, frame) in enumerate(frames):
+                writer.write(frame, timestamp, index % 3)
+
+        with CaptureReader(path) as reader:
+            records = list(reader.records())
+        assert [record.data for record in records] == [frame for _, frame in frames]
+        assert [record.timestamp for record in records] == pytest.approx([timestamp for timestamp, _ in frames])
+        assert writer.frames_written == 3
+
+    @pytest.mark.skipif(not os.path.exists("/dev/full"), reason="/dev/full not available")
+    def test_write_error(self):
+        """
+        If writing fails, the error is recorded, further frames are discarded and the file is closed.
+        """
+        writer = PcapngWriter("/dev/full", buffer_size=64)
+        writer.write(bytes(100), 1700000000.0)
+        writer.close()
+
+        assert isinstance(writer.error, OSError)
+        assert writer.frames_written == 0
+        writer.write(bytes(100), 1700000001.0)
+        writer.close()
+
+    def test_capture(self, session):
+        """
+        DCP writes the request and all responses to the capture.
+        """
+        path, fleet = session
+        with CaptureReader(path) as reader:
+            records = list(reader.records())
+
+        assert len(records) == 21
+        assert records[0].data[:6] == bytes.fromhex("010ecf000000")
+        assert records[0].timestamp == pytest.approx(1700000000)
+        assert all(1700000000 <= record.timestamp <= 1700000000.5 for record in records)
+
+
+class TestPcapFileSocket:
+    """
+    Test replaying capture files.
+    """
+
+    def test_replay(self, session):
+        """
+        A new DCP instance finds the devices of a recorded session, the responses are adapted to its request.
+        """
+        path, fleet = session
+        socket = PcapFileSocket(path, recv_timeout=0.05, clock=VirtualClock())
+        dcp = DCP(transport=socket)
+        assert dcp.src_mac == "02:00:00:00:ff:01"
+
+        devices = dcp.identify_all(timeout=0.2)
+        assert sorted(devices.by_mac) == sorted(device.MAC for device in fleet)
+        assert socket.metrics.frames_received == 21
+        socket.close()
+
+    def test_realtime(self, session):
+        """
+        With realtime, the frames are received with the timing of the capture.
+        """
+        path, fleet = session
+        clock = VirtualClock(100)
+        socket = PcapFileSocket(path, recv_timeout=0.05, realtime=True, rewrite_responses=False, clock=clock)
+        with CaptureReader(path) as reader:
+            offsets = [record.timestamp - 1700000000 for record in reader.records()]
+
+        received = []
+        frame = socket.recv()
+        while frame is not None or clock.time() < 101:
+            if frame is not None:
+                received.append(frame.timestamp - 100)
+            frame = socket.recv()
+        socket.close()
+
+        assert received == pytest.approx(offsets, abs=1e-6)
+        assert max(offsets) > 0.05
@@ -0,0 +1,125 @@
+import itertools
+import pytest
+from profi_dcp.dcp_constants import MAX_RESPONSE_DELAY, RESPONSE_DELAY
+from profi_dcp.response_delay import ResponseDelayTuner
+
+
+class TestResponseDelayTuner:
+    """
+    Test the automatic choice of the response delay factor.
+    """
+
+    def test_initial_response_delay(self):
+        """
+        Without previous scans, the default response delay is used.
+        """
+        tuner = ResponseDelayTuner()
+        assert tuner.response_delay == RESPONSE_DELAY
+        assert tuner.timeout() == pytest.approx(RESPONSE_DELAY * 0.01 + tuner.margin)
+
+    @pytest.mark.parametrize("device_count, factor", [(0, 1), (3, 1), (4, 1), (5, 2), (1000, 250)])
+    def test_smallest_factor_without_loss(self, device_count, factor):
+        """
+        Without lost responses, the smallest factor spreading all responses is chosen.
+        """
+        tuner = ResponseDelayTuner(responses_per_unit=4)
+        assert tuner.update(device_count) == factor
+
+    def test_duplicates_count_as_frames(self):
+        """
+        Duplicate responses increase the number of frames to spread.
+        """
+        tuner = ResponseDelayTuner(responses_per_unit=4)
+        assert tuner.update(4, duplicates=4) == 2
+
+    def test_missing_devices_double_factor(self):
+        """
+        Fewer devices than in the previous scan double the factor as long as the doubled factor finds more devices.
+        """
+        tuner = ResponseDelayTuner(responses_per_unit=4)
+        tuner.update(40)
+        assert tuner.update(30) == 20
+        # the expected number of devices is kept while more devices are found
+        assert tuner.update(35) == 40
+        assert tuner.update(40) == 10
+
+    def test_missing_devices_not_found_again(self):
+        """
+        If the doubled factor finds no more devices, the new number of devices is expected.
+        """
+        tuner = ResponseDelayTuner(responses_per_unit=4)
+        tuner.update(40)
+        assert tuner.update(30) == 20
+        assert tuner.update(35) == 40
+        assert tuner.update(35) == 9
+        assert tuner.expected_devices == 35
+
+    def test_removed_device(self):
+        """
+        A device removed from the network only doubles the factor for a single scan.
+        """
+        tuner = ResponseDelayTuner(responses_per_unit=4)
+        tuner.update(40)
+        assert tuner.update(39) == 20
+        assert [tuner.update(39) for _ in range(5)] == [10] * 5
+
+    def test_missing_devices_with_duplicates(self):
+        """
+        Missing devices together with duplicate responses indicate lost responses.
+        """
+        tuner = ResponseDelayTuner(responses_per_unit=4)
+        tuner.update(40)
+        assert tuner.update(30, duplicates=2) == 20
+        assert tuner.update(30, duplicates=2) == 40
+
+    def test_drops_double_factor(self):
+        """
+        Dropped frames indicate lost responses and double the factor.
+        """
+        tuner = ResponseDelayTuner(responses_per_unit=4)
+        tuner.update(40)
+        assert tuner.update(40, drops=1) == 20
+
+    def test_factor_limited(self):
+        """
+        The factor never exceeds the maximum allowed by the DCP specification.
+        """
+        tuner = ResponseDelayTuner(initial_response_delay=MAX_RESPONSE_DELAY)
+        assert tuner.update(0, drops=1) == MAX_RESPONSE_DELAY
+
+
+class TestIdentifyAllResponseDelay:
+    """
+    Test the response delay parameters of identify_all.
+    """
+
+    def test_response_delay_parameter(self, instance_dcp):
+        """
+        The response delay given to identify_all is sent with the request.
+        """
+        instance_dcp, socket = instance_dcp
+        socket().recv.return_value = None
+
+        instance_dcp.identify_all(timeout=0.1, response_delay=0x0010)
+
+        raw_packet = socket().send.call_args.args[0]
+        assert raw_packet[22:24] == b'\x00\x10', "Response delay wrong"
+
+    def test_auto_tune(self, mock_return, instance_dcp):
+        """
+        With auto_tune, the response delay of the next scan is chosen from the results of the previous one.
+        """
+        instance_dcp, socket = instance_dcp
+        instance_dcp.response_delay_tuner.margin = 0.1
+        valid_responses = mock_return.identify_response(
+            'IDENTIFY_ALL', xid=instance_dcp._DCP__xid + 1)
+        socket().recv.side_effect = itertools.chain(valid_responses, itertools.cycle([None]))
+
+        devices = instance_dcp.identify_all(auto_tune=True)
+        first_request = socket().send.call_args.args[0]
+        instance_dcp.identify_all(auto_tune=True)
+        second_request = socket().send.call_args.args[0]
+
+        assert len(devices) == len(mock_return.dst)
+        assert int.from_bytes(first_request[22:24], 'big') == RESPONSE_DELAY
+        assert int.from_bytes(second_request[22:24], 'big') == 2
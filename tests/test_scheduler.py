@@ -0,0 +1,198 @@
+import threading
+import time
+
+import pytest
+
+from profi_dcp.clock import VirtualClock
+from profi_dcp.l2socket.transport import L2Transport
+from profi_dcp.profi_dcp import DCP
+from profi_dcp.scheduler import PRUNE_SIZE, TransmitScheduler
+from profi_dcp.simulation import SimulatedFleet
+
+
+class RecordingTransport(L2Transport):
+    """
+    A transport recording the sent frames with the time they were sent.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append((self.clock.time(), data))
+
+
+def frame(destination, payload=b""):
+    """
+    Create a frame to the given destination (as hex string).
+    """
+    return bytes.fromhex(destination) + bytes(6) + payload
+
+
+class TestTransmitScheduler:
+    """
+    Test the rate limiting and prioritization of the transmit scheduler.
+    """
+
+    def test_rate_and_burst(self):
+        """
+        After the burst, frames are sent with the given rate.
+        """
+        clock = VirtualClock()
+        transport = RecordingTransport(clock)
+        scheduler = TransmitScheduler(rate=100, burst=5, clock=clock)
+
+        for index in range(15):
+            scheduler.send(transport, frame(f"0200000000{index:02x}"))
+
+        times = [sent for sent, _ in transport.sent]
+        assert times[:5] == [0] * 5
+        assert times[-1] == pytest.approx(0.1)
+        assert scheduler.frames_sent == 15
+        assert scheduler.frames_delayed == 10
+
+    def test_no_limit(self):
+        """
+        Without rate and pacing, frames are sent immediately.
+        """
+        clock = VirtualClock()
+        transport = RecordingTransport(clock)
+        scheduler = TransmitScheduler(clock=clock)
+        for _ in range(10):
+            scheduler.send(transport, frame("020000000001"))
+        assert clock.time() == 0
+        assert scheduler.frames_delayed == 0
+
+    def test_destination_pacing(self):
+        """
+        Frames to the same destination are sent at least destination_interval apart, other destinations are not delayed.
+        """
+        clock = VirtualClock()
+        transport = RecordingTransport(clock)
+        scheduler = TransmitScheduler(destination_interval=0.5, clock=clock)
+
+        scheduler.send(transport, frame("020000000001"))
+        scheduler.send(transport, frame("020000000002"))
+        scheduler.send(transport, frame("020000000001"))
+
+        assert [sent for sent, _ in transport.sent] == [0, 0, pytest.approx(0.5)]
+
+    def test_destination_pacing_pruned(self):
+        """
+        The pacing state only keeps the destinations sent to within the last destination_interval.
+        """
+        clock = VirtualClock()
+        transport = RecordingTransport(clock)
+        scheduler = TransmitScheduler(destination_interval=0.5, clock=clock)
+
+        for index in range(10000):
+            scheduler.send(transport, frame(f"02000000{index:04x}"))
+            clock.advance(0.01)
+
+        # at most the destinations of the last 0.5s (50 frames) are kept after pruning, at most PRUNE_SIZE before
+        assert len(scheduler._TransmitScheduler__next_send) <= PRUNE_SIZE
+        # the pacing still applies to recent destinations
+        scheduler.send(transport, frame("020000002710"))
+        scheduler.send(transport, frame("020000002710"))
+        assert transport.sent[-1][0] - transport.sent[-2][0] == pytest.approx(0.5)
+
+    def test_priority(self):
+        """
+        Waiting interactive frames are sent before waiting bulk frames.
+        """
+        transport = RecordingTransport(VirtualClock())
+        scheduler = TransmitScheduler(rate=20, burst=1)
+        scheduler.send(transport, frame("020000000000"))
+
+        def send(destination, priority):
+            scheduler.send(transport, frame(destination), priority)
+
+        bulk = [
+            threading.Thread(target=send, args=(f"0200000000b{index}", TransmitScheduler.BULK)) for index in range(3)
+        ]
+        for thread in bulk:
+            thread.start()
+        time.sleep(0.01)
+        interactive = threading.Thread(target=send, args=("0200000000a0", TransmitScheduler.INTERACTIVE))
+        interactive.start()
+        for thread in bulk + [interactive]:
+            thread.join()
+
+        # the bulk frames wait for tokens, the interactive frame is sent as soon as the next token is available
+        destinations = [data[:6].hex() for _, data in transport.sent]
+        assert destinations[:2] == ["020000000000", "0200000000a0"]
+        assert sorted(destinations[2:]) == ["0200000000b0", "0200000000b1", "0200000000b2"]
+
+    def test_priorities_same_destination(self):
+        """
+        Interactive and bulk frames to the same destination with a pacing interval are all sent, no sender waits for
+        a frame of another sender that is never sent.
+        """
+        transport = RecordingTransport(VirtualClock())
+        scheduler = TransmitScheduler(destination_interval=0.005)
+
+        def send(destination, priority):
+            for _ in range(5):
+                scheduler.send(transport, frame(destination), priority)
+
+        threads = [
+            threading.Thread(target=send, args=("020000000001", TransmitScheduler.INTERACTIVE)),
+            threading.Thread(target=send, args=("020000000001", TransmitScheduler.BULK)),
+            threading.Thread(target=send, args=("020000000002", TransmitScheduler.BULK)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        assert not any(thread.is_alive() for thread in threads)
+        assert scheduler.frames_sent == 15
+        assert len(transport.sent) == 15
+
+    def test_send_outside_lock(self):
+        """
+        A blocking transport does not stall the frames of other senders.
+        """
+        release = threading.Event()
+        sent = []
+
+        class BlockingTransport(L2Transport):
+            def send(self, data):
+                if data[:6] == bytes.fromhex("020000000001"):
+                    release.wait(5)
+                sent.append(data[:6].hex())
+
+        scheduler = TransmitScheduler()
+        blocked = threading.Thread(target=scheduler.send, args=(BlockingTransport(), frame("020000000001")))
+        blocked.start()
+        time.sleep(0.01)
+        scheduler.send(BlockingTransport(), frame("020000000002"))
+        release.set()
+        blocked.join(5)
+
+        assert sent == ["020000000002", "020000000001"]
+
+    def test_invalid_parameters(self):
+        """
+        Rate and burst must be positive.
+        """
+        with pytest.raises(ValueError):
+            TransmitScheduler(rate=0)
+        with pytest.raises(ValueError):
+            TransmitScheduler(burst=0)
+
+    def test_dcp(self):
+        """
+        DCP sends its requests through the scheduler.
+        """
+        clock = VirtualClock()
+        fleet = SimulatedFleet.generate(5, seed=1)
+        scheduler = TransmitScheduler(rate=10, burst=1, clock=clock)
+        dcp = DCP(transport=fleet.connect(recv_timeout=0.05, clock=clock), scheduler=scheduler)
+        dcp.transmit_priority = TransmitScheduler.BULK
+
+        for device in fleet:
+            assert dcp.get_name_of_station(device.MAC) == device.name_of_station
+        assert scheduler.frames_sent == 5
+        assert clock.time() >= 0.4
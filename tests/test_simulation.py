@@ -0,0 +1,279 @@
+import time
+import pytest
+
+from profi_dcp.clock import VirtualClock
+from profi_dcp.error import DcpTimeoutError
+from profi_dcp.inventory import Inventory
+from profi_dcp.l2socket.transport import PacketStatistics
+from profi_dcp.l2socket.memory import L2MemorySocket, MemoryNetwork
+from profi_dcp.profi_dcp import DCP, SweepPartition
+from profi_dcp.simulation import SimulatedDevice, SimulatedFleet
+
+
+@pytest.fixture(scope='function')
+def fleet():
+    """
+    Provides a fleet of 50 simulated devices without delay.
+    """
+    return SimulatedFleet.generate(50, seed=1)
+
+
+@pytest.fixture(scope='function')
+def dcp(fleet):
+    """
+    Provides a DCP instance connected to the simulated fleet, running on a virtual clock.
+    """
+    instance = DCP(transport=fleet.connect(recv_timeout=0.05, clock=VirtualClock()))
+    instance.default_timeout = 0.5
+    yield instance
+    instance.close()
+
+
+class TestMemorySocket:
+    """
+    Test the in-memory L2 transport.
+    """
+
+    def test_unicast_and_multicast(self):
+        """
+        Frames are only delivered to the addressed socket, multicast frames to all other sockets.
+        """
+        network = MemoryNetwork()
+        sockets = [L2MemorySocket(f"02:00:00:00:00:0{i}", network, recv_timeout=0.01) for i in range(3)]
+
+        unicast = bytes.fromhex("020000000001") + bytes(58)
+        multicast = bytes.fromhex("010ecf000000") + bytes(58)
+        sockets[0].send(unicast)
+        sockets[0].send(multicast)
+
+        assert sockets[0].recv() is None
+        assert sockets[1].recv() == unicast
+        assert sockets[1].recv() == multicast
+        assert sockets[2].recv() == multicast
+        assert sockets[2].recv() is None
+
+    def test_delayed_delivery(self):
+        """
+        Delayed frames are received in order of their delivery time once they are due.
+        """
+        socket = L2MemorySocket("02:00:00:00:00:01", recv_timeout=0.5)
+        socket.deliver_many([(0.2, b"late"), (0.1, b"early")])
+
+        start = time.time()
+        assert socket.recv() == b"early"
+        assert time.time() - start >= 0.09
+        assert socket.recv() == b"late"
+        assert time.time() - start >= 0.19
+
+
+class TestSimulatedFleet:
+    """
+    Test DCP against a fleet of simulated devices.
+    """
+
+    def test_identify_all(self, fleet, dcp):
+        """
+        All devices of the fleet respond to identify_all.
+        """
+        devices = dcp.identify_all(timeout=0.2, response_delay=1)
+
+        assert sorted(device.MAC for device in devices) == sorted(device.MAC for device in fleet)
+        device = next(device for device in devices if device.MAC == "02:00:00:00:00:07")
+        assert device.name_of_station == "device-7"
+        assert device.IP == "10.0.0.7"
+        assert device.family == "Simulated"
+
+    def test_identify_filtered(self, dcp):
+        """
+        Only the devices matching the filter respond to a filtered identify request.
+        """
+        partitions = [SweepPartition.by_name_of_station("device-3", response_delay=1)]
+        devices = dcp.identify_sweep(partitions, timeout=0.2)
+        assert [device.MAC for device in devices] == ["02:00:00:00:00:03"]
+
+    def test_identify(self, dcp):
+        """
+        A single device responds to a unicast identify request.
+        """
+        assert dcp.identify("02:00:00:00:00:05").name_of_station == "device-5"
+
+    def test_identify_many(self, fleet, dcp):
+        """
+        The devices of a batch of unicast identify requests respond to the shared XID, unknown devices are missing.
+        """
+        macs = ["02:00:00:00:00:01", "02:00:00:00:00:02", "02:00:00:00:00:03", "02:00:00:00:ff:ff"]
+        start = dcp.clock.time()
+        devices = dcp.identify_many(macs, timeout=0.2)
+
+        assert list(devices.by_mac) == macs[:3]
+        assert devices.by_mac["02:00:00:00:00:02"].name_of_station == "device-2"
+        assert dcp.metrics.frames_sent == 4
+        assert dcp.metrics.timeouts == 1
+        assert dcp.clock.time() - start >= 0.2
+
+    def test_get_set(self, fleet, dcp):
+        """
+        Set requests change the parameters of the device, get requests return them.
+        """
+        mac = "02:00:00:00:00:02"
+        assert dcp.set_name_of_station(mac, "new-name")
+        assert dcp.set_ip_address(mac, ["192.168.0.2", "255.255.255.0", "192.168.0.1"])
+
+        assert dcp.get_name_of_station(mac) == "new-name"
+        assert dcp.get_ip_address(mac) == "192.168.0.2"
+        assert fleet.devices[bytes.fromhex("020000000002")].gateway == "192.168.0.1"
+
+    def test_blink_and_reset(self, fleet, dcp):
+        """
+        Blink requests are counted by the device, reset requests restore the factory settings.
+        """
+        mac = "02:00:00:00:00:04"
+        device = fleet.devices[bytes.fromhex("020000000004")]
+
+        assert dcp.blink(mac)
+        assert device.blink_count == 1
+
+        dcp.set_name_of_station(mac, "changed")
+        assert dcp.reset_to_factory(mac)
+        assert device.name_of_station == "device-4"
+
+    def test_unknown_device(self, dcp):
+        """
+        Requests to devices not in the fleet time out.
+        """
+        with pytest.raises(DcpTimeoutError):
+            dcp.get_ip_address("02:00:00:00:ff:ff")
+
+    def test_response_delay(self, dcp):
+        """
+        Responses are spread over the response delay window of the request.
+        """
+        start = dcp.clock.time()
+        responses = dcp.identify_all(timeout=0.05, response_delay=100)
+        assert dcp.clock.time() - start < 0.5
+        assert 0 < len(responses) < 50
+
+    def test_loss(self):
+        """
+        With loss, some responses are lost.
+        """
+        fleet = SimulatedFleet.generate(200, loss=0.5, seed=2)
+        dcp = DCP(transport=fleet.connect(clock=VirtualClock()))
+        devices = dcp.identify_all(timeout=0.2, response_delay=1)
+        assert 50 < len(devices) < 150
+
+    def test_delay_and_jitter(self):
+        """
+        Responses arrive after the delay, within the jitter.
+        """
+        device = SimulatedDevice("02:00:00:00:00:01", name_of_station="device-1")
+        fleet = SimulatedFleet([device], delay=0.2, jitter=0.05, seed=3)
+        dcp = DCP(transport=fleet.connect(recv_timeout=0.05))
+
+        start = time.time()
+        assert dcp.get_name_of_station(device.MAC) == "device-1"
+        assert 0.14 < time.time() - start < 0.5
+
+    def test_drops(self, fleet):
+        """
+        The frames dropped by the socket during a scan are reported on the inventory and fed to the tuner, the
+        receive queue is reserved for the expected devices.
+        """
+
+        class DroppingSocket(L2MemorySocket):
+            reserved = None
+            drops = 0
+
+            def statistics(self):
+                self.drops += 3
+                return PacketStatistics(0, self.drops)
+
+            def reserve_frames(self, frame_count):
+                self.reserved = frame_count
+
+        socket = DroppingSocket("02:00:00:00:ff:01", fleet.network, recv_timeout=0.05, clock=VirtualClock())
+        dcp = DCP(transport=socket)
+        dcp.response_delay_tuner.expected_devices = 50
+        response_delay = dcp.response_delay_tuner.response_delay
+
+        devices = dcp.identify_all(timeout=0.2, auto_tune=True)
+        assert isinstance(devices, Inventory)
+        assert devices.drops == 3
+        assert socket.reserved == 50
+        # the tuner doubles the response delay on drops
+        assert dcp.response_delay_tuner.response_delay == 2 * response_delay
+
+    def test_no_statistics(self, dcp):
+        """
+        Transports without statistics report no drops.
+        """
+        assert dcp.identify_all(timeout=0.2, response_delay=1).drops is None
+
+    def test_missing_ip_and_transport(self):
+        """
+        DCP requires an ip address or a transport.
+        """
+        with pytest.raises(ValueError):
+            DCP()
+
+
+class TestVirtualClock:
+    """
+    Test running DCP and the simulated fleet on a virtual clock.
+    """
+
+    def test_timeouts_do_not_wait(self):
+        """
+        The full timeout of identify_all and of unanswered requests expires without waiting in real time.
+        """
+        clock = VirtualClock()
+        fleet = SimulatedFleet.generate(100, delay=0.5, jitter=0.2, seed=4)
+        dcp = DCP(transport=fleet.connect(clock=clock))
+
+        start = time.time()
+        devices = dcp.identify_all()
+        for _ in range(100):
+            with pytest.raises(DcpTimeoutError):
+                dcp.get_ip_address("02:00:00:00:ff:ff")
+
+        assert len(devices) == 100
+        assert clock.time() >= dcp.identify_all_timeout + 100 * dcp.default_timeout
+        assert time.time() - start < 5
+
+    def test_slow_device(self):
+        """
+        A device responding after the timeout is not found, a device responding before the timeout is.
+        """
+        clock = VirtualClock()
+        fleet = SimulatedFleet([SimulatedDevice("02:00:00:00:00:01", name_of_station="slow")], delay=3)
+        dcp = DCP(transport=fleet.connect(clock=clock))
+
+        dcp.default_timeout = 2
+        with pytest.raises(DcpTimeoutError):
+            dcp.get_name_of_station("02:00:00:00:00:01")
+        # the late response to the previous request is ignored (wrong xid)
+        dcp.default_timeout = 4
+        assert dcp.get_name_of_station("02:00:00:00:00:01") == "slow"
+
+    def test_response_time(self):
+        """
+        Responses carry their receive time and the time since the request, measured on the virtual clock.
+        """
+        clock = VirtualClock(start=100)
+        fleet = SimulatedFleet([SimulatedDevice("02:00:00:00:00:01", name_of_station="slow")], delay=0.25)
+        dcp = DCP(transport=fleet.connect(clock=clock))
+
+        device = dcp.identify("02:00:00:00:00:01")
+        assert device.response_time == pytest.approx(0.25)
+        assert device.timestamp == pytest.approx(100.25)
+        assert dcp.metrics.latencies["identify"].sum == pytest.approx(0.25)
+
+    def test_step(self):
+        """
+        Every reading of the time advances the clock by the step.
+        """
+        clock = VirtualClock(start=10, step=0.5)
+        assert clock.time() == 10
+        assert clock.time() == 10.5
+        clock.sleep(2)
+        assert clock.time() == 13
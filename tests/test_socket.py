@@ -3,8 +3,10 @@ import time
 import pytest
 import logging
 import socket
+import sys
 
-from profi_dcp.l2socket.l2socket import L2PcapSocket
+from profi_dcp.l2socket import L2Socket, get_l2socket, sendmmsg
+from profi_dcp.l2socket.l2socket import L2PcapSocket, L2LinuxSocket
 from profi_dcp.l2socket.pcap_wrapper import WinPcap
 from util import pcap_available, get_ip
 
@@ -85,6 +87,93 @@ class TestPcapSocket:
 
         l2_socket.close()
 
+    def test_recv_batch(self):
+        """
+        Test receiving several packets at once by sending a burst of packets from a second socket and reading them
+        with recv_batch.
+        Expected results: all sent packets are received in order before the timeout, timestamped by pcap.
+        """
+        ip = get_ip()
+        filter = "ether proto 0x8892"
+        sent_data = [bytes([0] * 12) + bytes([0x88, 0x92]) + bytes([i] * 50) for i in range(1, 21)]
+
+        l2_socket = L2PcapSocket(ip, filter)
+        send_socket = L2PcapSocket(ip)
+        start = time.time()
+        for data in sent_data:
+            send_socket.send(data)
+        send_socket.close()
+
+        end = time.time() + self.timeout
+        received_data = []
+        while time.time() < end and len(received_data) < len(sent_data):
+            received_data.extend(data for data in l2_socket.recv_batch() if data in sent_data)
+
+        assert received_data == sent_data
+        assert all(start - 1 <= data.timestamp <= time.time() for data in received_data)
+
+        l2_socket.close()
+
+    def test_send_while_receiving(self):
+        """
+        Test sending packets from one thread while another thread receives with the same socket.
+        Expected results: all packets are sent successfully and received by the capture thread.
+        """
+        ip = get_ip()
+        sent_data = [bytes([0] * 12) + bytes([0x88, 0x92]) + bytes([i] * 50) for i in range(1, 51)]
+
+        l2_socket = L2PcapSocket(ip, "ether proto 0x8892")
+        received_data = []
+        stop = threading.Event()
+
+        def receive():
+            while not stop.is_set():
+                received_data.extend(data for data in l2_socket.recv_batch() if data in sent_data)
+
+        receiver = threading.Thread(target=receive)
+        receiver.start()
+        try:
+            for data in sent_data:
+                assert l2_socket.send(data) is not False
+            end = time.time() + self.timeout
+            while time.time() < end and len(received_data) < len(sent_data):
+                time.sleep(0.01)
+        finally:
+            stop.set()
+            receiver.join()
+            l2_socket.close()
+
+        assert received_data == sent_data
+
+    def test_send_keeps_received_packets(self):
+        """
+        Test sending a packet while received packets have not been read yet.
+        Expected results: sending returns immediately and all previously received packets can still be read.
+        """
+        ip = get_ip()
+        filter = "ether proto 0x8892"
+        sent_data = [bytes([0] * 12) + bytes([0x88, 0x92]) + bytes([i] * 50) for i in range(1, 21)]
+
+        l2_socket = L2PcapSocket(ip, filter)
+        l2_socket.recv()  # start receiving
+        send_socket = L2PcapSocket(ip)
+        for data in sent_data:
+            send_socket.send(data)
+        send_socket.close()
+
+        start = time.time()
+        l2_socket.send(bytes([0] * 64))
+        assert time.time() - start < 0.1
+
+        end = time.time() + self.timeout
+        received_data = []
+        while time.time() < end and len(received_data) < len(sent_data):
+            received_data.extend(data for data in l2_socket.recv_batch() if data in sent_data)
+
+        assert received_data == sent_data
+
+        l2_socket.close()
+
 
 class TestL2Socket:
     """Test L2-Socket functions on Windows and Linux."""
@@ -143,3 +232,156 @@ class TestL2Socket:
         logging.info(f"Sent data {'received' if received_sent_data else 'not received'} after {packet_count} packets "
                      f"and {end - start}s")
         assert received_sent_data
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+class TestSocketBackends:
+    """Test the selection of the L2 socket backend"""
+
+    def test_default_backend(self):
+        """
+        Test getting the socket class without a backend.
+        Expected results: the default L2Socket of the platform.
+        """
+        assert get_l2socket() is L2Socket
+
+    def test_named_backends(self):
+        """
+        Test getting the socket class of the raw and pcap backend.
+        Expected results: L2LinuxSocket and L2PcapSocket.
+        """
+        assert get_l2socket("raw") is L2LinuxSocket
+        assert get_l2socket("pcap") is L2PcapSocket
+
+    def test_unknown_backend(self):
+        """
+        Test getting the socket class of an unknown backend.
+        Expected results: ValueError.
+        """
+        with pytest.raises(ValueError):
+            get_l2socket("unknown")
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+class TestLinuxSocketStatistics:
+    """Test the kernel statistics and the receive buffer of the raw Linux socket on the loopback interface."""
+
+    protocol = 0x88B5  # local experimental ether type
+
+    def frame(self, index):
+        """Build a broadcast test frame with the given index."""
+        return bytes(6) + bytes(6) + self.protocol.to_bytes(2, "big") + index.to_bytes(4, "big") + bytes(42)
+
+    def test_receive_buffer_size(self):
+        """
+        Test setting and reserving the receive buffer.
+        Expected results: the buffer is grown to hold the reserved frames and never shrunk.
+        """
+        l2_socket = L2LinuxSocket("lo", protocol=self.protocol, receive_buffer_size=64 * 1024)
+        try:
+            assert l2_socket.receive_buffer_size >= 64 * 1024
+            l2_socket.reserve_frames(1000)
+            size = l2_socket.receive_buffer_size
+            assert size >= 1000 * L2LinuxSocket.FRAME_TRUESIZE
+            l2_socket.reserve_frames(10)
+            assert l2_socket.receive_buffer_size == size
+        finally:
+            l2_socket.close()
+
+    def test_drops(self):
+        """
+        Test sending more frames than fit into a small receive buffer.
+        Expected results: the kernel statistics report the received and dropped frames, accumulated over reads.
+        """
+        sender = L2LinuxSocket("lo", protocol=self.protocol)
+        receiver = L2LinuxSocket("lo", recv_timeout=0.1, protocol=self.protocol)
+        try:
+            receiver.set_receive_buffer_size(4096, force=False)
+            assert receiver.statistics().drops == 0
+            for index in range(500):
+                sender.send(self.frame(index))
+            statistics = receiver.statistics()
+            received = 0
+            while receiver.recv() is not None:
+                received += 1
+
+            assert statistics.drops > 0
+            assert statistics.packets == 500
+            assert received == 500 - statistics.drops
+            assert receiver.statistics() == statistics
+            assert receiver.metrics.frames_dropped == statistics.drops
+        finally:
+            sender.close()
+            receiver.close()
+
+    @pytest.mark.parametrize("qdisc_bypass", [False, True])
+    @pytest.mark.parametrize("use_sendmmsg", [True, False])
+    def test_send_batch(self, monkeypatch, use_sendmmsg, qdisc_bypass):
+        """
+        Test sending a batch of frames, with sendmmsg or one call per frame, optionally bypassing the qdisc.
+        Expected results: all frames are received in order and counted as sent.
+        """
+        if not use_sendmmsg:
+            monkeypatch.setattr(sendmmsg, "load", lambda: False)
+        sender = L2LinuxSocket("lo", protocol=self.protocol, qdisc_bypass=qdisc_bypass)
+        receiver = L2LinuxSocket("lo", recv_timeout=0.1, protocol=self.protocol)
+        try:
+            receiver.reserve_frames(300)
+            sender.send_batch(self.frame(index) for index in range(300))
+            received = []
+            frame = receiver.recv()
+            while frame is not None:
+                received.append(frame)
+                frame = receiver.recv()
+
+            assert received == [self.frame(index) for index in range(300)]
+            assert sender.metrics.frames_sent == 300
+        finally:
+            sender.close()
+            receiver.close()
+
+    def test_sendmmsg_calls(self, monkeypatch):
+        """
+        Test the number of system calls for a large batch.
+        Expected results: sendmmsg sends up to MAX_MESSAGES frames per call.
+        """
+        calls = []
+        original = sendmmsg.sendmmsg
+
+        def counting_sendmmsg(fd, frames):
+            calls.append(len(frames))
+            return original(fd, frames)
+
+        monkeypatch.setattr(sendmmsg, "sendmmsg", counting_sendmmsg)
+        sender = L2LinuxSocket("lo", protocol=self.protocol)
+        try:
+            sender.send_batch([self.frame(index) for index in range(1000)])
+            assert calls[0] == 1000
+            assert len(calls) <= 5
+        finally:
+            sender.close()
+
+    def test_timestamps(self):
+        """
+        Test receiving frames with kernel receive timestamps.
+        Expected results: the frames are timestamped when they were sent, without timestamps plain bytes are returned.
+        """
+        sender = L2LinuxSocket("lo", protocol=self.protocol)
+        receiver = L2LinuxSocket("lo", recv_timeout=0.1, protocol=self.protocol)
+        plain_receiver = L2LinuxSocket("lo", recv_timeout=0.1, protocol=self.protocol, timestamps=False)
+        try:
+            before = time.time()
+            sender.send(self.frame(1))
+            time.sleep(0.05)
+            after = time.time()
+
+            frame = receiver.recv()
+            assert frame == self.frame(1)
+            assert before <= frame.timestamp <= after
+            plain_frame = plain_receiver.recv()
+            assert plain_frame == self.frame(1)
+            assert not hasattr(plain_frame, "timestamp")
+        finally:
+            sender.close()
+            receiver.close()
+            plain_receiver.close()
@@ -0,0 +1,170 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from profi_dcp.interfaces import InterfaceResolver, psutil_interfaces
+from profi_dcp.l2socket.registry import SocketRegistry
+from profi_dcp.profi_dcp import DCP
+
+
+@pytest.fixture(scope='function')
+def socket_factory():
+    """
+    Provides a factory for mocked L2 sockets, which receive the frames appended to their frames list.
+    """
+    def open_socket(**kwargs):
+        socket = MagicMock()
+        socket.frames = []
+
+        def recv():
+            if socket.frames:
+                return socket.frames.pop(0)
+            time.sleep(0.01)
+        socket.recv.side_effect = recv
+        return socket
+    return MagicMock(side_effect=open_socket)
+
+
+class TestSocketRegistry:
+    """
+    Test sharing L2 sockets between several users.
+    """
+
+    def test_share_socket(self, socket_factory):
+        """
+        Handles on the same interface share a single socket, handles on other interfaces get their own.
+        """
+        registry = SocketRegistry()
+        handle_1 = registry.acquire(socket_factory, 'eth0', protocol=0x8892)
+        handle_2 = registry.acquire(socket_factory, 'eth0', protocol=0x8892)
+        handle_3 = registry.acquire(socket_factory, 'eth1', protocol=0x8892)
+
+        assert socket_factory.call_count == 2
+        assert handle_1.entry is handle_2.entry
+        assert handle_1.entry is not handle_3.entry
+        assert len(registry) == 2
+
+    def test_demultiplex(self, socket_factory):
+        """
+        Every handle receives the frames of the shared socket.
+        """
+        registry = SocketRegistry()
+        handles = [registry.acquire(socket_factory, 'eth0', recv_timeout=1) for _ in range(3)]
+        handles[0].entry.socket.frames.extend([b'frame-1', b'frame-2'])
+
+        for handle in handles:
+            assert handle.recv() == b'frame-1'
+            assert handle.recv() == b'frame-2'
+        assert socket_factory.call_count == 1
+
+    def test_send(self, socket_factory):
+        """
+        Frames are sent via the shared socket.
+        """
+        registry = SocketRegistry()
+        handle = registry.acquire(socket_factory, 'eth0')
+        handle.send(b'data')
+        handle.entry.socket.send.assert_called_once_with(b'data')
+
+    def test_close_last_handle(self, socket_factory):
+        """
+        The socket is closed only when the last handle is released.
+        """
+        registry = SocketRegistry()
+        handle_1 = registry.acquire(socket_factory, 'eth0')
+        handle_2 = registry.acquire(socket_factory, 'eth0')
+        entry = handle_1.entry
+
+        handle_1.close()
+        handle_1.close()
+        assert len(registry) == 1
+        assert entry.running
+
+        handle_2.close()
+        entry.thread.join(1)
+        assert len(registry) == 0
+        entry.socket.close.assert_called_once()
+
+        # a new handle opens a new socket
+        handle_3 = registry.acquire(socket_factory, 'eth0')
+        assert handle_3.entry is not entry
+        handle_3.close()
+
+    def test_factory_and_options(self, socket_factory):
+        """
+        Handles with another socket factory or other socket options get their own socket.
+        """
+        other_factory = MagicMock(side_effect=socket_factory.side_effect)
+        registry = SocketRegistry()
+        handles = [
+            registry.acquire(socket_factory, 'eth0', buffer_size=1024),
+            registry.acquire(socket_factory, 'eth0', buffer_size=1024),
+            registry.acquire(socket_factory, 'eth0', buffer_size=2048),
+            registry.acquire(socket_factory, 'eth0', buffer_size=1024, qdisc_bypass=True),
+            registry.acquire(other_factory, 'eth0', buffer_size=1024),
+        ]
+
+        assert handles[0].entry is handles[1].entry
+        assert len({id(handle.entry) for handle in handles}) == 4
+        assert socket_factory.call_count == 3
+        assert other_factory.call_count == 1
+        for handle in handles:
+            handle.close()
+
+    def test_receive_failure(self, socket_factory):
+        """
+        If receiving on the shared socket fails, the socket is closed and the next handle opens a new socket.
+        """
+        registry = SocketRegistry()
+        handle_1 = registry.acquire(socket_factory, 'eth0')
+        entry = handle_1.entry
+        entry.socket.recv.side_effect = OSError("Network is down")
+        entry.thread.join(1)
+
+        assert not entry.running
+        assert len(registry) == 0
+        entry.socket.close.assert_called_once()
+
+        handle_2 = registry.acquire(socket_factory, 'eth0')
+        assert handle_2.entry is not entry
+        # releasing the handle of the failed socket does not affect the new socket
+        handle_1.close()
+        assert len(registry) == 1
+        handle_2.close()
+
+    def test_recv_timeout(self, socket_factory):
+        """
+        Receiving without frames returns None after the timeout.
+        """
+        registry = SocketRegistry()
+        handle = registry.acquire(socket_factory, 'eth0', recv_timeout=0.05)
+        assert handle.recv() is None
+        handle.close()
+
+
+class TestDCPSharedSocket:
+    """
+    Test DCP instances sharing their socket.
+    """
+
+    @patch('profi_dcp.l2socket.registry.default_registry')
+    @patch('profi_dcp.profi_dcp.L2Socket')
+    @patch('profi_dcp.interfaces.default_resolver', lambda: InterfaceResolver(psutil_interfaces, watch_changes=False))
+    @patch('psutil.net_if_addrs')
+    @patch('psutil.net_if_stats')
+    def test_dcp_share_socket(self, psutil_net_if_stats, psutil_net_if_addrs, socket, default_registry, mock_return):
+        """
+        DCP instances on the same interface open only one socket, which is closed with the last instance.
+        """
+        psutil_net_if_addrs.return_value = mock_return.testnet_addrs
+        psutil_net_if_stats.return_value = mock_return.testnet_stats
+        default_registry.return_value = registry = SocketRegistry()
+        socket.return_value.recv.return_value = None
+
+        instances = [DCP('10.0.2.124', share_socket=True) for _ in range(10)]
+        assert socket.call_count == 1
+        assert len(registry) == 1
+
+        for instance in instances:
+            instance.close()
+        assert len(registry) == 0
@@ -27,3 +27,14 @@ class TestStressTests:
             time.sleep(wait_duration)
             del dcp
             time.sleep(wait_duration)
+
+    def test_initialization_stress_shared_socket(self):
+        """
+        Test create and close of multiple dcp instances sharing their socket.
+        """
+        ip = get_ip()
+
+        repetitions = 100
+        instances = [DCP(ip, share_socket=True) for _ in range(repetitions)]
+        for dcp in instances:
+            dcp.close()
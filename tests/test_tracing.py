@@ -0,0 +1,152 @@
+import json
+import pytest
+
+from profi_dcp.clock import VirtualClock
+from profi_dcp.error import DcpTimeoutError
+from profi_dcp.profi_dcp import DCP
+from profi_dcp.simulation import SimulatedFleet
+from profi_dcp.tracing import ChromeTracer, Tracer
+
+
+class RecordingTracer(Tracer):
+    """A tracer recording the names and arguments of all events."""
+
+    def __init__(self):
+        self.events = []
+
+    def request_built(self, *args):
+        self.events.append(("request_built",) + args)
+
+    def request_sent(self, *args):
+        self.events.append(("request_sent",) + args)
+
+    def frame_received(self, *args):
+        self.events.append(("frame_received",) + args)
+
+    def frame_rejected(self, *args):
+        self.events.append(("frame_rejected",) + args)
+
+    def response_parsed(self, *args):
+        self.events.append(("response_parsed",) + args)
+
+    def request_completed(self, *args):
+        self.events.append(("request_completed",) + args)
+
+
+@pytest.fixture(scope='function')
+def fleet():
+    """
+    Provides a fleet of 5 simulated devices responding after 10ms.
+    """
+    return SimulatedFleet.generate(5, delay=0.01, seed=1)
+
+
+class TestTracer:
+    """
+    Test the tracing hooks of DCP.
+    """
+
+    def test_events(self, fleet):
+        """
+        A request produces events for building, sending, receiving, parsing and completing it, in this order.
+        """
+        tracer = RecordingTracer()
+        dcp = DCP(transport=fleet.connect(clock=VirtualClock(start=1)), tracer=tracer)
+        dcp.get_name_of_station("02:00:00:00:00:02")
+
+        names = [event[0] for event in tracer.events]
+        assert names == ["request_built", "request_sent", "frame_received", "response_parsed", "request_completed"]
+        xid = tracer.events[0][2]
+        assert tracer.events[1][2:] == (xid, "get", "02:00:00:00:00:02")
+        assert tracer.events[2][0:2] == ("frame_received", pytest.approx(1.01))
+        assert tracer.events[3][2:] == (xid, "02:00:00:00:00:02")
+        assert tracer.events[4][2:] == (xid, "get", 1)
+
+    def test_identify_all_and_timeout(self, fleet):
+        """
+        Identify requests complete with the number of responses, requests without response complete with none.
+        """
+        tracer = RecordingTracer()
+        dcp = DCP(transport=fleet.connect(clock=VirtualClock()), tracer=tracer)
+        dcp.default_timeout = 0.5
+
+        dcp.identify_all(timeout=0.2, response_delay=1)
+        with pytest.raises(DcpTimeoutError):
+            dcp.get_ip_address("02:00:00:00:ff:ff")
+
+        completed = [event for event in tracer.events if event[0] == "request_completed"]
+        assert [event[3:] for event in completed] == [("identify", 5), ("get", 0)]
+
+    def test_identify_many(self, fleet):
+        """
+        A batch of requests sharing an XID is traced as one request with a request sent event per device.
+        """
+        tracer = RecordingTracer()
+        dcp = DCP(transport=fleet.connect(clock=VirtualClock()), tracer=tracer)
+        macs = [device.MAC for device in fleet][:3]
+        dcp.identify_many(macs, timeout=0.5)
+
+        built = [event for event in tracer.events if event[0] == "request_built"]
+        sent = [event for event in tracer.events if event[0] == "request_sent"]
+        completed = [event for event in tracer.events if event[0] == "request_completed"]
+        xid = built[0][2]
+        assert [event[2:] for event in built] == [(xid, "identify", None)]
+        assert [event[2:] for event in sent] == [(xid, "identify", mac) for mac in macs]
+        assert [event[2:] for event in completed] == [(xid, "identify", 3)]
+
+    def test_chrome_identify_many(self, fleet):
+        """
+        The Chrome trace shows a batch of requests as one slice from building the batch to its completion.
+        """
+        clock = VirtualClock(start=1)
+        tracer = ChromeTracer()
+        dcp = DCP(transport=fleet.connect(clock=clock), tracer=tracer)
+        dcp.identify_many([device.MAC for device in fleet], timeout=0.5)
+
+        slices = [event for event in tracer.events if event["ph"] == "X"]
+        assert len(slices) == 1
+        assert slices[0]["ts"] == pytest.approx(1e6)
+        assert slices[0]["args"]["responses"] == 5
+
+    def test_rejected(self, fleet):
+        """
+        Late responses to a previous request are reported as rejected.
+        """
+        tracer = RecordingTracer()
+        dcp = DCP(transport=fleet.connect(recv_timeout=0.001, clock=VirtualClock()), tracer=tracer)
+        dcp.default_timeout = 0.005
+        with pytest.raises(DcpTimeoutError):
+            dcp.get_ip_address("02:00:00:00:00:01")
+        dcp.default_timeout = 0.5
+        dcp.get_ip_address("02:00:00:00:00:01")
+
+        rejected = [event for event in tracer.events if event[0] == "frame_rejected"]
+        assert [event[2:] for event in rejected] == [("wrong_xid", "02:00:00:00:00:01")]
+
+
+class TestChromeTracer:
+    """
+    Test the export of Chrome trace events.
+    """
+
+    def test_export(self, fleet, tmp_path):
+        """
+        Requests are exported as complete events with their duration, the frames as instant events.
+        """
+        tracer = ChromeTracer()
+        dcp = DCP(transport=fleet.connect(recv_timeout=0.05, clock=VirtualClock(start=2)), tracer=tracer)
+        dcp.identify_all(timeout=0.2, response_delay=1)
+
+        path = tmp_path / "trace.json"
+        tracer.save(str(path))
+        events = json.loads(path.read_text())["traceEvents"]
+
+        requests = [event for event in events if event["ph"] == "X"]
+        assert len(requests) == 1
+        assert requests[0]["name"] == "identify"
+        assert requests[0]["ts"] == pytest.approx(2e6)
+        assert requests[0]["dur"] == pytest.approx(0.2e6, rel=0.1)
+        assert requests[0]["args"]["responses"] == 5
+        responses = [event for event in events if event["name"] == "response"]
+        assert len(responses) == 5
+        assert all(event["ph"] == "i" for event in responses)